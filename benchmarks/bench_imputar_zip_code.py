@@ -0,0 +1,115 @@
+"""
+Benchmark de imputar_zip_code: implementación por joins vs. la original
+(moda con lambda por grupo + bucle fila a fila con df.loc).
+
+Uso:
+    python benchmarks/bench_imputar_zip_code.py --rows 1000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "etl"))
+
+from clean_pipeline import ESTADOS_BRASIL, imputar_zip_code
+
+
+def imputar_zip_code_original(df, zip_col, city_col, state_col):
+    """Implementación previa, usada como referencia de resultado y tiempo."""
+    df = df.copy()
+
+    zip_por_ciudad_estado = (
+        df[df[zip_col] > 0]
+        .groupby([city_col, state_col])[zip_col]
+        .agg(lambda x: x.mode()[0] if len(x.mode()) > 0 else np.nan)
+        .to_dict()
+    )
+
+    zip_por_estado = (
+        df[df[zip_col] > 0]
+        .groupby(state_col)[zip_col]
+        .agg(lambda x: x.mode()[0] if len(x.mode()) > 0 else np.nan)
+        .to_dict()
+    )
+
+    mask_imputar = df[zip_col].isna() | (df[zip_col] <= 0)
+
+    for idx in df[mask_imputar].index:
+        city = df.loc[idx, city_col]
+        state = df.loc[idx, state_col]
+
+        if pd.notna(city) and pd.notna(state):
+            zip_imputado = zip_por_ciudad_estado.get((city, state))
+            if pd.notna(zip_imputado):
+                df.loc[idx, zip_col] = zip_imputado
+                continue
+
+        if pd.notna(state):
+            zip_imputado = zip_por_estado.get(state)
+            if pd.notna(zip_imputado):
+                df.loc[idx, zip_col] = zip_imputado
+
+    return df
+
+
+def generar_customers(filas: int, seed: int = 42) -> pd.DataFrame:
+    """Frame sintético de customers: ~5k ciudades, zips con empates y ~5% inválidos."""
+    rng = np.random.default_rng(seed)
+
+    ciudades = np.array([f"Ciudad {i}" for i in range(5000)], dtype=object)
+    estados = np.array(ESTADOS_BRASIL + [None], dtype=object)
+
+    zips = rng.integers(1000, 99999, filas).astype(float)
+    # Pocos zips por ciudad para que haya modas claras y empates
+    zips = np.round(zips, -3)
+    invalidos = rng.random(filas)
+    zips[invalidos < 0.03] = np.nan
+    zips[(invalidos >= 0.03) & (invalidos < 0.05)] = -1.0
+
+    ciudad = ciudades[rng.integers(0, len(ciudades), filas)]
+    ciudad[rng.random(filas) < 0.01] = None
+
+    return pd.DataFrame({
+        'customer_id': [f"{i:032x}" for i in range(filas)],
+        'customer_zip_code_prefix': zips,
+        'customer_city': ciudad,
+        'customer_state': estados[rng.integers(0, len(estados), filas)],
+    })
+
+
+def medir(func, df):
+    inicio = time.perf_counter()
+    resultado = func(df, 'customer_zip_code_prefix', 'customer_city', 'customer_state')
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--skip-original', action='store_true',
+                        help='no correr la implementación original (lenta)')
+    args = parser.parse_args()
+
+    df = generar_customers(args.rows)
+    print(f"customers sintéticos: {df.shape}")
+
+    nuevo, t_nuevo = medir(imputar_zip_code, df)
+    print(f"imputar_zip_code (joins):   {t_nuevo:8.2f}s")
+
+    if args.skip_original:
+        return
+
+    original, t_original = medir(imputar_zip_code_original, df)
+    print(f"imputar_zip_code original:  {t_original:8.2f}s")
+    print(f"speedup: {t_original / t_nuevo:,.1f}x")
+
+    pd.testing.assert_frame_equal(nuevo, original)
+    print("resultados idénticos")
+
+
+if __name__ == "__main__":
+    main()
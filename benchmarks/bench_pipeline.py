@@ -0,0 +1,241 @@
+"""
+Benchmark del pipeline CLEAN sobre datos sintéticos (benchmarks/generar_datos.py):
+mide cada clean_* por separado (tiempo, CPU, filas/s y pico de RSS de leer y
+limpiar la tabla) y el main() completo, y compara contra benchmarks/baseline.json.
+
+Sale con código 1 si alguna medición empeora más que la tolerancia respecto
+de la baseline de la misma escala (throughput más bajo o memoria más alta).
+
+Uso:
+    python benchmarks/bench_pipeline.py --scale 1
+    python benchmarks/bench_pipeline.py --scale 1 --update-baseline
+    python benchmarks/bench_pipeline.py --scale 10 --pipeline-args --workers 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ETL_DIR = BENCH_DIR.parent / "etl"
+sys.path.insert(0, str(ETL_DIR))
+
+import clean_pipeline
+from claves import IndiceClaves
+from generar_datos import generar
+
+BASELINE = BENCH_DIR / "baseline.json"
+
+# Script que corre main() en un proceso aparte, con los directorios del benchmark
+SCRIPT_MAIN = """
+import sys
+from pathlib import Path
+sys.path.insert(0, {etl!r})
+import clean_pipeline
+clean_pipeline.RAW_DIR = Path({raw!r})
+clean_pipeline.CLEAN_DIR = Path({clean!r})
+clean_pipeline.REPORTS_DIR = Path({reportes!r})
+clean_pipeline.main({argv!r})
+"""
+
+# Script que lee y limpia una tabla en un proceso aparte e imprime cuánto subió
+# el pico de RSS (incluye los buffers de Arrow, que tracemalloc no ve)
+SCRIPT_MEMORIA = """
+import contextlib, io, pickle, sys
+from pathlib import Path
+sys.path.insert(0, {etl!r})
+import clean_pipeline
+from instrumentacion import rss_pico_kb
+clean_pipeline.RAW_DIR = Path({raw!r})
+etapa = clean_pipeline.ETAPAS.etapas[{nombre!r}]
+with open({ids!r}, 'rb') as f:
+    ids = pickle.load(f)
+argumentos = [ids[col] for col in etapa.requiere]
+# Librerías que se cargan recién al usarlas: no son memoria de la tabla
+with contextlib.suppress(ImportError):
+    import pyarrow.compute
+base = rss_pico_kb()
+with contextlib.redirect_stdout(io.StringIO()):
+    etapa.funcion(clean_pipeline.load_csv(etapa.archivo, etapa.nombre), *argumentos)
+print(None if base is None else rss_pico_kb() - base)
+"""
+
+
+# -----------------------
+# Mediciones
+# -----------------------
+def medir_funciones(raw_dir: Path, repeticiones: int = 1) -> dict:
+    """
+    Corre cada clean_* sobre su tabla cruda, en el orden del grafo y pasando
+    los IDs válidos de las anteriores, como el pipeline. El tiempo es el
+    mejor de `repeticiones`; la memoria (MB que sube el pico de RSS al leer
+    y limpiar la tabla) se mide en un proceso aparte por tabla.
+    """
+    clean_pipeline.RAW_DIR = raw_dir
+    resultados = {}
+    ids = {}
+
+    for nombre in clean_pipeline.ETAPAS.orden:
+        etapa = clean_pipeline.ETAPAS.etapas[nombre]
+        df = clean_pipeline.load_csv(etapa.archivo, nombre)
+        argumentos = [ids[col] for col in etapa.requiere]
+
+        tiempos = []
+        for _ in range(repeticiones):
+            with contextlib.redirect_stdout(io.StringIO()):
+                cpu = time.process_time()
+                wall = time.perf_counter()
+                limpio = etapa.funcion(df, *argumentos)
+                wall = time.perf_counter() - wall
+                cpu = time.process_time() - cpu
+            tiempos.append((wall, cpu))
+        wall, cpu = min(tiempos)
+
+        pico = medir_memoria(raw_dir, nombre, ids)
+
+        if etapa.genera is not None:
+            ids[etapa.genera] = (IndiceClaves(limpio[etapa.genera]) if etapa.indice is None
+                                 else etapa.indice(limpio))
+
+        resultados[etapa.funcion.__name__] = {
+            "filas": len(df),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "filas_por_s": round(len(df) / wall) if wall > 0 else None,
+            "rss_pico_mb": pico,
+        }
+        print(f"  {etapa.funcion.__name__}: {len(df):,} rows in {wall:.3f}s "
+              f"({len(df) / wall:,.0f} rows/s, peak RSS +{pico} MB)")
+
+    return resultados
+
+
+def medir_memoria(raw_dir: Path, nombre: str, ids: dict):
+    """MB que sube el pico de RSS al leer y limpiar la tabla en un proceso nuevo."""
+    with tempfile.NamedTemporaryFile(suffix=".pkl") as archivo_ids:
+        pickle.dump(ids, archivo_ids)
+        archivo_ids.flush()
+        script = SCRIPT_MEMORIA.format(etl=str(ETL_DIR), raw=str(raw_dir), nombre=nombre,
+                                       ids=archivo_ids.name)
+        salida = subprocess.run([sys.executable, "-c", script], check=True,
+                                capture_output=True, text=True).stdout
+    kb = salida.strip().splitlines()[-1]
+    return round(int(kb) / 1024, 1) if kb != "None" else None
+
+
+def medir_main(raw_dir: Path, argv: list) -> dict:
+    """Corre main() en un proceso nuevo (RSS propio) y toma su reporte JSON."""
+    with tempfile.TemporaryDirectory() as tmp:
+        clean_dir, reportes = Path(tmp) / "clean", Path(tmp) / "reports"
+        script = SCRIPT_MAIN.format(etl=str(ETL_DIR), raw=str(raw_dir), clean=str(clean_dir),
+                                    reportes=str(reportes), argv=argv)
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, "-c", script], check=True, stdout=subprocess.DEVNULL)
+        wall = time.perf_counter() - inicio
+
+        reporte = json.loads(next(reportes.glob("run_*.json")).read_text())
+
+    filas = sum(e["filas_entrada"] or 0 for e in reporte["etapas"] if e["etapa"] in clean_pipeline.ETAPAS.etapas)
+    resultado = {
+        "argv": argv,
+        "filas": filas,
+        "wall_s": round(wall, 3),
+        "filas_por_s": round(filas / wall),
+        "rss_pico_mb": round(reporte["rss_pico_kb"] / 1024, 1) if reporte["rss_pico_kb"] else None,
+    }
+    print(f"  main({' '.join(argv)}): {filas:,} rows in {wall:.2f}s "
+          f"({resultado['filas_por_s']:,} rows/s, peak RSS {resultado['rss_pico_mb']} MB)")
+    return resultado
+
+
+# -----------------------
+# Comparación con la baseline
+# -----------------------
+def comparar(actual: dict, base: dict, tolerancia: float) -> list:
+    """Regresiones: throughput por debajo de base*(1-tol) o memoria por encima de base*(1+tol)."""
+    regresiones = []
+    mediciones = dict(actual["funciones"], main=actual["main"])
+    referencias = dict(base["funciones"], main=base["main"])
+
+    for nombre, medicion in mediciones.items():
+        referencia = referencias.get(nombre)
+        if referencia is None:
+            continue
+        for campo, peor_si_sube in (("filas_por_s", False), ("rss_pico_mb", True)):
+            valor, previo = medicion.get(campo), referencia.get(campo)
+            if not valor or not previo:
+                continue
+            cambio = valor / previo - 1
+            if (cambio > tolerancia) if peor_si_sube else (cambio < -tolerancia):
+                regresiones.append(f"{nombre}.{campo}: {previo} -> {valor} ({cambio:+.0%})")
+            print(f"  {nombre}.{campo}: {previo} -> {valor} ({cambio:+.0%})")
+    return regresiones
+
+
+def maquina() -> dict:
+    return {
+        "python": platform.python_version(),
+        "sistema": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1, help='escala de los datos sintéticos (1, 10, 100)')
+    parser.add_argument('--data', type=Path, default=None, help='directorio de datos (default benchmarks/data/x<scale>)')
+    parser.add_argument('--repeat', type=int, default=3, help='repeticiones por función (se toma la mejor)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='empeoramiento tolerado (0.2 = 20%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='guardar las mediciones como baseline')
+    parser.add_argument('--pipeline-args', nargs=argparse.REMAINDER, default=[],
+                        help='argumentos para main() (p. ej. --workers 3)')
+    args = parser.parse_args()
+
+    escala = f"x{args.scale:g}"
+    raw_dir = args.data or BENCH_DIR / "data" / escala
+    if not (raw_dir / clean_pipeline.ETAPAS.etapas["geolocation"].archivo).exists():
+        print(f"Generating {escala} dirty data in {raw_dir}")
+        generar(raw_dir, args.scale)
+
+    print(f"clean_* functions ({escala}):")
+    actual = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "maquina": maquina(),
+        "funciones": medir_funciones(raw_dir, args.repeat),
+    }
+    print(f"Full pipeline ({escala}):")
+    actual["main"] = medir_main(raw_dir, args.pipeline_args)
+
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+
+    if args.update_baseline:
+        baselines[escala] = actual
+        BASELINE.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Baseline {escala} saved to {BASELINE}")
+        return
+
+    if escala not in baselines:
+        print(f"No baseline for {escala} (run with --update-baseline)")
+        return
+
+    print(f"Against baseline {escala} ({baselines[escala]['fecha']}):")
+    regresiones = comparar(actual, baselines[escala], args.tolerance)
+    if regresiones:
+        print("Regressions:")
+        for regresion in regresiones:
+            print(f"  {regresion}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
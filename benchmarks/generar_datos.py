@@ -0,0 +1,420 @@
+"""
+Genera los CSV crudos del dataset (olist_*_dirty.csv) a escala configurable,
+con la misma suciedad que limpian los clean_* del pipeline: mojibake
+('Ã£', 'NÃNE'), IDs FAKE_KEY, espacios, fechas DD/MM con meses inválidos,
+zips negativos o de más de 5 dígitos, precios fuera de rango, typos de
+categorías ('electrncos') y filas duplicadas.
+
+Escala 1 = tamaño del dataset Olist original. Las tablas se escriben por
+bloques, así 100x no necesita tenerlas completas en memoria.
+
+Uso:
+    python benchmarks/generar_datos.py --scale 10 --out benchmarks/data/x10
+"""
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Filas del dataset Olist original (escala 1)
+FILAS_OLIST = {
+    "customers": 99_441,
+    "orders": 99_441,
+    "order_items": 112_650,
+    "payments": 103_886,
+    "reviews": 99_224,
+    "products": 32_951,
+    "sellers": 3_095,
+    "geolocation": 1_000_163,
+}
+
+ARCHIVOS = {
+    "customers": "olist_customers_dataset_dirty.csv",
+    "orders": "olist_orders_dataset_dirty.csv",
+    "order_items": "olist_order_items_dataset_dirty.csv",
+    "payments": "olist_order_payments_dataset_dirty.csv",
+    "reviews": "olist_order_reviews_dataset_dirty.csv",
+    "products": "olist_products_dataset_dirty.csv",
+    "sellers": "olist_sellers_dataset_dirty.csv",
+    "geolocation": "olist_geolocation_dataset_dirty.csv",
+}
+
+# La traducción de categorías no escala: se copia la del repo
+ARCHIVO_CATEGORIAS = "product_category_name_translation_dirty.csv"
+
+FILAS_POR_BLOQUE = 250_000
+
+ESTADOS = [
+    'AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
+    'MT', 'MS', 'MG', 'PA', 'PB', 'PR', 'PE', 'PI', 'RJ', 'RN',
+    'RS', 'RO', 'RR', 'SC', 'SP', 'SE', 'TO'
+]
+
+# Ciudades sintéticas con estado y zip base fijos (para que haya modas de zip)
+N_CIUDADES = 2_000
+
+VALORES_NULOS = ['NONE', 'NÃNE', 'NULL', 'nan', '']
+
+TYPOS_CATEGORIAS = [
+    'electrncos', 'ELETRONICOOS', 'Electronics', 'categria', 'categória',
+    'casa_conforto_2', 'eletrodomesticos_2',
+]
+
+CATEGORIAS = [
+    'cama_mesa_banho', 'beleza_saude', 'esporte_lazer', 'moveis_decoracao',
+    'informatica_acessorios', 'utilidades_domesticas', 'relogios_presentes',
+    'telefonia', 'ferramentas_jardim', 'automotivo', 'brinquedos', 'cool_stuff',
+    'perfumaria', 'bebes', 'eletronicos', 'papelaria', 'fashion_bolsas_e_acessorios',
+    'pet_shop', 'moveis_escritorio', 'consoles_games', 'malas_acessorios',
+    'construcao_ferramentas_construcao', 'eletrodomesticos', 'instrumentos_musicais',
+    'eletroportateis', 'casa_construcao', 'livros_interesse_geral', 'alimentos',
+    'moveis_sala', 'casa_conforto', 'bebidas', 'audio', 'market_place',
+]
+
+ESTADOS_ORDEN = ['delivered', 'shipped', 'canceled', 'invoiced', 'processing', 'unavailable', 'approved', 'created']
+TIPOS_PAGO = ['credit_card', 'boleto', 'voucher', 'debit_card', 'not_defined']
+
+
+# -----------------------
+# Helpers
+# -----------------------
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def ids(tabla: str, indices: np.ndarray) -> np.ndarray:
+    """
+    IDs hex de 32 caracteres como los de Olist, función del índice de la fila:
+    las FKs de otras tablas se generan con el mismo índice sin guardar nada.
+    """
+    sal = np.uint64(sum(ord(c) << (8 * (i % 8)) for i, c in enumerate(tabla)))
+    indices = indices.astype(np.uint64)
+    with np.errstate(over='ignore'):
+        altos = _splitmix64(indices ^ sal)
+        bajos = _splitmix64(altos ^ indices)
+    crudo = np.stack([altos, bajos], axis=1).astype('>u8').tobytes()
+    return np.frombuffer(crudo.hex().encode('ascii'), dtype='S32').astype(str).astype(object)
+
+
+def _mojibake(valores: np.ndarray) -> np.ndarray:
+    """'a' -> 'Ã£' y 'o' -> 'Ã³', como el encoding roto de los crudos (normalizar_string lo revierte)."""
+    return np.array(
+        [v.replace('a', 'Ã£').replace('o', 'Ã³') if isinstance(v, str) else v for v in valores], dtype=object
+    )
+
+
+def ensuciar_texto(rng, valores: np.ndarray, mojibake=0.02, espacios=0.02, nulos=0.01) -> np.ndarray:
+    valores = valores.astype(object).copy()
+    r = rng.random(len(valores))
+
+    m = r < mojibake
+    valores[m] = _mojibake(valores[m])
+
+    m = (r >= mojibake) & (r < mojibake + espacios)
+    valores[m] = [f"  {v} " for v in valores[m]]
+
+    m = (r >= mojibake + espacios) & (r < mojibake + espacios + nulos)
+    valores[m] = rng.choice(VALORES_NULOS + [None], m.sum())
+    return valores
+
+
+def fechas(rng, n: int, desde='2016-09-01', dias=760) -> np.ndarray:
+    """ISO en su mayoría, con DD/MM/YYYY, meses inválidos, basura y nulos."""
+    base = pd.Timestamp(desde) + pd.to_timedelta(rng.integers(0, dias * 86400, n), unit='s')
+    valores = base.strftime('%Y-%m-%d %H:%M:%S').to_numpy(dtype=object)
+    ddmm = base.strftime('%d/%m/%Y %H:%M:%S').to_numpy(dtype=object)
+
+    r = rng.random(n)
+    m = (r >= 0.88) & (r < 0.94)
+    valores[m] = ddmm[m]
+    m = (r >= 0.94) & (r < 0.96)
+    valores[m] = [f"{d[:3]}{mes}{d[5:]}" for d, mes in zip(ddmm[m], rng.integers(13, 20, m.sum()))]
+    valores[(r >= 0.96) & (r < 0.97)] = 'invalid_date'
+    valores[r >= 0.98] = None
+    return valores
+
+
+def _zips_invalidos(rng, zips: np.ndarray, proporcion=0.05) -> np.ndarray:
+    zips = zips.astype(float)
+    r = rng.random(len(zips))
+    zips[r < proporcion / 3] = -rng.integers(1, 9999, (r < proporcion / 3).sum())
+    zips[(r >= proporcion / 3) & (r < 2 * proporcion / 3)] = 123456.0
+    zips[(r >= 2 * proporcion / 3) & (r < proporcion)] = np.nan
+    return zips
+
+
+def _ciudades(rng, n: int):
+    """Índice de ciudad, nombre, estado y zip base de cada fila."""
+    ciudad = rng.integers(0, N_CIUDADES, n)
+    nombres = np.array([f"cidade {i}" for i in range(N_CIUDADES)], dtype=object)
+    estados = np.array(ESTADOS, dtype=object)[np.arange(N_CIUDADES) % len(ESTADOS)]
+    zip_base = 1000 + (np.arange(N_CIUDADES) * 47) % 98000
+    return ciudad, nombres[ciudad], estados[ciudad], zip_base[ciudad]
+
+
+def _fks(rng, tabla: str, n: int, total: int, invalidas=0.01) -> np.ndarray:
+    """FKs a `tabla` (filas 0..total-1); una fracción apunta a IDs que no existen."""
+    return _fks_de(rng, tabla, rng.integers(0, total, n), total, invalidas)
+
+
+def _fks_de(rng, tabla: str, indices: np.ndarray, total: int, invalidas=0.01) -> np.ndarray:
+    """FKs a las filas `indices` de `tabla`, con la misma suciedad que _fks."""
+    indices = indices.copy()
+    n = len(indices)
+    malas = rng.random(n) < invalidas
+    indices[malas] = total + rng.integers(0, total, malas.sum())
+    valores = ids(tabla, indices)
+    return ensuciar_texto(rng, valores, mojibake=0.02, espacios=0.01, nulos=0.0)
+
+
+def _ruido(rng, n: int) -> np.ndarray:
+    return rng.choice(np.array(['A1', 'B2', 'X9', None], dtype=object), n)
+
+
+def _con_duplicados(rng, df: pd.DataFrame, proporcion=0.03) -> pd.DataFrame:
+    return pd.concat([df, df.sample(frac=proporcion, random_state=int(rng.integers(1 << 31)))])
+
+
+def _estado_sucio(rng, estados: np.ndarray) -> np.ndarray:
+    estados = estados.copy()
+    r = rng.random(len(estados))
+    estados[r < 0.03] = [e.lower() for e in estados[r < 0.03]]
+    estados[(r >= 0.03) & (r < 0.04)] = 'XX'
+    estados[(r >= 0.04) & (r < 0.05)] = None
+    return estados
+
+
+# -----------------------
+# Tablas (un bloque de filas inicio..inicio+n)
+# -----------------------
+def bloque_customers(rng, inicio, n, filas):
+    indices = np.arange(inicio, inicio + n)
+    _, ciudad, estado, zip_base = _ciudades(rng, n)
+    customer_id = ensuciar_texto(rng, ids("customers", indices))
+
+    fake = rng.random(n) < 0.005
+    customer_id[fake] = [f"FAKE_KEY_{i}" for i in indices[fake]]
+    ciudad = ensuciar_texto(rng, ciudad)
+    ciudad[fake & (rng.random(n) < 0.5)] = None
+
+    df = pd.DataFrame({
+        'customer_id': customer_id,
+        'customer_unique_id': ids("customer_unique", indices),
+        'customer_zip_code_prefix': _zips_invalidos(rng, zip_base + rng.integers(0, 3, n)),
+        'customer_city': ciudad,
+        'customer_state': _estado_sucio(rng, estado),
+        'noise_flag': _ruido(rng, n),
+    })
+    return _con_duplicados(rng, df)
+
+
+def bloque_sellers(rng, inicio, n, filas):
+    indices = np.arange(inicio, inicio + n)
+    _, ciudad, estado, zip_base = _ciudades(rng, n)
+    seller_id = ensuciar_texto(rng, ids("sellers", indices))
+    fake = rng.random(n) < 0.005
+    seller_id[fake] = [f"FAKE_KEY_{i}" for i in indices[fake]]
+
+    df = pd.DataFrame({
+        'seller_id': seller_id,
+        'seller_zip_code_prefix': _zips_invalidos(rng, zip_base + rng.integers(0, 3, n)),
+        'seller_city': ensuciar_texto(rng, ciudad),
+        'seller_state': _estado_sucio(rng, estado),
+        'noise_flag': _ruido(rng, n),
+    })
+    return _con_duplicados(rng, df)
+
+
+def bloque_products(rng, inicio, n, filas):
+    indices = np.arange(inicio, inicio + n)
+    categoria = rng.choice(np.array(CATEGORIAS, dtype=object), n)
+    r = rng.random(n)
+    categoria[r < 0.02] = rng.choice(TYPOS_CATEGORIAS, (r < 0.02).sum())
+    categoria = ensuciar_texto(rng, categoria, mojibake=0.03, espacios=0.01, nulos=0.02)
+
+    def medida(alto):
+        valores = rng.integers(1, alto, n).astype(float)
+        r = rng.random(n)
+        valores[r < 0.01] = -1.0
+        valores[(r >= 0.01) & (r < 0.02)] = 99999.0
+        valores[(r >= 0.02) & (r < 0.03)] = np.nan
+        return valores
+
+    df = pd.DataFrame({
+        'product_id': ensuciar_texto(rng, ids("products", indices)),
+        'product_category_name': categoria,
+        'product_name_lenght': medida(80),
+        'product_description_lenght': medida(4000),
+        'product_photos_qty': medida(10),
+        'product_weight_g': medida(30000),
+        'product_length_cm': medida(100),
+        'product_height_cm': medida(100),
+        'product_width_cm': medida(100),
+        'noise_flag': _ruido(rng, n),
+    })
+    return _con_duplicados(rng, df)
+
+
+def bloque_orders(rng, inicio, n, filas):
+    indices = np.arange(inicio, inicio + n)
+    estado = rng.choice(np.array(ESTADOS_ORDEN, dtype=object), n, p=[0.9, 0.03, 0.02, 0.01, 0.01, 0.01, 0.01, 0.01])
+    r = rng.random(n)
+    estado[r < 0.02] = [e.upper() for e in estado[r < 0.02]]
+
+    compra = fechas(rng, n)
+    df = pd.DataFrame({
+        'order_id': ensuciar_texto(rng, ids("orders", indices)),
+        'customer_id': _fks(rng, "customers", n, filas["customers"]),
+        'order_status': ensuciar_texto(rng, estado, mojibake=0.0),
+        'order_purchase_timestamp': compra,
+        'order_approved_at': fechas(rng, n),
+        'order_delivered_carrier_date': fechas(rng, n),
+        'order_delivered_customer_date': fechas(rng, n),
+        'order_estimated_delivery_date': fechas(rng, n),
+        'noise_flag': _ruido(rng, n),
+    })
+    return _con_duplicados(rng, df)
+
+
+def _precios(rng, n, alto, maximo):
+    valores = np.round(rng.uniform(1, alto, n), 2)
+    r = rng.random(n)
+    valores[r < 0.01] = -valores[r < 0.01]
+    valores[(r >= 0.01) & (r < 0.02)] = maximo * 2
+    valores[(r >= 0.02) & (r < 0.03)] = np.nan
+    return valores
+
+
+def bloque_order_items(rng, inicio, n, filas):
+    df = pd.DataFrame({
+        'order_id': _fks(rng, "orders", n, filas["orders"]),
+        'order_item_id': rng.integers(1, 4, n),
+        'product_id': _fks(rng, "products", n, filas["products"]),
+        'seller_id': _fks(rng, "sellers", n, filas["sellers"]),
+        'shipping_limit_date': fechas(rng, n),
+        'price': _precios(rng, n, 500, 50000),
+        'freight_value': _precios(rng, n, 60, 10000),
+        'noise_flag': _ruido(rng, n),
+    })
+    return _con_duplicados(rng, df)
+
+
+def bloque_payments(rng, inicio, n, filas):
+    tipo = rng.choice(np.array(TIPOS_PAGO, dtype=object), n, p=[0.73, 0.19, 0.05, 0.02, 0.01])
+    r = rng.random(n)
+    tipo[r < 0.03] = [t.upper() for t in tipo[r < 0.03]]
+
+    # Los pagos de cada orden son filas contiguas con payment_sequential 1..k:
+    # la PK (order_id, payment_sequential) no trae suciedad que la limpieza no repare
+    indices = np.arange(inicio, inicio + n)
+    orden = indices * filas["orders"] // filas["payments"]
+    primera = -(-orden * filas["payments"] // filas["orders"])
+
+    df = pd.DataFrame({
+        'order_id': _fks_de(rng, "orders", orden, filas["orders"]),
+        'payment_sequential': indices - primera + 1,
+        'payment_type': ensuciar_texto(rng, tipo, mojibake=0.0),
+        'payment_installments': rng.choice([1, 1, 2, 3, 10, 0, 30], n),
+        'payment_value': _precios(rng, n, 1000, 50000),
+        'noise_flag': _ruido(rng, n),
+    })
+    return _con_duplicados(rng, df)
+
+
+def bloque_reviews(rng, inicio, n, filas):
+    indices = np.arange(inicio, inicio + n)
+    titulos = np.array(['Ótimo', 'recomendo', 'ruim', 'bom produto', 'NA', None], dtype=object)
+    mensajes = np.array(['Produto chegou rápido', 'não recebi', 'ok', 'muito bom', None], dtype=object)
+
+    df = pd.DataFrame({
+        'review_id': ensuciar_texto(rng, ids("reviews", indices)),
+        'order_id': _fks(rng, "orders", n, filas["orders"]),
+        'review_score': rng.choice(np.array(['1', '2', '3', '4', '5', '5', '0', '7', 'x', None], dtype=object), n),
+        'review_comment_title': ensuciar_texto(rng, rng.choice(titulos, n)),
+        'review_comment_message': ensuciar_texto(rng, rng.choice(mensajes, n)),
+        'review_creation_date': fechas(rng, n),
+        'review_answer_timestamp': fechas(rng, n),
+        'noise_flag': _ruido(rng, n),
+    })
+    return _con_duplicados(rng, df)
+
+
+def bloque_geolocation(rng, inicio, n, filas):
+    _, ciudad, estado, zip_base = _ciudades(rng, n)
+    lat = np.round(rng.uniform(-33, 5, n), 6)
+    lng = np.round(rng.uniform(-73, -35, n), 6)
+    r = rng.random(n)
+    lat[r < 0.01] = 40.0
+    lng[(r >= 0.01) & (r < 0.02)] = -80.0
+
+    df = pd.DataFrame({
+        'geolocation_zip_code_prefix': _zips_invalidos(rng, zip_base + rng.integers(0, 3, n)),
+        'geolocation_lat': lat,
+        'geolocation_lng': lng,
+        'geolocation_city': ensuciar_texto(rng, ciudad),
+        'geolocation_state': _estado_sucio(rng, estado),
+        'noise_flag': _ruido(rng, n),
+    })
+    return _con_duplicados(rng, df, proporcion=0.05)
+
+
+BLOQUES = {
+    "customers": bloque_customers,
+    "sellers": bloque_sellers,
+    "products": bloque_products,
+    "orders": bloque_orders,
+    "order_items": bloque_order_items,
+    "payments": bloque_payments,
+    "reviews": bloque_reviews,
+    "geolocation": bloque_geolocation,
+}
+
+
+# -----------------------
+# Escritura
+# -----------------------
+def filas_por_tabla(escala: float) -> dict:
+    return {tabla: max(1, int(filas * escala)) for tabla, filas in FILAS_OLIST.items()}
+
+
+def generar(destino: Path, escala: float = 1, seed: int = 42) -> dict:
+    """Escribe los 9 CSV crudos en `destino`. Devuelve las filas (sin duplicados) por tabla."""
+    destino.mkdir(parents=True, exist_ok=True)
+    filas = filas_por_tabla(escala)
+
+    shutil.copy(BASE_DIR / "data" / "raw" / ARCHIVO_CATEGORIAS, destino / ARCHIVO_CATEGORIAS)
+
+    for numero, (tabla, bloque) in enumerate(BLOQUES.items()):
+        inicio_t = time.perf_counter()
+        path = destino / ARCHIVOS[tabla]
+        for i, inicio in enumerate(range(0, filas[tabla], FILAS_POR_BLOQUE)):
+            rng = np.random.default_rng([seed, numero, i])
+            n = min(FILAS_POR_BLOQUE, filas[tabla] - inicio)
+            bloque(rng, inicio, n, filas).to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        print(f"  {path.name}: {filas[tabla]:,} rows in {time.perf_counter() - inicio_t:.1f}s")
+
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1, help='1 = tamaño del dataset Olist (10, 100, ...)')
+    parser.add_argument('--out', type=Path, default=None, help='directorio de salida (default benchmarks/data/x<scale>)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    destino = args.out or Path(__file__).resolve().parent / "data" / f"x{args.scale:g}"
+    print(f"Generating x{args.scale:g} dirty data in {destino}")
+    generar(destino, args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from instrumentacion import medido
+
+
+# -----------------------
+# Esquema de las tablas limpias
+# -----------------------
+FORMATO_FECHA_CSV = "%Y-%m-%d %H:%M:%S"
+
+# dtypes explícitos por tabla (el resto queda como lo deja la limpieza)
+ESQUEMA = {
+    "customers": {
+        "customer_zip_code_prefix": "Int64",
+        "customer_state": "category",
+    },
+    "sellers": {
+        "seller_zip_code_prefix": "Int64",
+        "seller_state": "category",
+    },
+    "geolocation": {
+        "geolocation_zip_code_prefix": "Int64",
+        "geolocation_state": "category",
+    },
+    "orders": {
+        "order_status": "category",
+        "order_purchase_timestamp": "datetime64[ns]",
+        "order_approved_at": "datetime64[ns]",
+        "order_delivered_carrier_date": "datetime64[ns]",
+        "order_delivered_customer_date": "datetime64[ns]",
+        "order_estimated_delivery_date": "datetime64[ns]",
+    },
+    "order_items": {
+        "shipping_limit_date": "datetime64[ns]",
+    },
+    "payments": {
+        "payment_type": "category",
+    },
+    "reviews": {
+        "review_creation_date": "datetime64[ns]",
+        "review_answer_timestamp": "datetime64[ns]",
+    },
+}
+
+# Tablas que se guardan particionadas por año-mes de compra de la orden
+COLUMNA_PARTICION = "purchase_year_month"
+TABLAS_PARTICIONADAS = {"orders", "order_items"}
+
+# Partición de las órdenes sin fecha de compra (una partición nula no se puede leer)
+MES_DESCONOCIDO = "unknown"
+
+
+def aplicar_esquema(df: pd.DataFrame, nombre: str) -> pd.DataFrame:
+    """Castea las columnas de la tabla a los dtypes de ESQUEMA."""
+    tipos = {col: tipo for col, tipo in ESQUEMA.get(nombre, {}).items() if col in df.columns}
+    return df.astype(tipos) if tipos else df
+
+
+def _requiere_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("The parquet format requires pyarrow (pip install pyarrow)") from e
+
+
+# -----------------------
+# Esquema de los CSV crudos
+# -----------------------
+def _hay_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# IDs hex, fechas sin parsear y texto libre: strings de Arrow (un buffer
+# contiguo por columna en vez de un objeto Python por celda). Sin pyarrow
+# quedan como object, igual que antes.
+TEXTO = "string[pyarrow]" if _hay_pyarrow() else object
+
+# Columnas de pocos valores distintos (estados, ciudades, status, tipos)
+CATEGORIA = "category"
+
+# dtypes de lectura por tabla; las columnas que no figuran las infiere read_csv
+ESQUEMA_CRUDO = {
+    "customers": {
+        "customer_id": TEXTO,
+        "customer_unique_id": TEXTO,
+        "customer_city": CATEGORIA,
+        "customer_state": CATEGORIA,
+        "noise_flag": CATEGORIA,
+    },
+    "sellers": {
+        "seller_id": TEXTO,
+        "seller_city": CATEGORIA,
+        "seller_state": CATEGORIA,
+        "noise_flag": CATEGORIA,
+    },
+    "products": {
+        "product_id": TEXTO,
+        "product_category_name": CATEGORIA,
+        "noise_flag": CATEGORIA,
+    },
+    "geolocation": {
+        "geolocation_city": CATEGORIA,
+        "geolocation_state": CATEGORIA,
+        "noise_flag": CATEGORIA,
+    },
+    "orders": {
+        "order_id": TEXTO,
+        "customer_id": TEXTO,
+        "order_status": CATEGORIA,
+        "noise_flag": CATEGORIA,
+    },
+    "order_items": {
+        "order_id": TEXTO,
+        "product_id": TEXTO,
+        "seller_id": TEXTO,
+        "noise_flag": CATEGORIA,
+    },
+    "payments": {
+        "order_id": TEXTO,
+        "payment_type": CATEGORIA,
+        "noise_flag": CATEGORIA,
+    },
+    "reviews": {
+        "review_id": TEXTO,
+        "order_id": TEXTO,
+        "review_comment_title": TEXTO,
+        "review_comment_message": TEXTO,
+        "noise_flag": CATEGORIA,
+    },
+}
+
+
+def tipos_crudos(nombre: str) -> dict:
+    """dtypes para leer el CSV crudo de la tabla (dict vacío si no tiene esquema)."""
+    return dict(ESQUEMA_CRUDO.get(nombre, {}))
+
+
+# -----------------------
+# Writers
+# -----------------------
+class EscritorCSV:
+    """Formato original: un CSV por tabla, fechas como texto."""
+
+    formato = "csv"
+
+    def ruta(self, directorio: Path, nombre: str) -> Path:
+        return directorio / f"{nombre}_clean.csv"
+
+    @medido("to_csv", arg=1)
+    def escribir(self, df: pd.DataFrame, nombre: str, directorio: Path) -> Path:
+        destino = self.ruta(directorio, nombre)
+        df.to_csv(destino, index=False, date_format=FORMATO_FECHA_CSV)
+        return destino
+
+    @medido("to_csv")
+    def escribir_bloques(self, bloques, nombre: str, directorio: Path) -> Path:
+        """Escribe la tabla de a bloques (en orden), agregando cada uno al CSV."""
+        destino = self.ruta(directorio, nombre)
+        with open(destino, "w", newline="") as f:
+            for i, df in enumerate(bloques):
+                df.to_csv(f, index=False, header=(i == 0), date_format=FORMATO_FECHA_CSV)
+        return destino
+
+    def leer(self, nombre: str, directorio: Path, columnas=None, meses=None) -> pd.DataFrame:
+        if meses is not None:
+            raise ValueError("Partition filters require the parquet format")
+
+        esquema = ESQUEMA.get(nombre, {})
+        fechas = [c for c, t in esquema.items() if t.startswith("datetime") and (columnas is None or c in columnas)]
+        tipos = {c: t for c, t in esquema.items() if not t.startswith("datetime") and (columnas is None or c in columnas)}
+        return pd.read_csv(
+            self.ruta(directorio, nombre),
+            usecols=columnas,
+            dtype=tipos,
+            parse_dates=fechas,
+            date_format=FORMATO_FECHA_CSV,
+        )
+
+
+class EscritorParquet:
+    """
+    Parquet (Arrow) con dtypes explícitos. orders y order_items se escriben
+    como dataset particionado por año-mes de compra (purchase_year_month=AAAA-MM/).
+    """
+
+    formato = "parquet"
+
+    def __init__(self):
+        _requiere_pyarrow()
+
+    def ruta(self, directorio: Path, nombre: str) -> Path:
+        if nombre in TABLAS_PARTICIONADAS:
+            return directorio / f"{nombre}_clean"
+        return directorio / f"{nombre}_clean.parquet"
+
+    def _meses_de_compra(self, df: pd.DataFrame, nombre: str, directorio: Path) -> pd.Series:
+        if nombre == "orders":
+            compra = df["order_purchase_timestamp"]
+        else:
+            # order_items no tiene fecha de compra: se toma de orders, que ya está escrita
+            ordenes = self.leer("orders", directorio, columnas=["order_id", "order_purchase_timestamp"])
+            compra = df["order_id"].map(ordenes.set_index("order_id")["order_purchase_timestamp"])
+        return pd.to_datetime(compra).dt.strftime("%Y-%m").fillna(MES_DESCONOCIDO)
+
+    @medido("to_parquet", arg=1)
+    def escribir(self, df: pd.DataFrame, nombre: str, directorio: Path) -> Path:
+        destino = self.ruta(directorio, nombre)
+        df = aplicar_esquema(df, nombre)
+
+        if nombre not in TABLAS_PARTICIONADAS:
+            df.to_parquet(destino, engine="pyarrow", index=False)
+            return destino
+
+        # to_parquet agrega archivos a un dataset existente: reescribir desde cero
+        if destino.exists():
+            shutil.rmtree(destino)
+        df = df.assign(**{COLUMNA_PARTICION: self._meses_de_compra(df, nombre, directorio)})
+        df.to_parquet(destino, engine="pyarrow", index=False, partition_cols=[COLUMNA_PARTICION])
+        return destino
+
+    @medido("to_parquet")
+    def escribir_bloques(self, bloques, nombre: str, directorio: Path) -> Path:
+        """
+        Escribe la tabla de a bloques (en orden) sin juntarla en memoria. Cada
+        bloque va primero a un archivo aparte; al final se reescriben todos
+        con un único esquema (un bloque con una columna toda nula no tiene
+        el tipo de las demás).
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        destino = self.ruta(directorio, nombre)
+        with tempfile.TemporaryDirectory(prefix=f"{nombre}_bloques_", dir=directorio) as temporal:
+            archivos = []
+            for i, df in enumerate(bloques):
+                df = aplicar_esquema(df, nombre)
+                if nombre in TABLAS_PARTICIONADAS:
+                    df = df.assign(**{COLUMNA_PARTICION: self._meses_de_compra(df, nombre, directorio)})
+                archivos.append(Path(temporal) / f"{i}.parquet")
+                df.to_parquet(archivos[-1], engine="pyarrow", index=False)
+
+            esquema = pa.unify_schemas([pq.read_schema(a) for a in archivos], promote_options="permissive")
+            if destino.is_dir():
+                shutil.rmtree(destino)
+            elif destino.exists():
+                destino.unlink()
+            if nombre not in TABLAS_PARTICIONADAS:
+                with pq.ParquetWriter(destino, esquema) as escritor:
+                    for archivo in archivos:
+                        escritor.write_table(pq.read_table(archivo).cast(esquema))
+                return destino
+
+            # Un archivo por mes de compra, como el dataset que escribe `escribir`
+            sin_mes = esquema.remove(esquema.get_field_index(COLUMNA_PARTICION))
+            escritores = {}
+            try:
+                for archivo in archivos:
+                    tabla = pq.read_table(archivo).cast(esquema)
+                    meses = tabla.column(COLUMNA_PARTICION)
+                    for mes in meses.unique().to_pylist():
+                        if mes not in escritores:
+                            carpeta = destino / f"{COLUMNA_PARTICION}={mes}"
+                            carpeta.mkdir(parents=True)
+                            escritores[mes] = pq.ParquetWriter(carpeta / "part-0.parquet", sin_mes)
+                        filas = tabla.filter(pc.equal(meses, mes))
+                        escritores[mes].write_table(filas.drop_columns([COLUMNA_PARTICION]))
+            finally:
+                for escritor in escritores.values():
+                    escritor.close()
+        return destino
+
+    def leer(self, nombre: str, directorio: Path, columnas=None, meses=None) -> pd.DataFrame:
+        """
+        Lee solo las columnas pedidas; en tablas particionadas, `meses`
+        (lista de 'AAAA-MM') evita leer las particiones de otros meses.
+        """
+        filtros = None
+        if meses is not None:
+            if nombre not in TABLAS_PARTICIONADAS:
+                raise ValueError(f"{nombre} is not partitioned by {COLUMNA_PARTICION}")
+            filtros = [(COLUMNA_PARTICION, "in", list(meses))]
+
+        df = pd.read_parquet(self.ruta(directorio, nombre), engine="pyarrow", columns=columnas, filters=filtros)
+        if COLUMNA_PARTICION in df.columns and (columnas is None or COLUMNA_PARTICION not in columnas):
+            df = df.drop(columns=COLUMNA_PARTICION)
+        return df
+
+
+ESCRITORES = {
+    EscritorCSV.formato: EscritorCSV,
+    EscritorParquet.formato: EscritorParquet,
+}
+
+
+def obtener_escritor(formato: str):
+    return ESCRITORES[formato]()
+
+
+def leer_tabla(nombre: str, directorio: Path, formato: str = "csv", columnas=None, meses=None) -> pd.DataFrame:
+    """Lee una tabla limpia con sus dtypes, solo con las columnas y meses pedidos."""
+    return obtener_escritor(formato).leer(nombre, directorio, columnas=columnas, meses=meses)
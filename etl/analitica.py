@@ -0,0 +1,66 @@
+import time
+from pathlib import Path
+
+from carga import conexion
+
+
+# -----------------------
+# Modelo analítico materializado (sql/analytics_model.sql)
+# -----------------------
+MODELO_SQL = Path(__file__).resolve().parent.parent / "sql" / "analytics_model.sql"
+
+# En orden de dependencia: los rollups leen fact_order_items y dim_product
+VISTAS_MATERIALIZADAS = [
+    "dim_zip_codes",
+    "dim_time",
+    "dim_product",
+    "dim_payment",
+    "fact_order_items",
+    "daily_sales",
+    "daily_totals",
+]
+
+
+def vistas_existentes() -> set:
+    con = conexion()
+    with con.cursor() as cur:
+        cur.execute("SELECT matviewname FROM pg_matviews WHERE schemaname = 'analytics'")
+        existentes = {fila[0] for fila in cur.fetchall()}
+    con.commit()
+    return existentes
+
+
+def crear_modelo():
+    """Ejecuta sql/analytics_model.sql (crea y llena las vistas materializadas)."""
+    con = conexion()
+    with con.cursor() as cur:
+        cur.execute(MODELO_SQL.read_text(encoding="utf-8"))
+    con.commit()
+
+
+def refrescar_analitica():
+    """
+    Refresca las vistas materializadas del schema analytics después de una carga.
+
+    REFRESH ... CONCURRENTLY (usa los índices únicos del modelo) no bloquea
+    las consultas de los dashboards mientras corre. No es incremental: vuelve
+    a calcular cada vista entera y después aplica a la vista las diferencias
+    con el resultado, así que cuesta lo mismo que un REFRESH común o más.
+    Si el modelo todavía no existe (o es de la versión con vistas comunes)
+    se crea desde sql/analytics_model.sql.
+    """
+    if not set(VISTAS_MATERIALIZADAS) <= vistas_existentes():
+        inicio = time.perf_counter()
+        crear_modelo()
+        print(f"  analytics model created in {time.perf_counter() - inicio:.2f}s")
+        return
+
+    con = conexion()
+    for vista in VISTAS_MATERIALIZADAS:
+        inicio = time.perf_counter()
+        with con.cursor() as cur:
+            cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY analytics.{vista}")
+            # Estadísticas al día para el planner
+            cur.execute(f"ANALYZE analytics.{vista}")
+        con.commit()
+        print(f"  analytics.{vista} refreshed in {time.perf_counter() - inicio:.2f}s")
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentacion import contar
+
+try:
+    import pyarrow as pa
+except ImportError:  # sin pyarrow no hay cache: se lee siempre el CSV
+    pa = None
+
+
+# Bloques para el hash del contenido (no se carga el crudo entero en memoria)
+BYTES_POR_BLOQUE = 8 * 1024 * 1024
+
+
+def _requiere_pyarrow():
+    if pa is None:
+        raise ImportError("The raw cache requires pyarrow (pip install pyarrow)")
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(BYTES_POR_BLOQUE), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _escribir_atomico(destino: Path, escribir):
+    """Escribe en un temporal y lo renombra: otro proceso nunca ve un archivo a medias."""
+    temporal = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    try:
+        escribir(temporal)
+        os.replace(temporal, destino)
+    finally:
+        temporal.unlink(missing_ok=True)
+
+
+# -----------------------
+# Cache de tablas crudas parseadas
+# -----------------------
+class CacheCrudos:
+    """
+    Tablas crudas ya parseadas por read_csv, guardadas en `directorio` como
+    Arrow IPC sin comprimir (Feather v2). En una corrida siguiente sobre el
+    mismo CSV se abren con memory map: las columnas de texto (strings de
+    Arrow) apuntan directo al archivo, sin copiar ni parsear.
+
+    La entrada depende del contenido del CSV (sha256) y de los dtypes de
+    lectura; un CSV que cambia o un esquema nuevo dan otra entrada. Para no
+    hashear el crudo en cada corrida, el hash se guarda junto al tamaño y
+    el mtime del archivo y se recalcula solo si estos cambian.
+
+    El directorio se recorta a `limite_bytes` borrando las entradas usadas
+    hace más tiempo (LRU por mtime, que se actualiza en cada uso).
+    """
+
+    def __init__(self, directorio: Path, limite_bytes: int):
+        _requiere_pyarrow()
+        self.directorio = Path(directorio)
+        self.limite_bytes = limite_bytes
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def _hash_contenido(self, path: Path) -> str:
+        """sha256 del CSV, reutilizando el de la última vez si no cambiaron tamaño ni mtime."""
+        estado = path.stat()
+        registro = self.directorio / f"{hashlib.sha1(str(path.resolve()).encode()).hexdigest()}.json"
+        firma = {"bytes": estado.st_size, "mtime_ns": estado.st_mtime_ns}
+        try:
+            previo = json.loads(registro.read_text())
+        except (OSError, ValueError):
+            previo = {}
+        if previo.get("sha256") and {k: previo.get(k) for k in firma} == firma:
+            return previo["sha256"]
+
+        contenido = _sha256(path)
+        if previo.get("sha256") not in (None, contenido):
+            # El CSV cambió: sus entradas anteriores ya no se van a usar
+            for vieja in self.directorio.glob(f"{path.stem}-{previo['sha256'][:16]}-*.arrow"):
+                vieja.unlink(missing_ok=True)
+        _escribir_atomico(registro, lambda p: p.write_text(json.dumps({**firma, "sha256": contenido})))
+        return contenido
+
+    def _entrada(self, path: Path, dtype: dict) -> Path:
+        tipos = repr(sorted((col, str(tipo)) for col, tipo in (dtype or {}).items()))
+        esquema = hashlib.sha256(f"{tipos}|{pd.__version__}|{pa.__version__}".encode()).hexdigest()
+        return self.directorio / f"{path.stem}-{self._hash_contenido(path)[:16]}-{esquema[:8]}.arrow"
+
+    def leer(self, path: Path, dtype: dict, lector) -> pd.DataFrame:
+        """
+        La tabla del CSV `path` leído con `dtype`: desde el cache si está, y si
+        no con `lector()` (p. ej. pd.read_csv), guardándola para la próxima.
+        """
+        entrada = self._entrada(Path(path), dtype)
+        if entrada.exists():
+            try:
+                df = _abrir(entrada, dtype)
+            except (OSError, pa.ArrowInvalid):
+                # Entrada dañada (o borrada por otro proceso): se vuelve a generar
+                entrada.unlink(missing_ok=True)
+            else:
+                os.utime(entrada)
+                contar("cache_aciertos", 1)
+                return df
+
+        df = lector()
+        contar("cache_fallos", 1)
+        try:
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            # Columnas object con tipos mezclados: la tabla se lee siempre del CSV
+            print(f"  raw cache skipped for {Path(path).name}: {e}")
+            return df
+
+        def escribir(destino):
+            with pa.OSFile(str(destino), 'wb') as f, pa.ipc.new_file(f, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+
+        _escribir_atomico(entrada, escribir)
+        self.recortar()
+        return df
+
+    def recortar(self):
+        """Borra las entradas menos usadas hasta que el cache entre en `limite_bytes`."""
+        entradas = []
+        for archivo in self.directorio.glob("*.arrow"):
+            try:
+                estado = archivo.stat()
+            except FileNotFoundError:
+                continue
+            entradas.append((estado.st_mtime_ns, estado.st_size, archivo))
+
+        total = sum(tamanio for _, tamanio, _ in entradas)
+        for _, tamanio, archivo in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            archivo.unlink(missing_ok=True)
+            total -= tamanio
+
+
+def _abrir(entrada: Path, dtype: dict) -> pd.DataFrame:
+    """
+    Abre la entrada con memory map. Las columnas de texto quedan como
+    ArrowStringArray sobre los buffers del archivo (sin copiar); el resto se
+    convierte con los dtypes guardados en los metadatos de pandas, con NaN
+    en los nulos como read_csv.
+    """
+    with pa.memory_map(str(entrada)) as fuente:
+        tabla = pa.ipc.open_file(fuente).read_all()
+
+    texto = [
+        col for col, tipo in (dtype or {}).items()
+        if col in tabla.column_names and isinstance(pd.api.types.pandas_dtype(tipo), pd.StringDtype)
+    ]
+    df = tabla.drop_columns(texto).to_pandas()
+    # Las columnas object vuelven con None en los nulos; read_csv deja NaN
+    for col in df.columns[df.dtypes == object]:
+        valores = df[col].to_numpy(dtype=object, copy=True)
+        valores[pd.isna(valores)] = np.nan
+        df[col] = valores
+    for col in texto:
+        df[col] = pd.arrays.ArrowStringArray(tabla.column(col))
+    return df[tabla.column_names]
@@ -0,0 +1,81 @@
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from carga import cargar_tabla, conexion
+from instrumentacion import filas_de_etapas, reglas_aplicadas
+
+
+# -----------------------
+# Métricas de calidad de la corrida
+# -----------------------
+# Mismas columnas que analytics.quality_metrics (sql/quality_metrics.sql)
+COLUMNAS_CALIDAD = [
+    "run_id", "run_at", "table_name", "column_name", "rule", "action",
+    "rows_affected", "rows_in", "affected_pct",
+]
+
+CALIDAD_SQL = Path(__file__).resolve().parent.parent / "sql" / "quality_metrics.sql"
+
+
+def metricas_calidad(run_id: str, run_at: datetime) -> pd.DataFrame:
+    """
+    Una fila por tabla, columna, regla y acción con las filas que la regla
+    afectó en la corrida y su porcentaje sobre las filas de entrada de la
+    tabla. Sale de los conteos que cada limpieza acumuló con contar_regla
+    (también los de los workers): no se vuelve a leer ninguna tabla. Las
+    reglas que no afectaron filas quedan en 0, para seguir la tasa en el tiempo.
+    """
+    filas = filas_de_etapas()
+    metricas = pd.DataFrame(
+        [(*clave, afectadas) for clave, afectadas in reglas_aplicadas().items()],
+        columns=["table_name", "column_name", "rule", "action", "rows_affected"],
+    )
+    metricas["rows_in"] = metricas["table_name"].map(filas).astype("Int64")
+    metricas["affected_pct"] = (
+        100 * metricas["rows_affected"] / metricas["rows_in"].where(metricas["rows_in"] > 0)
+    ).astype("float64").round(4)
+    metricas["run_id"] = run_id
+    metricas["run_at"] = pd.Timestamp(run_at).floor("s")
+    metricas = metricas.sort_values(["table_name", "column_name", "rule", "action"], kind="mergesort")
+    return metricas.reset_index(drop=True)[COLUMNAS_CALIDAD]
+
+
+def guardar_calidad(metricas: pd.DataFrame, run_id: str, directorio: Path, formato: str = "csv") -> Path:
+    """Escribe las métricas de la corrida en {directorio}/quality_{run_id}.csv (o .parquet)."""
+    directorio.mkdir(parents=True, exist_ok=True)
+    if formato == "parquet":
+        destino = directorio / f"quality_{run_id}.parquet"
+        metricas.to_parquet(destino, engine="pyarrow", index=False)
+    else:
+        destino = directorio / f"quality_{run_id}.csv"
+        metricas.to_csv(destino, index=False)
+    return destino
+
+
+def cargar_calidad(metricas: pd.DataFrame):
+    """
+    Agrega las métricas de la corrida a analytics.quality_metrics (la crea
+    desde sql/quality_metrics.sql si no existe). No se borran las de
+    corridas anteriores: la tabla es la historia de las tasas de suciedad.
+    """
+    con = conexion()
+    with con.cursor() as cur:
+        cur.execute("SELECT to_regclass('analytics.quality_metrics')")
+        if cur.fetchone()[0] is None:
+            cur.execute(CALIDAD_SQL.read_text(encoding="utf-8"))
+    con.commit()
+    cargar_tabla(metricas, "quality_metrics", tabla="analytics.quality_metrics")
+
+
+def generar_calidad(run_id: str, run_at: datetime, directorio: Path, formato: str = "csv",
+                    cargar: bool = False) -> pd.DataFrame:
+    """Arma, guarda (y con `cargar` carga) las métricas de calidad de la corrida."""
+    metricas = metricas_calidad(run_id, run_at)
+    destino = guardar_calidad(metricas, run_id, directorio, formato)
+    print(f"  Quality metrics: {len(metricas)} rules, "
+          f"{int(metricas['rows_affected'].sum()):,} rows affected -> {destino}")
+    if cargar:
+        cargar_calidad(metricas)
+    return metricas
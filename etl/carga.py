@@ -0,0 +1,133 @@
+import io
+import os
+import time
+
+import pandas as pd
+import psycopg2
+from dotenv import load_dotenv
+
+from almacenamiento import FORMATO_FECHA_CSV
+from instrumentacion import medido
+
+
+# -----------------------
+# Conexión
+# -----------------------
+# Mismos valores por defecto que docker-compose.yml (puerto publicado 5433)
+def config_postgres() -> dict:
+    """Parámetros de conexión desde el entorno (o un .env)."""
+    load_dotenv()
+    return {
+        "host": os.getenv("POSTGRES_HOST", "localhost"),
+        "port": int(os.getenv("POSTGRES_PORT", "5433")),
+        "dbname": os.getenv("POSTGRES_DB", "olist_analytics"),
+        "user": os.getenv("POSTGRES_USER", "olist_user"),
+        "password": os.getenv("POSTGRES_PASSWORD", "olist_pass"),
+    }
+
+
+# Una conexión por proceso, reutilizada por todas las tablas que carga ese
+# proceso (con --workers, cada worker del pool tiene la suya)
+_CONEXIONES = {}
+
+
+def conexion():
+    # Un worker creado con fork hereda el dict pero no debe usar el socket del padre
+    con = _CONEXIONES.get(os.getpid())
+    if con is None or con.closed:
+        con = _CONEXIONES[os.getpid()] = psycopg2.connect(**config_postgres())
+    return con
+
+
+# -----------------------
+# Carga con COPY FROM STDIN
+# -----------------------
+# Tablas public.*_clean (sql/clean_tables.sql)
+TABLAS_CLEAN = [
+    "categories", "customers", "sellers", "products", "geolocation",
+    "orders", "order_items", "payments", "reviews",
+]
+
+# Filas por cada COPY: acota el buffer en memoria para tablas grandes
+FILAS_POR_COPY = 200_000
+
+# Las tablas se copian primero a staging.{t}_clean (UNLOGGED, sin constraints)
+# y pasan a public en una sola transacción al final: si la corrida falla a
+# mitad de la carga, public.*_clean queda como estaba
+ESQUEMA_STAGING = "staging"
+
+
+def preparar_staging(tablas=TABLAS_CLEAN):
+    """Crea vacías las tablas staging.{t}_clean, con las columnas de public.{t}_clean."""
+    con = conexion()
+    with con.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {ESQUEMA_STAGING}")
+        for t in tablas:
+            cur.execute(f"DROP TABLE IF EXISTS {ESQUEMA_STAGING}.{t}_clean")
+            cur.execute(
+                f"CREATE UNLOGGED TABLE {ESQUEMA_STAGING}.{t}_clean (LIKE public.{t}_clean INCLUDING DEFAULTS)"
+            )
+    con.commit()
+
+
+def publicar_tablas(tablas=TABLAS_CLEAN):
+    """
+    Reemplaza public.{t}_clean por lo cargado en staging en una transacción:
+    TRUNCATE de todas de una vez, como sql/load_clean_data.sql, e INSERT en
+    orden de dependencias (las PKs y FKs se validan acá). Si algo falla no
+    cambia nada.
+    """
+    con = conexion()
+    try:
+        with con.cursor() as cur:
+            cur.execute(
+                "TRUNCATE TABLE " + ", ".join(f"public.{t}_clean" for t in tablas) + " CASCADE"
+            )
+            for t in tablas:
+                cur.execute(f"INSERT INTO public.{t}_clean SELECT * FROM {ESQUEMA_STAGING}.{t}_clean")
+            cur.execute(f"DROP SCHEMA {ESQUEMA_STAGING} CASCADE")
+    except psycopg2.Error as e:
+        con.rollback()
+        raise RuntimeError(f"Publishing the clean tables failed, public was left unchanged: {e}") from e
+    con.commit()
+
+
+def _buffer_csv(df: pd.DataFrame) -> io.StringIO:
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, date_format=FORMATO_FECHA_CSV)
+    buffer.seek(0)
+    return buffer
+
+
+@medido("copy_postgres")
+def cargar_tabla(df: pd.DataFrame, nombre: str, tabla: str = None, confirmar: bool = True) -> float:
+    """
+    Carga el DataFrame en staging.{nombre}_clean (o en `tabla`) con COPY FROM
+    STDIN desde un buffer en memoria, sin pasar por un CSV en disco. Las
+    columnas van por posición, igual que el COPY de sql/load_clean_data.sql.
+    Con confirmar=False no hace commit: queda en la transacción de quien llama.
+
+    Devuelve las filas por segundo.
+    """
+    tabla = tabla or f"{ESQUEMA_STAGING}.{nombre}_clean"
+    con = conexion()
+    inicio = time.perf_counter()
+
+    try:
+        with con.cursor() as cur:
+            for desde in range(0, len(df), FILAS_POR_COPY):
+                cur.copy_expert(
+                    f"COPY {tabla} FROM STDIN WITH (FORMAT csv)",
+                    _buffer_csv(df.iloc[desde:desde + FILAS_POR_COPY]),
+                )
+    except psycopg2.Error as e:
+        # Sin rollback la conexión queda inutilizable para las tablas siguientes
+        con.rollback()
+        raise RuntimeError(f"Loading {tabla} failed: {e}") from e
+    if confirmar:
+        con.commit()
+
+    segundos = time.perf_counter() - inicio
+    filas_por_segundo = len(df) / segundos if segundos > 0 else float("inf")
+    print(f"  {tabla} loaded: {len(df)} rows in {segundos:.2f}s ({filas_por_segundo:,.0f} rows/s)")
+    return filas_por_segundo
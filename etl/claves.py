@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # sin pyarrow: las claves quedan en un pd.Index
+    pa = None
+
+
+# -----------------------
+# Índice de claves (integridad referencial)
+# -----------------------
+class IndiceClaves:
+    """
+    Claves válidas de una tabla padre (p. ej. los order_id limpios), sin
+    repetidos ni nulos, para filtrar las tablas hijas por integridad
+    referencial con una consulta vectorizada.
+
+    Se arma una vez por tabla padre. Con pyarrow las claves son un único
+    array de strings de Arrow (un buffer, sin un objeto str por clave) y
+    contiene() usa pyarrow.compute.is_in; sin pyarrow son un pd.Index, que
+    arma su tabla de hash en la primera consulta y la reutiliza.
+
+    Se serializa con pickle: así viaja a los workers que limpian las tablas
+    hijas y se guarda en el estado del modo incremental.
+    """
+
+    def __init__(self, valores=()):
+        self._claves = valores._claves if isinstance(valores, IndiceClaves) else _unicas(valores)
+
+    @classmethod
+    def desde_partes(cls, partes) -> "IndiceClaves":
+        """Índice con las claves de varias partes (chunks, corridas), uniéndolas de una vez."""
+        indices = [indice for indice in map(cls, partes) if len(indice)]
+        if len(indices) <= 1:
+            return indices[0] if indices else cls()
+        claves = [indice._claves for indice in indices]
+        if pa is None:
+            return cls(claves[0].append(claves[1:]))
+        return cls(pa.chunked_array([c.cast(claves[0].type) for c in claves]))
+
+    def __len__(self):
+        return len(self._claves)
+
+    def __repr__(self):
+        return f"IndiceClaves({len(self)} keys)"
+
+    def unir(self, valores) -> "IndiceClaves":
+        """Nuevo índice con estas claves más `valores` (array, Series u otro índice)."""
+        return IndiceClaves.desde_partes([self, valores])
+
+    def contiene(self, serie: pd.Series) -> np.ndarray:
+        """Máscara de las filas de `serie` cuyo valor está en el índice (los nulos no están)."""
+        if pa is None:
+            return self._claves.get_indexer(serie.to_numpy(dtype=object)) >= 0
+        if len(self) == 0:
+            return np.zeros(len(serie), dtype=bool)
+        return pc.is_in(_a_arrow(serie), value_set=self._claves).to_numpy(zero_copy_only=False)
+
+    def comparte(self, otro: "IndiceClaves") -> bool:
+        """Si alguna clave de `otro` está en este índice."""
+        return bool(self._en_indice(otro).any())
+
+    def incluye(self, otro: "IndiceClaves") -> bool:
+        """Si todas las claves de `otro` están en este índice."""
+        return bool(self._en_indice(otro).all())
+
+    def _en_indice(self, otro: "IndiceClaves") -> np.ndarray:
+        if pa is None:
+            return self._claves.get_indexer(otro._claves) >= 0
+        if len(self) == 0 or len(otro) == 0:
+            return np.zeros(len(otro), dtype=bool)
+        return pc.is_in(otro._claves, value_set=self._claves).to_numpy(zero_copy_only=False)
+
+    def huerfanas(self, serie: pd.Series) -> int:
+        """Filas de `serie` (la FK de una tabla hija) sin su clave en el índice."""
+        return int(np.count_nonzero(~self.contiene(serie)))
+
+
+def _a_arrow(valores):
+    """Array de Arrow, sin pasar por str de Python si los valores ya son de Arrow."""
+    if isinstance(valores, (pa.Array, pa.ChunkedArray)):
+        return valores
+    if isinstance(valores, (pd.Series, pd.Index)):
+        valores = valores.array
+    if isinstance(valores, pd.arrays.ArrowStringArray):
+        return pa.array(valores)
+    return pa.array(np.asarray(valores, dtype=object), from_pandas=True)
+
+
+def _unicas(valores):
+    """Claves distintas y no nulas de `valores`, en el formato del índice."""
+    if isinstance(valores, (set, frozenset)):
+        valores = list(valores)
+    if pa is None:
+        valores = pd.Series(np.asarray(valores, dtype=object), dtype=object)
+        return pd.Index(valores.dropna().unique(), dtype=object)
+
+    claves = pc.unique(_a_arrow(valores).drop_null())
+    return claves.combine_chunks() if isinstance(claves, pa.ChunkedArray) else claves
@@ -1,740 +1,1039 @@
-import pandas as pd
-import numpy as np
-import unicodedata
-from pathlib import Path
-from calendar import monthrange
-
-# -----------------------
-# Paths
-# -----------------------
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-RAW_DIR = BASE_DIR / "data" / "raw"
-CLEAN_DIR = BASE_DIR / "data" / "clean"
-
-
-# -----------------------
-# Load function
-# -----------------------
-def load_csv(filename: str) -> pd.DataFrame:
-    path = RAW_DIR / filename
-    return pd.read_csv(path)
-
-
-# -----------------------
-# Helpers
-# -----------------------
-ESTADOS_BRASIL = [
-    'AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
-    'MT', 'MS', 'MG', 'PA', 'PB', 'PR', 'PE', 'PI', 'RJ', 'RN',
-    'RS', 'RO', 'RR', 'SC', 'SP', 'SE', 'TO'
-]
-
-def normalizar_string(valor):
-    """Normaliza strings limpiando encoding, espacios y caracteres especiales."""
-    if pd.isna(valor):
-        return np.nan
-    
-    valor = str(valor).strip()
-    
-    # Detectar valores nulos
-    valores_nulos = ['NONE', 'NÃNE', 'NÃ³NE', 'NAN', 'NULL', 'N/A', 'NA', '']
-    if valor.upper() in valores_nulos:
-        return np.nan
-    
-    # Corregir encoding
-    try:
-        valor = valor.encode('latin1', errors='ignore').decode('utf-8', errors='ignore')
-    except:
-        pass
-    
-    # Normalizar Unicode y eliminar acentos
-    valor = unicodedata.normalize('NFKD', valor)
-    valor = valor.encode('ASCII', 'ignore').decode('ASCII')
-    valor = ' '.join(valor.split())
-    
-    return np.nan if valor == '' else valor
-
-
-def corregir_fecha_invalida(serie):
-    """
-    Parsea fechas en múltiples formatos.
-    Si la fecha es inválida (mes > 12 o componentes fuera de rango), devuelve NaT.
-    """
-    # 0. Limpiar la serie antes de parsear
-    serie_limpia = serie.astype(str).str.strip()
-    
-    # 1. Primer intento: conversión estándar (captura ISO y formatos estándar)
-    resultado = pd.to_datetime(serie_limpia, errors='coerce')
-    
-    # 2. Segundo intento: para los que fallaron, intentar con dayfirst=True (formato brasileño DD/MM/YYYY)
-    mask_fallidos = resultado.isna() & serie.notna()
-    if mask_fallidos.sum() > 0:
-        resultado[mask_fallidos] = pd.to_datetime(serie_limpia[mask_fallidos], errors='coerce', dayfirst=True)
-
-    # 3. Identificar los que TODAVÍA fallan y tienen '/' (posible formato DD/MM/YYYY problemático)
-    mask_fallidos = resultado.isna() & serie.notna()
-    mask_con_barra = serie_limpia.str.contains('/', na=False)
-    mask_procesar = mask_fallidos & mask_con_barra
-
-    if mask_procesar.sum() == 0:
-        return resultado
-
-    # 4. Procesar cadenas con '/' de forma estricta
-    def procesar_dd_mm_yyyy(fecha_str):
-        try:
-            # Limpiar espacios en blanco
-            fecha_str = str(fecha_str).strip()
-            
-            # Separar fecha y hora (si existe)
-            partes = fecha_str.split()
-            fecha_parte = partes[0]
-            hora_parte = partes[1] if len(partes) > 1 and partes[1] else '00:00:00'
-
-            componentes = fecha_parte.split('/')
-            if len(componentes) != 3:
-                return pd.NaT
-
-            day, month, year = map(int, componentes)
-
-            # Si el mes es inválido, devolvemos NaT
-            if month < 1 or month > 12:
-                return pd.NaT
-
-            # Validar rango de años (2016-2018)
-            if year < 2016 or year > 2018:
-                return pd.NaT
-
-            # Validar el día según el mes y año
-            max_day = monthrange(year, month)[1]
-            if day < 1 or day > max_day:
-                return pd.NaT
-
-            # Reconstruir en formato estándar
-            fecha_corregida = f"{year}-{month:02d}-{day:02d} {hora_parte}"
-            return pd.to_datetime(fecha_corregida)
-
-        except:
-            return pd.NaT
-
-    # Aplicar solo a los registros problemáticos
-    resultado[mask_procesar] = serie_limpia[mask_procesar].apply(procesar_dd_mm_yyyy)
-
-    return resultado
-
-
-def imputar_zip_code(df, zip_col, city_col, state_col):
-    """Imputa zip codes inválidos (NaN o <= 0) usando moda por ciudad/estado."""
-    df = df.copy()
-    
-    # Crear lookups con valores válidos
-    zip_por_ciudad_estado = (
-        df[df[zip_col] > 0]
-        .groupby([city_col, state_col])[zip_col]
-        .agg(lambda x: x.mode()[0] if len(x.mode()) > 0 else np.nan)
-        .to_dict()
-    )
-    
-    zip_por_estado = (
-        df[df[zip_col] > 0]
-        .groupby(state_col)[zip_col]
-        .agg(lambda x: x.mode()[0] if len(x.mode()) > 0 else np.nan)
-        .to_dict()
-    )
-    
-    # Imputar
-    mask_imputar = df[zip_col].isna() | (df[zip_col] <= 0)
-    
-    for idx in df[mask_imputar].index:
-        city = df.loc[idx, city_col]
-        state = df.loc[idx, state_col]
-        
-        # Intentar por ciudad+estado
-        if pd.notna(city) and pd.notna(state):
-            zip_imputado = zip_por_ciudad_estado.get((city, state))
-            if pd.notna(zip_imputado):
-                df.loc[idx, zip_col] = zip_imputado
-                continue
-        
-        # Fallback por estado
-        if pd.notna(state):
-            zip_imputado = zip_por_estado.get(state)
-            if pd.notna(zip_imputado):
-                df.loc[idx, zip_col] = zip_imputado
-    
-    return df
-
-
-# -----------------------
-# Customers
-# -----------------------
-def clean_customers(df: pd.DataFrame) -> pd.DataFrame:
-    """Limpia y normaliza datos de customers."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all')
-    df = df.drop_duplicates()
-
-    # Normalizar customer_id
-    df['customer_id'] = df['customer_id'].apply(normalizar_string)
-    df = df[df['customer_id'].notna()]
-    df = df.drop_duplicates(subset='customer_id', keep = "first")
-
-    # Normalizar customer_city
-    df['customer_city'] = (
-        df['customer_city']
-        .apply(normalizar_string)
-        .str.lower()
-        .str.title()
-    )
-
-    # Normalizar y validar customer_state
-    df['customer_state'] = df['customer_state'].apply(normalizar_string).str.upper()
-    df.loc[~df['customer_state'].isin(ESTADOS_BRASIL), 'customer_state'] = np.nan
-
-    # Eliminar FAKE_KEY sin datos geográficos
-    df = df[
-        ~(
-            df['customer_id'].str.contains('FAKE_KEY', na=False) &
-            df['customer_city'].isna() &
-            df['customer_state'].isna()
-        )
-    ]
-
-    df.loc[
-        (df['customer_zip_code_prefix'] <= 0) |
-        (df['customer_zip_code_prefix'] > 99999),
-        'customer_zip_code_prefix'
-    ] = np.nan
-
-    # Imputar zip codes inválidos
-    df = imputar_zip_code(df, 'customer_zip_code_prefix', 'customer_city', 'customer_state')
-
-    # Limpiar columnas innecesarias y formatear
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-
-    # Capitalizar ciudad
-    df['customer_city'] = df['customer_city'].str.title()
-
-    df['customer_zip_code_prefix'] = df['customer_zip_code_prefix'].astype('Int64')
-
-    return df
-
-
-# -----------------------
-# Orders
-# -----------------------
-def clean_orders(df: pd.DataFrame, valid_customer_ids: set = None) -> pd.DataFrame:
-    """Limpia y normaliza datos de órdenes."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all').drop_duplicates()
-
-    # Normalizar IDs y status
-    df['order_id'] = df['order_id'].apply(normalizar_string)
-    df['customer_id'] = df['customer_id'].apply(normalizar_string)
-    df['order_status'] = df['order_status'].apply(normalizar_string).str.lower()
-
-    # Eliminar registros sin order_id y duplicados
-    df = df[df['order_id'].notna()]
-
-    # Filtrar por customer_ids válidos (integridad referencial)
-    if valid_customer_ids is not None:
-        before = len(df)
-        df = df[df['customer_id'].isin(valid_customer_ids)]
-        print(f"  Removed {before - len(df)} orders with invalid customer_id")
-
-    df = df.drop_duplicates(subset='order_id')
-
-    # Convertir columnas de fechas
-    date_columns = [
-        "order_purchase_timestamp",
-        "order_approved_at",
-        "order_delivered_carrier_date",
-        "order_delivered_customer_date",
-        "order_estimated_delivery_date",
-    ]
-
-    for col in date_columns:
-        df[col] = corregir_fecha_invalida(df[col])
-    
-    # Validación de rango de fechas (red de seguridad)
-    fecha_min = pd.Timestamp('2016-01-01')
-    fecha_max = pd.Timestamp('2018-12-31')
-    
-    for col in date_columns:
-        mask_fuera_rango = (
-            df[col].notna() & 
-            ((df[col] < fecha_min) | (df[col] > fecha_max))
-        )
-        if mask_fuera_rango.sum() > 0:
-            df.loc[mask_fuera_rango, col] = pd.NaT
-
-    # approved >= purchase (corregir si approved < purchase)
-    mask = (
-        df['order_approved_at'].notna() &
-        df['order_purchase_timestamp'].notna() &
-        (df['order_approved_at'] < df['order_purchase_timestamp'])
-    )
-    if mask.sum() > 0:
-        df.loc[mask, 'order_approved_at'] = df.loc[mask, 'order_purchase_timestamp']
-
-    # carrier >= approved
-    mask = (
-        df['order_delivered_carrier_date'].notna() &
-        df['order_approved_at'].notna() &
-        (df['order_delivered_carrier_date'] < df['order_approved_at'])
-    )
-    if mask.sum() > 0:
-        df.loc[mask, 'order_delivered_carrier_date'] = pd.NaT
-
-    # customer >= carrier
-    mask = (
-        df['order_delivered_customer_date'].notna() &
-        df['order_delivered_carrier_date'].notna() &
-        (df['order_delivered_customer_date'] < df['order_delivered_carrier_date'])
-    )
-    if mask.sum() > 0:
-        df.loc[mask, 'order_delivered_customer_date'] = pd.NaT
-
-    # Limpiar columnas innecesarias
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-
-    return df
-
-
-# -----------------------
-# Order Items
-# -----------------------
-def clean_order_items(df: pd.DataFrame, valid_order_ids: set = None, valid_product_ids: set = None, valid_seller_ids: set = None) -> pd.DataFrame:
-    """Limpia y normaliza datos de ítems de órdenes."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all').drop_duplicates()
-
-    # Normalizar IDs
-    df['order_id'] = df['order_id'].apply(normalizar_string)
-    df['product_id'] = df['product_id'].apply(normalizar_string)
-    df['seller_id'] = df['seller_id'].apply(normalizar_string)
-
-    # Eliminar registros sin IDs críticos
-    df = df[df['order_id'].notna() & df['product_id'].notna()]
-
-    # Filtrar por IDs válidos (integridad referencial)
-    if valid_order_ids is not None:
-        before = len(df)
-        df = df[df['order_id'].isin(valid_order_ids)]
-        print(f"  Removed {before - len(df)} order_items with invalid order_id")
-    
-    if valid_product_ids is not None:
-        before = len(df)
-        df = df[df['product_id'].isin(valid_product_ids)]
-        print(f"  Removed {before - len(df)} order_items with invalid product_id")
-    
-    if valid_seller_ids is not None:
-        before = len(df)
-        df = df[df['seller_id'].isin(valid_seller_ids)]
-        print(f"  Removed {before - len(df)} order_items with invalid seller_id")
-
-    # Eliminar duplicados por order_id + order_item_id
-    df = df.drop_duplicates(subset=['order_id', 'order_item_id'])
-
-    # Convertir fecha
-    df['shipping_limit_date'] = corregir_fecha_invalida(df['shipping_limit_date'])
-
-    # Limpiar valores numéricos inválidos
-    df.loc[df['price'] < 0, 'price'] = np.nan
-    df.loc[df['price'] > 50000, 'price'] = np.nan
-    df.loc[df['freight_value'] < 0, 'freight_value'] = np.nan
-    df.loc[df['freight_value'] > 10000, 'freight_value'] = np.nan
-
-    # Eliminar registros sin price (crítico)
-    df = df[df['price'].notna()]
-
-    # Limpiar columnas innecesarias
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-
-    return df
-
-
-# -----------------------
-# Payments
-# -----------------------
-def clean_payments(df: pd.DataFrame, valid_order_ids: set = None) -> pd.DataFrame:
-    """Limpia y normaliza datos de pagos."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all').drop_duplicates()
-
-    # Normalizar IDs y payment_type
-    df['order_id'] = df['order_id'].apply(normalizar_string)
-    df['payment_type'] = df['payment_type'].apply(normalizar_string).str.lower()
-
-    # Eliminar registros sin order_id
-    df = df[df['order_id'].notna()]
-
-    # Filtrar por order_ids válidos
-    if valid_order_ids is not None:
-        before = len(df)
-        df = df[df['order_id'].isin(valid_order_ids)]
-        print(f"  Removed {before - len(df)} payments with invalid order_id")
-
-    # Eliminar duplicados por order_id + payment_sequential
-    df = df.drop_duplicates(subset=['order_id', 'payment_sequential'])
-
-    # Limpiar valores numéricos inválidos
-    df.loc[(df['payment_sequential'] < 1) | (df['payment_sequential'] > 100), 'payment_sequential'] = np.nan
-    df.loc[(df['payment_installments'] < 1) | (df['payment_installments'] > 24), 'payment_installments'] = np.nan
-    df.loc[(df['payment_value'] <= 0) | (df['payment_value'] > 50000), 'payment_value'] = np.nan
-
-    # Eliminar registros sin payment_value
-    df = df[df['payment_value'].notna()]
-
-    # Limpiar columnas innecesarias
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-
-    return df
-
-
-# -----------------------
-# Products
-# -----------------------
-def clean_products(df: pd.DataFrame) -> pd.DataFrame:
-    """Limpia y normaliza datos de productos."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all').drop_duplicates()
-
-    # Normalizar IDs y categorías
-    df['product_id'] = df['product_id'].apply(normalizar_string)
-    df['product_category_name'] = df['product_category_name'].apply(normalizar_string)
-
-    # Corregir typos y duplicados en categorías
-    correcciones_categorias = {
-        'electrncos': 'eletronicos',
-        'ELETRONICOOS': 'eletronicos',
-        'Electronics': 'eletronicos',
-        'categria': 'eletronicos',
-        'casa_conforto_2': 'casa_conforto',
-        'eletrodomesticos_2': 'eletrodomesticos',
-        'nan': None
-    }
-
-    df['product_category_name'] = df['product_category_name'].replace(correcciones_categorias)
-
-    # Eliminar registros sin product_id
-    df = df[df['product_id'].notna()]
-
-    # Eliminar duplicados por product_id
-    df = df.drop_duplicates(subset='product_id')
-
-    numeric_cols = [
-        'product_name_lenght', 
-        'product_description_lenght', 
-        'product_photos_qty',
-        "product_weight_g",
-        "product_length_cm",
-        "product_height_cm",
-        "product_width_cm",
-    ]
-
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-        df.loc[(df[col] < 0) | (df[col] > 50000), col] = np.nan
-
-    # Limpiar columnas innecesarias
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-
-    return df
-
-
-# -----------------------
-# Reviews
-# -----------------------
-def clean_reviews(df: pd.DataFrame, valid_order_ids: set = None) -> pd.DataFrame:
-    """Limpia y normaliza datos de reviews."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all').drop_duplicates()
-
-    # Normalizar IDs y comentarios
-    df['review_id'] = df['review_id'].apply(normalizar_string)
-    df['order_id'] = df['order_id'].apply(normalizar_string)
-    df['review_comment_title'] = df['review_comment_title'].apply(normalizar_string)
-    df['review_comment_message'] = df['review_comment_message'].apply(normalizar_string)
-
-    # Eliminar registros sin IDs críticos
-    df = df[df['review_id'].notna() & df['order_id'].notna()]
-
-    # Filtrar por order_ids válidos
-    if valid_order_ids is not None:
-        before = len(df)
-        df = df[df['order_id'].isin(valid_order_ids)]
-        print(f"  Removed {before - len(df)} reviews with invalid order_id")
-
-    # Eliminar duplicados por review_id
-    df = df.drop_duplicates(subset='review_id')
-
-    df["review_score"] = pd.to_numeric(df["review_score"], errors="coerce")
-    df = df[df["review_score"].between(1, 5)]
-
-    # Convertir fechas
-    df['review_creation_date'] = corregir_fecha_invalida(df['review_creation_date'])
-    df['review_answer_timestamp'] = corregir_fecha_invalida(df['review_answer_timestamp'])
-
-    # Validar lógica temporal: answer >= creation
-    mask = (
-        df['review_answer_timestamp'].notna() &
-        df['review_creation_date'].notna() &
-        (df['review_answer_timestamp'] < df['review_creation_date'])
-    )
-    if mask.sum() > 0:
-        df.loc[mask, 'review_answer_timestamp'] = pd.NaT
-
-    # Limpiar columnas innecesarias
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-
-    return df
-
-
-# -----------------------
-# Sellers
-# -----------------------
-def clean_sellers(df: pd.DataFrame) -> pd.DataFrame:
-    """Limpia y normaliza datos de vendedores."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all').drop_duplicates()
-
-    # Normalizar seller_id y ubicación
-    df['seller_id'] = df['seller_id'].apply(normalizar_string)
-    df['seller_city'] = df['seller_city'].apply(normalizar_string).str.lower()
-    df['seller_state'] = df['seller_state'].apply(normalizar_string).str.upper()
-
-    # Validar seller_state contra estados brasileños
-    df.loc[~df['seller_state'].isin(ESTADOS_BRASIL), 'seller_state'] = np.nan
-
-    # Eliminar registros sin seller_id
-    df = df[df['seller_id'].notna()]
-
-    # Eliminar duplicados por seller_id
-    df = df.drop_duplicates(subset='seller_id')
-
-    # Limpiar seller_zip_code_prefix inválidos ANTES de imputar
-    df.loc[
-        (df['seller_zip_code_prefix'] <= 0) | 
-        (df['seller_zip_code_prefix'] > 99999), 
-        'seller_zip_code_prefix'
-    ] = np.nan
-    
-    # Imputar seller_zip_code_prefix
-    df = imputar_zip_code(df, 'seller_zip_code_prefix', 'seller_city', 'seller_state')
-    
-    # Limpiar y formatear columnas finales
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-
-    df['seller_city'] = df['seller_city'].str.title()
-
-    df['seller_zip_code_prefix'] = df['seller_zip_code_prefix'].astype('Int64')
-
-    return df
-
-
-# -----------------------
-# Geolocation
-# -----------------------
-def clean_geolocation(df: pd.DataFrame) -> pd.DataFrame:
-    """Limpia y normaliza datos de geolocalización."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all').drop_duplicates()
-
-    # Normalizar city y state
-    df['geolocation_city'] = df['geolocation_city'].apply(normalizar_string).str.title()
-    df['geolocation_state'] = df['geolocation_state'].apply(normalizar_string).str.upper()
-
-    # Validar geolocation_state contra estados brasileños
-    df.loc[~df['geolocation_state'].isin(ESTADOS_BRASIL), 'geolocation_state'] = np.nan
-
-    # Convertir coordenadas a float
-    df['geolocation_lat'] = pd.to_numeric(df['geolocation_lat'], errors='coerce')
-    df['geolocation_lng'] = pd.to_numeric(df['geolocation_lng'], errors='coerce')
-
-    # Limpiar geolocation_zip_code_prefix inválidos
-    df.loc[
-        (df['geolocation_zip_code_prefix'] <= 0) | 
-        (df['geolocation_zip_code_prefix'] > 99999), 
-        'geolocation_zip_code_prefix'
-    ] = np.nan
-
-    # Limpiar coordenadas inválidas (Brasil: lat -34 a 6, lng -75 a -33)
-    df.loc[
-        (df['geolocation_lat'] < -34) | 
-        (df['geolocation_lat'] > 6), 
-        'geolocation_lat'
-    ] = np.nan
-
-    df.loc[
-        (df['geolocation_lng'] < -75) | 
-        (df['geolocation_lng'] > -33), 
-        'geolocation_lng'
-    ] = np.nan
-
-    # Eliminar registros sin datos críticos
-    df = df[
-        df['geolocation_zip_code_prefix'].notna() &
-        df['geolocation_lat'].notna() &
-        df['geolocation_lng'].notna()
-    ]
-
-    # Formatear columnas finales
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-
-    df['geolocation_zip_code_prefix'] = df['geolocation_zip_code_prefix'].astype('Int64')
-
-    return df
-
-
-# -----------------------
-# Category Translation
-# -----------------------
-def clean_category_translation(df: pd.DataFrame) -> pd.DataFrame:
-    """Limpia y normaliza datos de traducción de categorías."""
-    df = df.copy()
-
-    # Eliminar filas vacías y duplicados
-    df = df.dropna(how='all').drop_duplicates()
-
-    # Normalizar ambas columnas
-    df['product_category_name'] = df['product_category_name'].apply(normalizar_string).str.lower()
-    df['product_category_name_english'] = df['product_category_name_english'].apply(normalizar_string).str.lower()
-
-    # Corregir typos y duplicados semánticos
-    correcciones_pt = {
-        'electrncos': 'eletronicos',
-        'eletronicoos': 'eletronicos',
-        'categria': 'eletronicos',
-        'casa_conforto_2': 'casa_conforto'
-    }
-    
-    correcciones_en = {
-        'eletronicos': 'electronics',
-        'eletronicoos': 'electronics',
-        'costruction_tools_tools': 'construction_tools_tools',
-        'costruction_tools_garden': 'construction_tools_garden',
-        'home_comfort_2': 'home_comfort',
-        'home_confort': 'home_comfort',
-        'construction_tools_tools': 'construction_tools',
-        'la_cuisine': 'kitchen',
-        'market_place': 'marketplace'
-    }
-    
-    df['product_category_name'] = df['product_category_name'].replace(correcciones_pt)
-    df['product_category_name_english'] = df['product_category_name_english'].replace(correcciones_en)
-
-    # Eliminar registros sin product_category_name
-    df = df[df['product_category_name'].notna()]
-    
-    # Eliminar duplicados por product_category_name
-    df = df.drop_duplicates(subset='product_category_name')
-    
-    # Agregar nuevas traducciones faltantes
-    nuevas_traducciones = pd.DataFrame([
-        {'product_category_name': 'automotivo', 'product_category_name_english': 'automotive'},
-        {'product_category_name': 'beleza_saude', 'product_category_name_english': 'health_beauty'},
-        {'product_category_name': 'cool_stuff', 'product_category_name_english': 'cool_stuff'},
-        {'product_category_name': 'eletroportateis', 'product_category_name_english': 'small_appliances'},
-        {'product_category_name': 'papelaria', 'product_category_name_english': 'stationery'},
-        {'product_category_name': 'moveis_decoracao', 'product_category_name_english': 'furniture_decor'},
-        {'product_category_name': 'alimentos_bebidas', 'product_category_name_english': 'food_drinks'},
-        {'product_category_name': 'construcao_ferramentas_seguranca', 'product_category_name_english': 'construction_tools_safety'},
-        {'product_category_name': 'fashion_esporte', 'product_category_name_english': 'fashion_sport'},
-        {'product_category_name': 'fashion_roupa_feminina', 'product_category_name_english': 'fashion_female_clothing'},
-        {'product_category_name': 'fashion_underwear_e_moda_praia', 'product_category_name_english': 'fashion_underwear_beach'},
-        {'product_category_name': 'pc_gamer', 'product_category_name_english': 'gaming_pc'},
-        {'product_category_name': 'portateis_cozinha_e_preparadores_de_alimentos', 'product_category_name_english': 'portable_kitchen_food_processors'},
-        {'product_category_name': 'tablets_impressao_imagem', 'product_category_name_english': 'tablets_printing_image'}
-    ])
-    
-    # Agregar solo las que no existen ya
-    categorias_existentes = set(df['product_category_name'].unique())
-    nuevas_a_agregar = nuevas_traducciones[~nuevas_traducciones['product_category_name'].isin(categorias_existentes)]
-    
-    if len(nuevas_a_agregar) > 0:
-        df = pd.concat([df, nuevas_a_agregar], ignore_index=True)
-    
-    # Limpiar columnas innecesarias
-    df = df.drop('noise_flag', axis=1, errors='ignore')
-    
-    return df
-
-
-# -----------------------
-# Main
-# -----------------------
-def main():
-    print("Starting CLEAN pipeline")
-
-    CLEAN_DIR.mkdir(parents=True, exist_ok=True)
-
-    # Diccionario para guardar IDs válidos entre iteraciones
-    valid_ids = {}
-
-    pipelines = [
-        ("customers", "olist_customers_dataset_dirty.csv", clean_customers),
-        ("products", "olist_products_dataset_dirty.csv", clean_products),
-        ("sellers", "olist_sellers_dataset_dirty.csv", clean_sellers),
-        ("categories", "product_category_name_translation_dirty.csv", clean_category_translation),
-        ("geolocation", "olist_geolocation_dataset_dirty.csv", clean_geolocation),
-        ("orders", "olist_orders_dataset_dirty.csv", clean_orders),
-        ("order_items", "olist_order_items_dataset_dirty.csv", clean_order_items),
-        ("payments", "olist_order_payments_dataset_dirty.csv", clean_payments),
-        ("reviews", "olist_order_reviews_dataset_dirty.csv", clean_reviews),
-    ]
-
-    for name, file, func in pipelines:
-        df = load_csv(file)
-        print(f"{name} loaded:", df.shape)
-
-        # Pasar valid_ids según la función
-        if name == "orders":
-            df_clean = func(df, valid_ids.get('customer_id'))
-        elif name == "order_items":
-            df_clean = func(df, valid_ids.get('order_id'), valid_ids.get('product_id'), valid_ids.get('seller_id'))
-        elif name in ["payments", "reviews"]:
-            df_clean = func(df, valid_ids.get('order_id'))
-        else:
-            df_clean = func(df)
-        
-        print(f"{name} cleaned:", df_clean.shape)
-
-        # Guardar IDs válidos para las siguientes tablas
-        if name == "customers" and 'customer_id' in df_clean.columns:
-            valid_ids['customer_id'] = set(df_clean['customer_id'].unique())
-        elif name == "orders" and 'order_id' in df_clean.columns:
-            valid_ids['order_id'] = set(df_clean['order_id'].unique())
-        elif name == "products" and 'product_id' in df_clean.columns:
-            valid_ids['product_id'] = set(df_clean['product_id'].unique())
-        elif name == "sellers" and 'seller_id' in df_clean.columns:
-            valid_ids['seller_id'] = set(df_clean['seller_id'].unique())
-
-        df_clean.to_csv(
-            CLEAN_DIR / f"{name}_clean.csv",
-            index=False,
-            date_format="%Y-%m-%d %H:%M:%S"
-        )
-        print(f"{name} CLEAN saved")
-
-    print("CLEAN pipeline finished")
-
-
-if __name__ == "__main__":
-    main()
+import argparse
+import contextlib
+import functools
+import hashlib
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from normalizacion import normalizar_string, aplicar_a_valores, informar_normalizacion, CACHE_NORMALIZACION
+from reglas import Columna, ReglasTabla
+from fechas import corregir_fecha_invalida
+from streaming import EstadoChunks, limpiar_en_chunks
+from dag import Etapa, GrafoEtapas, ejecutar_grafo
+from particiones import limpiar_particionado, limpiar_partes
+from motores import MOTORES, cantidad_de_partes, obtener_motor
+from incremental import limpiar_incremental, perdio_claves_en
+from almacenamiento import ESCRITORES, FORMATO_FECHA_CSV, leer_tabla, obtener_escritor, tipos_crudos
+from carga import cargar_tabla, preparar_staging, publicar_tablas
+from analitica import refrescar_analitica
+from claves import IndiceClaves
+from geografia import IndiceGeo, generar_centroides
+from duplicados import CiudadesCanonicas, claves_en_conflicto, fijar_memoria
+from cubo import generar_cubo
+from calidad import generar_calidad
+from solapado import EntradaSalidaSolapada
+from cache_crudos import CacheCrudos
+from ensayo import ensayar
+from instrumentacion import contar, contar_regla, guardar_reporte, medido, medir_etapa
+
+# -----------------------
+# Paths
+# -----------------------
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+RAW_DIR = BASE_DIR / "data" / "raw"
+CLEAN_DIR = BASE_DIR / "data" / "clean"
+REPORTS_DIR = BASE_DIR / "data" / "reports"
+CACHE_DIR = BASE_DIR / "data" / "cache"
+
+
+# -----------------------
+# Load function
+# -----------------------
+# Cache de las tablas crudas ya parseadas (--raw-cache); None lee siempre el CSV
+CACHE_CRUDOS = None
+
+
+@medido("read_csv")
+def load_csv(filename: str, tabla: str = None) -> pd.DataFrame:
+    """Lee el CSV crudo con los dtypes de la tabla (IDs como strings de Arrow, categorías)."""
+    path = RAW_DIR / filename
+    tipos = tipos_crudos(tabla)
+    if CACHE_CRUDOS is not None:
+        return CACHE_CRUDOS.leer(path, tipos, lambda: pd.read_csv(path, dtype=tipos))
+    return pd.read_csv(path, dtype=tipos)
+
+
+# -----------------------
+# Helpers
+# -----------------------
+ESTADOS_BRASIL = [
+    'AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
+    'MT', 'MS', 'MG', 'PA', 'PB', 'PR', 'PE', 'PI', 'RJ', 'RN',
+    'RS', 'RO', 'RR', 'SC', 'SP', 'SE', 'TO'
+]
+
+def _conteos_zip_code(df, zip_col, claves):
+    """Cantidad de filas por (claves..., zip) considerando solo zips válidos."""
+    conteos = df[df[zip_col] > 0].groupby(claves + [zip_col], observed=True).size()
+    # Claves category como valores simples: los conteos de chunks con distintas
+    # categorías se suman sin problemas
+    niveles = [conteos.index.get_level_values(i) for i in range(conteos.index.nlevels)]
+    conteos.index = pd.MultiIndex.from_arrays([
+        nivel.astype(object) if isinstance(nivel.dtype, pd.CategoricalDtype) else nivel
+        for nivel in niveles
+    ])
+    return conteos
+
+
+def _modas_desde_conteos(conteos, zip_col, claves):
+    """
+    Moda de zip_col por grupo a partir de los conteos.
+    En empate gana el menor valor, igual que x.mode()[0].
+    """
+    conteos = (
+        conteos
+        .reset_index(name='conteo')
+        .sort_values(['conteo', zip_col], ascending=[False, True], kind='mergesort')
+    )
+    return conteos.drop_duplicates(subset=claves).set_index(claves)[zip_col]
+
+
+def _modas_zip_code(df, zip_col, claves):
+    """Moda de zip_col por grupo (solo zips válidos), con un único groupby de conteos."""
+    return _modas_desde_conteos(_conteos_zip_code(df, zip_col, claves), zip_col, claves)
+
+
+class ModasZip:
+    """
+    Modas de zip code acumuladas sobre varios chunks (modo streaming).
+    Mientras está abierto, imputar_zip_code solo suma conteos; una vez
+    cerrado, imputa con las modas de todos los chunks.
+    """
+
+    def __init__(self):
+        self._conteos = {}
+        self.cerrado = False
+
+    def acumular(self, df, zip_col, claves):
+        conteos = _conteos_zip_code(df, zip_col, claves)
+        previos = self._conteos.get(tuple(claves))
+        if previos is not None:
+            conteos = previos.add(conteos, fill_value=0)
+        self._conteos[tuple(claves)] = conteos
+
+    def combinar(self, otro: "ModasZip"):
+        """Suma los conteos acumulados por otro ModasZip (p. ej. de otra partición)."""
+        self.importar(otro.exportar())
+
+    def exportar(self) -> dict:
+        return dict(self._conteos)
+
+    def importar(self, conteos: dict):
+        """Suma conteos exportados (de otra partición o de una corrida anterior)."""
+        for claves, nuevos in conteos.items():
+            previos = self._conteos.get(claves)
+            self._conteos[claves] = nuevos if previos is None else previos.add(nuevos, fill_value=0)
+
+    def cerrar(self):
+        self.cerrado = True
+
+    def reiniciar(self):
+        """Vuelve a empezar los conteos (p. ej. para acumular de nuevo la tabla entera)."""
+        self._conteos = {}
+        self.cerrado = False
+
+    def modas(self, zip_col, claves):
+        return _modas_desde_conteos(self._conteos[tuple(claves)], zip_col, claves)
+
+    def todas(self) -> dict:
+        """Modas de cada agrupación acumulada, por tupla de claves."""
+        return {
+            claves: _modas_desde_conteos(conteos, conteos.index.names[-1], list(claves))
+            for claves, conteos in self._conteos.items()
+        }
+
+
+def _modas_zip(estado):
+    return estado.modas_zip if estado is not None else None
+
+
+def _formatos_fecha(estado, col):
+    return estado.formatos_fecha(col) if estado is not None else None
+
+
+@medido()
+def imputar_zip_code(df, zip_col, city_col, state_col, modas: ModasZip = None, geo: IndiceGeo = None):
+    """
+    Imputa zip codes inválidos (NaN o <= 0) usando moda por ciudad/estado.
+    Con `geo`, las ciudades sin moda en la tabla toman el prefijo más
+    cercano a su centro según geolocation antes de caer en la moda del estado.
+    Con `modas` abierto solo acumula conteos (primera pasada en streaming).
+    """
+    if modas is not None and not modas.cerrado:
+        modas.acumular(df, zip_col, [city_col, state_col])
+        modas.acumular(df, zip_col, [state_col])
+        return df
+
+    # Copia superficial: solo se duplica la columna imputada
+    df = df.copy(deep=False)
+
+    # Crear lookups con valores válidos
+    if modas is None:
+        zip_por_ciudad_estado = _modas_zip_code(df, zip_col, [city_col, state_col])
+        zip_por_estado = _modas_zip_code(df, zip_col, [state_col])
+    else:
+        zip_por_ciudad_estado = modas.modas(zip_col, [city_col, state_col])
+        zip_por_estado = modas.modas(zip_col, [state_col])
+
+    # Imputar
+    mask_imputar = df[zip_col].isna() | (df[zip_col] <= 0)
+    if not mask_imputar.any():
+        return df
+
+    a_imputar = df.loc[mask_imputar, [city_col, state_col]]
+
+    # Intentar por ciudad+estado (join sobre las claves, sin NaN en el lookup)
+    imputado = a_imputar.merge(
+        zip_por_ciudad_estado.reset_index(), how='left', on=[city_col, state_col]
+    )[zip_col].to_numpy()
+
+    # Ciudades sin moda en la tabla: prefijo más cercano según geolocation
+    if geo is not None:
+        sin_moda = pd.isna(imputado)
+        if sin_moda.any():
+            imputado = imputado.astype("float64")
+            imputado[sin_moda] = geo.prefijo_de_ciudad(
+                a_imputar[city_col].to_numpy()[sin_moda], a_imputar[state_col].to_numpy()[sin_moda]
+            )
+
+    # Fallback por estado
+    imputado = np.where(
+        pd.isna(imputado),
+        a_imputar[state_col].map(zip_por_estado).to_numpy(),
+        imputado,
+    )
+
+    encontrados = pd.notna(imputado)
+    contar_regla(zip_col, "zip_invalido", "imputa", np.count_nonzero(encontrados))
+    posiciones = np.flatnonzero(mask_imputar.to_numpy())[encontrados]
+    zips = df[zip_col].copy()
+    zips.iloc[posiciones] = imputado[encontrados]
+    df[zip_col] = zips
+
+    return df
+
+
+# -----------------------
+# Customers
+# -----------------------
+REGLAS_CUSTOMERS = ReglasTabla("customers", [
+    Columna('customer_id', normalizar=True),
+    # Ciudad y estado limpios antes de filtrar: los usa el filtro de FAKE_KEY
+    Columna('customer_city', normalizar=True, cache=True, caso=("lower", "title"), antes_de_filtrar=True),
+    Columna('customer_state', normalizar=True, cache=True, caso="upper", permitidos=ESTADOS_BRASIL,
+            antes_de_filtrar=True),
+    Columna('customer_zip_code_prefix', rango=(0, 99999), incluir="right", dtype='Int64'),
+], requeridas=['customer_id'], clave='customer_id', identidad='customer_unique_id')
+
+
+@medido()
+def clean_customers(df: pd.DataFrame, geo: IndiceGeo = None, estado: EstadoChunks = None) -> pd.DataFrame:
+    """Limpia y normaliza datos de customers."""
+    df, filtro = REGLAS_CUSTOMERS.filtrar(df, estado=estado)
+
+    # Eliminar FAKE_KEY sin datos geográficos
+    filtro.descartar(
+        df['customer_id'].str.contains('FAKE_KEY', na=False).to_numpy(dtype=bool) &
+        df['customer_city'].isna() &
+        df['customer_state'].isna(),
+        'customer_id', "fake_key_sin_geo"
+    )
+    df = REGLAS_CUSTOMERS.completar(df, filtro)
+
+    # Escrituras de una misma ciudad ("Sao Paulo - Sp") al nombre de geolocation
+    if geo is not None:
+        df['customer_city'] = geo.canonizar_ciudades(df['customer_city'], df['customer_state'])
+
+    # Imputar zip codes inválidos
+    df = imputar_zip_code(df, 'customer_zip_code_prefix', 'customer_city', 'customer_state',
+                          modas=_modas_zip(estado), geo=geo)
+
+    return REGLAS_CUSTOMERS.finalizar(df)
+
+
+# -----------------------
+# Orders
+# -----------------------
+REGLAS_ORDERS = ReglasTabla("orders", [
+    Columna('order_id', normalizar=True),
+    Columna('customer_id', normalizar=True),
+    Columna('order_status', normalizar=True, cache=True, caso="lower"),
+], requeridas=['order_id'], padres=['customer_id'], clave='order_id')
+
+
+@medido()
+def clean_orders(df: pd.DataFrame, valid_customer_ids: set = None, estado: EstadoChunks = None) -> pd.DataFrame:
+    """Limpia y normaliza datos de órdenes."""
+    df, filtro = REGLAS_ORDERS.filtrar(df, {'customer_id': valid_customer_ids}, estado)
+    df = REGLAS_ORDERS.completar(df, filtro)
+
+    # Convertir columnas de fechas
+    date_columns = [
+        "order_purchase_timestamp",
+        "order_approved_at",
+        "order_delivered_carrier_date",
+        "order_delivered_customer_date",
+        "order_estimated_delivery_date",
+    ]
+
+    for col in date_columns:
+        df[col] = corregir_fecha_invalida(df[col], _formatos_fecha(estado, col))
+    
+    # Validación de rango de fechas (red de seguridad)
+    fecha_min = pd.Timestamp('2016-01-01')
+    fecha_max = pd.Timestamp('2018-12-31')
+    
+    for col in date_columns:
+        mask_fuera_rango = (
+            df[col].notna() & 
+            ((df[col] < fecha_min) | (df[col] > fecha_max))
+        )
+        fuera_rango = mask_fuera_rango.sum()
+        contar_regla(col, "fecha_fuera_de_rango", "anula", fuera_rango)
+        if fuera_rango > 0:
+            df.loc[mask_fuera_rango, col] = pd.NaT
+
+    # approved >= purchase (corregir si approved < purchase)
+    mask = (
+        df['order_approved_at'].notna() &
+        df['order_purchase_timestamp'].notna() &
+        (df['order_approved_at'] < df['order_purchase_timestamp'])
+    )
+    contar_regla('order_approved_at', "aprobada_antes_de_compra", "corrige", mask.sum())
+    if mask.sum() > 0:
+        df.loc[mask, 'order_approved_at'] = df.loc[mask, 'order_purchase_timestamp']
+
+    # carrier >= approved
+    mask = (
+        df['order_delivered_carrier_date'].notna() &
+        df['order_approved_at'].notna() &
+        (df['order_delivered_carrier_date'] < df['order_approved_at'])
+    )
+    contar_regla('order_delivered_carrier_date', "despacho_antes_de_aprobacion", "anula", mask.sum())
+    if mask.sum() > 0:
+        df.loc[mask, 'order_delivered_carrier_date'] = pd.NaT
+
+    # customer >= carrier
+    mask = (
+        df['order_delivered_customer_date'].notna() &
+        df['order_delivered_carrier_date'].notna() &
+        (df['order_delivered_customer_date'] < df['order_delivered_carrier_date'])
+    )
+    contar_regla('order_delivered_customer_date', "entrega_antes_de_despacho", "anula", mask.sum())
+    if mask.sum() > 0:
+        df.loc[mask, 'order_delivered_customer_date'] = pd.NaT
+
+    return REGLAS_ORDERS.finalizar(df)
+
+
+# -----------------------
+# Order Items
+# -----------------------
+REGLAS_ORDER_ITEMS = ReglasTabla("order_items", [
+    Columna('order_id', normalizar=True),
+    Columna('product_id', normalizar=True),
+    Columna('seller_id', normalizar=True),
+    # Price inválido (crítico) descarta la fila
+    Columna('price', rango=(0, 50000), fuera_de_rango="descartar"),
+    Columna('freight_value', rango=(0, 10000)),
+], requeridas=['order_id', 'product_id'], padres=['order_id', 'product_id', 'seller_id'],
+   clave=['order_id', 'order_item_id'])
+
+
+@medido()
+def clean_order_items(df: pd.DataFrame, valid_order_ids: set = None, valid_product_ids: set = None, valid_seller_ids: set = None, estado: EstadoChunks = None) -> pd.DataFrame:
+    """Limpia y normaliza datos de ítems de órdenes."""
+    df, filtro = REGLAS_ORDER_ITEMS.filtrar(df, {
+        'order_id': valid_order_ids,
+        'product_id': valid_product_ids,
+        'seller_id': valid_seller_ids,
+    }, estado)
+
+    # Convertir fecha, sobre las filas que siguen en pie (el formato se
+    # detecta con ellas, antes de descartar por price)
+    fechas = corregir_fecha_invalida(
+        df['shipping_limit_date'].iloc[np.flatnonzero(filtro.mantener)],
+        _formatos_fecha(estado, 'shipping_limit_date')
+    )
+
+    df = REGLAS_ORDER_ITEMS.completar(df, filtro)
+    df['shipping_limit_date'] = fechas
+
+    return REGLAS_ORDER_ITEMS.finalizar(df)
+
+
+# -----------------------
+# Payments
+# -----------------------
+REGLAS_PAYMENTS = ReglasTabla("payments", [
+    Columna('order_id', normalizar=True),
+    Columna('payment_type', normalizar=True, cache=True, caso="lower"),
+    Columna('payment_sequential', rango=(1, 100)),
+    Columna('payment_installments', rango=(1, 24)),
+    # Payment_value inválido descarta la fila
+    Columna('payment_value', rango=(0, 50000), incluir="right", fuera_de_rango="descartar"),
+], requeridas=['order_id'], padres=['order_id'], clave=['order_id', 'payment_sequential'])
+
+
+@medido()
+def clean_payments(df: pd.DataFrame, valid_order_ids: set = None, estado: EstadoChunks = None) -> pd.DataFrame:
+    """Limpia y normaliza datos de pagos."""
+    return REGLAS_PAYMENTS.limpiar(df, {'order_id': valid_order_ids}, estado)
+
+
+# -----------------------
+# Products
+# -----------------------
+# Typos y duplicados en categorías
+CORRECCIONES_CATEGORIAS = {
+    'electrncos': 'eletronicos',
+    'ELETRONICOOS': 'eletronicos',
+    'Electronics': 'eletronicos',
+    'categria': 'eletronicos',
+    'casa_conforto_2': 'casa_conforto',
+    'eletrodomesticos_2': 'eletrodomesticos',
+    'nan': None
+}
+
+REGLAS_PRODUCTS = ReglasTabla("products", [
+    Columna('product_id', normalizar=True),
+    Columna('product_category_name', normalizar=True, cache=True, reemplazos=CORRECCIONES_CATEGORIAS),
+] + [
+    Columna(col, numerico=True, rango=(0, 50000))
+    for col in [
+        'product_name_lenght',
+        'product_description_lenght',
+        'product_photos_qty',
+        "product_weight_g",
+        "product_length_cm",
+        "product_height_cm",
+        "product_width_cm",
+    ]
+], requeridas=['product_id'], clave='product_id')
+
+
+@medido()
+def clean_products(df: pd.DataFrame, estado: EstadoChunks = None) -> pd.DataFrame:
+    """Limpia y normaliza datos de productos."""
+    return REGLAS_PRODUCTS.limpiar(df, estado=estado)
+
+
+# -----------------------
+# Reviews
+# -----------------------
+REGLAS_REVIEWS = ReglasTabla("reviews", [
+    Columna('review_id', normalizar=True),
+    Columna('order_id', normalizar=True),
+    Columna('review_score', numerico=True, rango=(1, 5), fuera_de_rango="descartar"),
+    Columna('review_comment_title', normalizar=True),
+    Columna('review_comment_message', normalizar=True),
+], requeridas=['review_id', 'order_id'], padres=['order_id'], clave='review_id')
+
+
+@medido()
+def clean_reviews(df: pd.DataFrame, valid_order_ids: set = None, estado: EstadoChunks = None) -> pd.DataFrame:
+    """Limpia y normaliza datos de reviews."""
+    df, filtro = REGLAS_REVIEWS.filtrar(df, {'order_id': valid_order_ids}, estado)
+    df = REGLAS_REVIEWS.completar(df, filtro)
+
+    # Convertir fechas
+    df['review_creation_date'] = corregir_fecha_invalida(
+        df['review_creation_date'], _formatos_fecha(estado, 'review_creation_date')
+    )
+    df['review_answer_timestamp'] = corregir_fecha_invalida(
+        df['review_answer_timestamp'], _formatos_fecha(estado, 'review_answer_timestamp')
+    )
+
+    # Validar lógica temporal: answer >= creation
+    mask = (
+        df['review_answer_timestamp'].notna() &
+        df['review_creation_date'].notna() &
+        (df['review_answer_timestamp'] < df['review_creation_date'])
+    )
+    contar_regla('review_answer_timestamp', "respuesta_antes_de_creacion", "anula", mask.sum())
+    if mask.sum() > 0:
+        df.loc[mask, 'review_answer_timestamp'] = pd.NaT
+
+    return REGLAS_REVIEWS.finalizar(df)
+
+
+# -----------------------
+# Sellers
+# -----------------------
+REGLAS_SELLERS = ReglasTabla("sellers", [
+    Columna('seller_id', normalizar=True),
+    # La ciudad se imputa en minúsculas y se capitaliza después
+    Columna('seller_city', normalizar=True, cache=True, caso="lower"),
+    Columna('seller_state', normalizar=True, cache=True, caso="upper", permitidos=ESTADOS_BRASIL),
+    Columna('seller_zip_code_prefix', rango=(0, 99999), incluir="right", dtype='Int64'),
+], requeridas=['seller_id'], clave='seller_id')
+
+
+@medido()
+def clean_sellers(df: pd.DataFrame, geo: IndiceGeo = None, estado: EstadoChunks = None) -> pd.DataFrame:
+    """Limpia y normaliza datos de vendedores."""
+    df, filtro = REGLAS_SELLERS.filtrar(df, estado=estado)
+    df = REGLAS_SELLERS.completar(df, filtro)
+
+    # Escrituras de una misma ciudad ("Sao Paulo - Sp") al nombre de geolocation
+    if geo is not None:
+        df['seller_city'] = geo.canonizar_ciudades(df['seller_city'], df['seller_state'])
+
+    # Imputar seller_zip_code_prefix
+    df = imputar_zip_code(df, 'seller_zip_code_prefix', 'seller_city', 'seller_state',
+                          modas=_modas_zip(estado), geo=geo)
+
+    df['seller_city'] = aplicar_a_valores(df['seller_city'], lambda s: s.str.title())
+
+    return REGLAS_SELLERS.finalizar(df)
+
+
+# -----------------------
+# Geolocation
+# -----------------------
+# Sin datos críticos válidos (zip code, coordenadas dentro de Brasil) la fila se descarta
+REGLAS_GEOLOCATION = ReglasTabla("geolocation", [
+    Columna('geolocation_zip_code_prefix', rango=(0, 99999), incluir="right", fuera_de_rango="descartar",
+            dtype='Int64'),
+    Columna('geolocation_lat', numerico=True, rango=(-34, 6), fuera_de_rango="descartar"),
+    Columna('geolocation_lng', numerico=True, rango=(-75, -33), fuera_de_rango="descartar"),
+    Columna('geolocation_city', normalizar=True, cache=True, caso="title"),
+    Columna('geolocation_state', normalizar=True, cache=True, caso="upper", permitidos=ESTADOS_BRASIL),
+])
+
+
+@medido()
+def clean_geolocation(df: pd.DataFrame, estado: EstadoChunks = None) -> pd.DataFrame:
+    """Limpia y normaliza datos de geolocalización."""
+    return REGLAS_GEOLOCATION.limpiar(df, estado=estado)
+
+
+@medido("ciudades_canonicas")
+def indice_geolocation(geo: pd.DataFrame) -> IndiceGeo:
+    """
+    IndiceGeo de geolocation limpia con sus ciudades canónicas, que se
+    reutilizan de data/cache si las ciudades no cambiaron desde la corrida anterior.
+    """
+    ciudades = CiudadesCanonicas.desde_tabla(geo, 'geolocation_city', 'geolocation_state', CACHE_DIR)
+    print(f"  City spellings: {ciudades.escrituras} -> {ciudades.ciudades} canonical cities")
+    return IndiceGeo.desde_geolocation(geo, ciudades)
+
+
+# -----------------------
+# Category Translation
+# -----------------------
+# Typos y duplicados semánticos
+CORRECCIONES_PT = {
+    'electrncos': 'eletronicos',
+    'eletronicoos': 'eletronicos',
+    'categria': 'eletronicos',
+    'casa_conforto_2': 'casa_conforto'
+}
+
+CORRECCIONES_EN = {
+    'eletronicos': 'electronics',
+    'eletronicoos': 'electronics',
+    'costruction_tools_tools': 'construction_tools_tools',
+    'costruction_tools_garden': 'construction_tools_garden',
+    'home_comfort_2': 'home_comfort',
+    'home_confort': 'home_comfort',
+    'construction_tools_tools': 'construction_tools',
+    'la_cuisine': 'kitchen',
+    'market_place': 'marketplace'
+}
+
+REGLAS_CATEGORIES = ReglasTabla("categories", [
+    Columna('product_category_name', normalizar=True, cache=True, caso="lower", reemplazos=CORRECCIONES_PT),
+    Columna('product_category_name_english', normalizar=True, cache=True, caso="lower",
+            reemplazos=CORRECCIONES_EN),
+], requeridas=['product_category_name'], clave='product_category_name')
+
+
+@medido()
+def clean_category_translation(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpia y normaliza datos de traducción de categorías."""
+    df, filtro = REGLAS_CATEGORIES.filtrar(df)
+    df = REGLAS_CATEGORIES.completar(df, filtro)
+    
+    # Agregar nuevas traducciones faltantes
+    nuevas_traducciones = pd.DataFrame([
+        {'product_category_name': 'automotivo', 'product_category_name_english': 'automotive'},
+        {'product_category_name': 'beleza_saude', 'product_category_name_english': 'health_beauty'},
+        {'product_category_name': 'cool_stuff', 'product_category_name_english': 'cool_stuff'},
+        {'product_category_name': 'eletroportateis', 'product_category_name_english': 'small_appliances'},
+        {'product_category_name': 'papelaria', 'product_category_name_english': 'stationery'},
+        {'product_category_name': 'moveis_decoracao', 'product_category_name_english': 'furniture_decor'},
+        {'product_category_name': 'alimentos_bebidas', 'product_category_name_english': 'food_drinks'},
+        {'product_category_name': 'construcao_ferramentas_seguranca', 'product_category_name_english': 'construction_tools_safety'},
+        {'product_category_name': 'fashion_esporte', 'product_category_name_english': 'fashion_sport'},
+        {'product_category_name': 'fashion_roupa_feminina', 'product_category_name_english': 'fashion_female_clothing'},
+        {'product_category_name': 'fashion_underwear_e_moda_praia', 'product_category_name_english': 'fashion_underwear_beach'},
+        {'product_category_name': 'pc_gamer', 'product_category_name_english': 'gaming_pc'},
+        {'product_category_name': 'portateis_cozinha_e_preparadores_de_alimentos', 'product_category_name_english': 'portable_kitchen_food_processors'},
+        {'product_category_name': 'tablets_impressao_imagem', 'product_category_name_english': 'tablets_printing_image'}
+    ])
+    
+    # Agregar solo las que no existen ya
+    categorias_existentes = set(df['product_category_name'].unique())
+    nuevas_a_agregar = nuevas_traducciones[~nuevas_traducciones['product_category_name'].isin(categorias_existentes)]
+    
+    if len(nuevas_a_agregar) > 0:
+        df = pd.concat([df, nuevas_a_agregar], ignore_index=True)
+    
+    return REGLAS_CATEGORIES.finalizar(df)
+
+
+# -----------------------
+# Main
+# -----------------------
+# Tablas que se limpian completas aun en modo --chunksize (chicas y no row-local)
+TABLAS_SIN_CHUNKS = {"categories"}
+
+# Tablas que imputan zip codes con modas globales (dos pasadas en modo --chunksize)
+TABLAS_CON_IMPUTACION = {"customers", "sellers"}
+
+# Tablas cuya clave se descarta si aparece con más de una identidad; en los
+# modos --chunksize e --incremental las claves en conflicto salen de un
+# recorrido previo del crudo entero
+REGLAS_CON_IDENTIDAD = {"customers": REGLAS_CUSTOMERS}
+
+# Estado entre corridas y archivos delta del modo --incremental (dentro de CLEAN_DIR)
+SUBDIR_ESTADO_INCREMENTAL = "_incremental"
+SUBDIR_DELTAS = "delta"
+
+# Clave de deduplicación por la que se particiona cada tabla en modo --partitions
+# (None = fila completa). Las que no están se limpian completas.
+CLAVES_PARTICION = {
+    "customers": "customer_id",
+    "products": "product_id",
+    "sellers": "seller_id",
+    "geolocation": None,
+    "orders": "order_id",
+    "order_items": "order_id",
+    "payments": "order_id",
+    "reviews": "review_id",
+}
+
+# Grafo de dependencias: cada tabla declara los IDs válidos que necesita
+# (integridad referencial, en el orden de los argumentos) y los que aporta
+ETAPAS = GrafoEtapas([
+    Etapa("customers", "olist_customers_dataset_dirty.csv", clean_customers,
+          requiere=["geolocation_zip_code_prefix"], genera="customer_id"),
+    # products_clean tiene FK a categories_clean: se carga después
+    Etapa("products", "olist_products_dataset_dirty.csv", clean_products, genera="product_id",
+          despues_de=["categories"]),
+    Etapa("sellers", "olist_sellers_dataset_dirty.csv", clean_sellers,
+          requiere=["geolocation_zip_code_prefix"], genera="seller_id"),
+    Etapa("categories", "product_category_name_translation_dirty.csv", clean_category_translation),
+    # Centroides de los prefijos de zip code, para imputar los de customers y sellers
+    Etapa("geolocation", "olist_geolocation_dataset_dirty.csv", clean_geolocation,
+          genera="geolocation_zip_code_prefix", indice=indice_geolocation),
+    Etapa("orders", "olist_orders_dataset_dirty.csv", clean_orders,
+          requiere=["customer_id"], genera="order_id"),
+    Etapa("order_items", "olist_order_items_dataset_dirty.csv", clean_order_items,
+          requiere=["order_id", "product_id", "seller_id"]),
+    Etapa("payments", "olist_order_payments_dataset_dirty.csv", clean_payments,
+          requiere=["order_id"]),
+    Etapa("reviews", "olist_order_reviews_dataset_dirty.csv", clean_reviews,
+          requiere=["order_id"]),
+])
+
+
+def _huella_entradas(name, ids_requeridos) -> str:
+    """sha256 de lo global que usa la limpieza además de las filas: índice geo y claves en conflicto."""
+    huella = hashlib.sha256()
+    for ids in ids_requeridos:
+        if isinstance(ids, IndiceGeo):
+            huella.update(ids.huella().encode())
+    reglas = REGLAS_CON_IDENTIDAD.get(name)
+    if reglas is not None and reglas.conflictivas is not None:
+        huella.update(np.asarray(reglas.conflictivas).tobytes())
+    return huella.hexdigest()
+
+
+def limpiar_tabla(etapa: Etapa, ids_requeridos, chunksize=None, particiones=1, workers=1,
+                  corrida=None, formato="csv", cargar=False, perfil=None, es=None, motor=None):
+    """
+    Limpia la tabla midiendo la etapa (tiempos, memoria y filas de cada paso).
+    Con `perfil` (directorio) guarda además un cProfile de la etapa.
+    """
+    with medir_etapa(etapa.nombre, perfil=perfil) as medicion:
+        ids = _limpiar_tabla(etapa, ids_requeridos, medicion, chunksize, particiones,
+                             workers, corrida, formato, cargar, es, motor)
+    # Una línea por columna, sumando chunks y partes (los workers ya devolvieron sus pasos)
+    informar_normalizacion(etapa.nombre)
+    return ids
+
+
+def _limpiar_tabla(etapa: Etapa, ids_requeridos, medicion, chunksize=None, particiones=1,
+                   workers=1, corrida=None, formato="csv", cargar=False, es=None, motor=None):
+    """
+    Carga, limpia y guarda una tabla. Devuelve los IDs válidos que aporta
+    a las siguientes (IndiceClaves, o el `indice` de la etapa) o None.
+    Con `corrida` (modo --incremental) limpia solo lo nuevo desde la corrida anterior.
+    Con `cargar` además la copia a public.{name}_clean en Postgres.
+    Con `es` (EntradaSalidaSolapada) toma la tabla cruda ya leída en otro hilo
+    y deja la escritura y la carga en el hilo de escritura.
+    Con `motor` (--engine) la tabla cruda no se carga entera: el motor la
+    parte en disco y cada parte se limpia en un worker.
+    """
+    name = etapa.nombre
+    destino = CLEAN_DIR / f"{name}_clean.csv"
+
+    if corrida is not None:
+        directorio_estado = CLEAN_DIR / SUBDIR_ESTADO_INCREMENTAL
+        (CLEAN_DIR / SUBDIR_DELTAS).mkdir(exist_ok=True)
+
+        # Si una tabla de la que depende perdió IDs, filas ya aceptadas pueden quedar huérfanas
+        forzar_completo = any(
+            perdio_claves_en(directorio_estado, dependencia, corrida)
+            for dependencia in ETAPAS.dependencias[name]
+        )
+        modo, filas_leidas, filas_escritas, ids = limpiar_incremental(
+            RAW_DIR / etapa.archivo,
+            etapa.funcion,
+            destino,
+            CLEAN_DIR / SUBDIR_DELTAS / f"{name}_delta.csv",
+            directorio_estado,
+            name,
+            corrida,
+            args=ids_requeridos,
+            id_col=etapa.genera if etapa.indice is None else None,
+            modas_zip=ModasZip() if name in TABLAS_CON_IMPUTACION else None,
+            con_estado=name not in TABLAS_SIN_CHUNKS,
+            forzar_completo=forzar_completo,
+            ids_padres={
+                col: ids for col, ids in zip(etapa.requiere, ids_requeridos)
+                if isinstance(ids, IndiceClaves)
+            },
+            huella=_huella_entradas(name, ids_requeridos),
+            dtype=tipos_crudos(name),
+            date_format=FORMATO_FECHA_CSV,
+        )
+        medicion.filas_entrada, medicion.filas_salida = filas_leidas, filas_escritas
+        print(f"{name} cleaned incrementally ({modo}): {filas_leidas} -> {filas_escritas} rows")
+        print(f"{name} CLEAN saved")
+        return _indice_desde_destino(etapa, ids)
+
+    if chunksize and name not in TABLAS_SIN_CHUNKS:
+        filas_leidas, filas_escritas, ids = limpiar_en_chunks(
+            RAW_DIR / etapa.archivo,
+            etapa.funcion,
+            destino,
+            chunksize,
+            args=ids_requeridos,
+            id_col=etapa.genera if etapa.indice is None else None,
+            modas_zip=ModasZip() if name in TABLAS_CON_IMPUTACION else None,
+            dtype=tipos_crudos(name),
+            date_format=FORMATO_FECHA_CSV,
+        )
+        medicion.filas_entrada, medicion.filas_salida = filas_leidas, filas_escritas
+        print(f"{name} cleaned in chunks of {chunksize}: {filas_leidas} -> {filas_escritas} rows")
+        print(f"{name} CLEAN saved")
+        return _indice_desde_destino(etapa, ids)
+
+    if motor is not None and name in CLAVES_PARTICION:
+        # Se escribe de a bloques en este hilo: antes, lo que falta escribir de las tablas anteriores
+        if es is not None:
+            es.esperar()
+        path = RAW_DIR / etapa.archivo
+        n_partes = cantidad_de_partes(path, particiones)
+        with tempfile.TemporaryDirectory(prefix=f"{name}_partes_") as directorio:
+            partes, filas_leidas = motor.particionar(
+                path, n_partes, CLAVES_PARTICION[name], tipos_crudos(name), Path(directorio)
+            )
+            print(f"{name} partitioned with {motor.nombre}: {filas_leidas} rows in {n_partes} parts")
+            limpias = limpiar_partes(
+                partes,
+                etapa.funcion,
+                workers,
+                args=ids_requeridos,
+                modas_zip=ModasZip() if name in TABLAS_CON_IMPUTACION else None,
+                directorio=Path(directorio) / "limpias",
+            )
+            medicion.filas_entrada, medicion.filas_salida = filas_leidas, limpias.filas
+            print(f"{name} cleaned:", limpias.shape)
+            return _guardar_por_bloques(limpias, etapa, formato, cargar)
+
+    if es is not None and es.leidas_por_adelantado(name):
+        df = es.leer(name)
+    else:
+        df = load_csv(etapa.archivo, name)
+    print(f"{name} loaded:", df.shape)
+    filas_leidas = len(df)
+
+    if particiones > 1 and name in CLAVES_PARTICION:
+        df_clean = limpiar_particionado(
+            df,
+            etapa.funcion,
+            particiones,
+            workers,
+            args=ids_requeridos,
+            clave=CLAVES_PARTICION[name],
+            modas_zip=ModasZip() if name in TABLAS_CON_IMPUTACION else None,
+        )
+    else:
+        df_clean = etapa.funcion(df, *ids_requeridos)
+
+    medicion.filas_entrada, medicion.filas_salida = filas_leidas, len(df_clean)
+    print(f"{name} cleaned:", df_clean.shape)
+
+    if es is not None:
+        es.escribir(name, _guardar_tabla, df_clean, name, formato, cargar)
+    else:
+        _guardar_tabla(df_clean, name, formato, cargar)
+
+    # IDs válidos para las siguientes tablas
+    if etapa.genera is not None and etapa.genera in df_clean.columns:
+        if etapa.indice is not None:
+            return etapa.indice(df_clean)
+        return IndiceClaves(df_clean[etapa.genera])
+    return None
+
+
+def _guardar_tabla(df_clean: pd.DataFrame, name: str, formato: str = "csv", cargar: bool = False):
+    """Escribe la tabla limpia en la capa clean y, con `cargar`, la copia a Postgres."""
+    obtener_escritor(formato).escribir(df_clean, name, CLEAN_DIR)
+    print(f"{name} CLEAN saved")
+
+    if cargar:
+        cargar_tabla(df_clean, name)
+
+
+def _guardar_por_bloques(limpias, etapa: Etapa, formato: str = "csv", cargar: bool = False):
+    """
+    Escribe (y con `cargar` copia a Postgres) una TablaEnPartes de a bloques
+    en el orden original. Devuelve los IDs válidos, como _limpiar_tabla.
+    """
+    name = etapa.nombre
+    ids = []
+
+    def bloques():
+        for bloque in limpias.bloques():
+            if cargar:
+                cargar_tabla(bloque, name)
+            if etapa.genera is not None and etapa.indice is None and etapa.genera in bloque.columns:
+                ids.append(IndiceClaves(bloque[etapa.genera]))
+            yield bloque
+
+    obtener_escritor(formato).escribir_bloques(bloques(), name, CLEAN_DIR)
+    print(f"{name} CLEAN saved")
+
+    if etapa.genera is None or etapa.genera not in limpias.tipos:
+        return None
+    if etapa.indice is not None:
+        return etapa.indice(leer_tabla(name, CLEAN_DIR, formato))
+    return IndiceClaves.desde_partes(ids)
+
+
+def _indice_desde_destino(etapa: Etapa, ids):
+    """
+    Índice de la etapa en los modos --chunksize e --incremental: se arma
+    desde la tabla limpia completa ya escrita en disco (no de a un chunk).
+    """
+    if etapa.indice is None:
+        return ids
+    return etapa.indice(leer_tabla(etapa.nombre, CLEAN_DIR, "csv"))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CLEAN pipeline del dataset Olist")
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="procesar cada CSV en chunks de N filas (memoria acotada)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="procesos para limpiar en paralelo las tablas independientes"
+    )
+    parser.add_argument(
+        "--partitions", type=int, default=1,
+        help="partir cada tabla grande en N particiones por hash y limpiarlas en --workers procesos"
+    )
+    parser.add_argument(
+        "--engine", choices=["pandas", *sorted(MOTORES)], default="pandas",
+        help="motor que lee el crudo fuera de memoria y lo parte en disco (al menos --partitions "
+             "partes); cada parte se limpia con pandas en --workers procesos"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="limpiar solo las filas nuevas desde la corrida anterior y escribir deltas"
+    )
+    parser.add_argument(
+        "--format", choices=sorted(ESCRITORES), default="csv",
+        help="formato de las tablas limpias (parquet requiere pyarrow)"
+    )
+    parser.add_argument(
+        "--io-queue", type=int, default=1,
+        help="tablas leídas por adelantado y escrituras pendientes, en hilos aparte, "
+             "solapadas con la limpieza (0 = sin solapar)"
+    )
+    parser.add_argument(
+        "--raw-cache", action="store_true",
+        help="guardar las tablas crudas parseadas en data/cache (Arrow IPC) y abrirlas "
+             "con memory map en las corridas siguientes si el CSV no cambió"
+    )
+    parser.add_argument(
+        "--raw-cache-mb", type=int, default=2048,
+        help="tamaño máximo de data/cache en MB (se borran las entradas usadas hace más tiempo)"
+    )
+    parser.add_argument(
+        "--dedup-memory-mb", type=int, default=256,
+        help="memoria para los hashes de deduplicación entre chunks y de claves en conflicto; "
+             "lo que excede se vuelca a archivos temporales"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="sin escribir nada: limpiar una muestra estratificada de cada tabla en paralelo, "
+             "estimar tiempo y memoria de la corrida completa y validar contra sql/clean_tables.sql"
+    )
+    parser.add_argument(
+        "--sample-rows", type=int, default=10_000,
+        help="filas de la muestra de cada tabla en --dry-run"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="guardar un cProfile (.prof) por etapa junto al reporte de la corrida"
+    )
+    parser.add_argument(
+        "--load", action="store_true",
+        help="cargar cada tabla limpia en Postgres (COPY FROM STDIN) en orden de FKs "
+             "y refrescar el modelo analítico"
+    )
+    args = parser.parse_args(argv)
+    if args.load and (args.chunksize or args.incremental):
+        parser.error("--load cannot be combined with --chunksize or --incremental")
+    if args.format != "csv" and (args.chunksize or args.incremental):
+        parser.error("--chunksize and --incremental only write csv")
+    if args.partitions > 1 and args.chunksize:
+        parser.error("--partitions and --chunksize cannot be combined")
+    if args.incremental and (args.partitions > 1 or args.chunksize):
+        parser.error("--incremental cannot be combined with --partitions or --chunksize")
+    if args.engine != "pandas" and (args.chunksize or args.incremental):
+        parser.error("--engine cannot be combined with --chunksize or --incremental")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Copy-on-write durante la corrida: los filtros y las copias superficiales
+    # no duplican datos hasta que se escribe, y se copia solo la columna escrita
+    with pd.option_context("mode.copy_on_write", True):
+        _correr(args, argv)
+
+
+def _correr(args, argv=None):
+    global CACHE_CRUDOS
+
+    # Falla en segundos si el esquema crudo cambió o una salida no entra en el DDL
+    if args.dry_run:
+        workers = args.workers if args.workers > 1 else os.cpu_count() or 1
+        if not ensayar(ETAPAS, RAW_DIR, args.sample_rows, workers):
+            sys.exit(1)
+        return
+
+    print("Starting CLEAN pipeline")
+    inicio = datetime.now()
+    sello = inicio.strftime("%Y%m%dT%H%M%S%f")
+    perfil = REPORTS_DIR / f"profile_{sello}" if args.profile else None
+
+    CLEAN_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Cache de normalización compartido entre tablas durante esta corrida
+    CACHE_NORMALIZACION.limpiar()
+
+    # Tablas crudas parseadas de corridas anteriores (los workers lo heredan)
+    CACHE_CRUDOS = CacheCrudos(CACHE_DIR, args.raw_cache_mb * 1024 * 1024) if args.raw_cache else None
+
+    # Falla antes de empezar si falta la librería del motor
+    motor = obtener_motor(args.engine)
+
+    # Con --partitions o --engine el pool de procesos se usa dentro de cada
+    # tabla y las etapas corren una tras otra
+    workers_etapas = 1 if args.partitions > 1 or motor is not None else args.workers
+    # La carga reemplaza el contenido de las tablas, como sql/load_clean_data.sql:
+    # cada tabla se copia a staging y pasan todas juntas a public al final
+    if args.load:
+        with medir_etapa("staging", perfil=perfil):
+            preparar_staging()
+
+    corrida = sello if args.incremental else None
+
+    fijar_memoria(args.dedup_memory_mb)
+    if args.chunksize or args.incremental:
+        for nombre, reglas in REGLAS_CON_IDENTIDAD.items():
+            with medir_etapa(f"{nombre}_conflicts", perfil=perfil):
+                reglas.conflictivas = claves_en_conflicto(
+                    RAW_DIR / ETAPAS.etapas[nombre].archivo, reglas.clave, reglas.identidad,
+                    dtype=tipos_crudos(nombre), chunksize=args.chunksize or 1_000_000,
+                )
+            print(f"{nombre}: {len(reglas.conflictivas)} conflicting {reglas.clave} values in the raw table")
+
+    # Con las etapas en serie, la lectura de la tabla siguiente y la escritura
+    # de la anterior corren en hilos mientras se limpia la actual
+    solapar = workers_etapas <= 1 and args.io_queue > 0 and not args.incremental
+    lecturas = {
+        nombre: functools.partial(load_csv, ETAPAS.etapas[nombre].archivo, nombre)
+        for nombre in ETAPAS.orden
+        if (not args.chunksize or nombre in TABLAS_SIN_CHUNKS)
+        and (motor is None or nombre not in CLAVES_PARTICION)
+    }
+    with (EntradaSalidaSolapada(lecturas, args.io_queue) if solapar else contextlib.nullcontext()) as es:
+        valid_ids = ejecutar_grafo(
+            ETAPAS, limpiar_tabla, workers=workers_etapas,
+            args=(args.chunksize, args.partitions, args.workers, corrida, args.format, args.load,
+                  perfil, es, motor)
+        )
+
+    if args.load:
+        with medir_etapa("publish", perfil=perfil):
+            publicar_tablas()
+
+    # Centroides de prefijos y estados (mapa de los dashboards), del índice de geolocation
+    print("Building geo index")
+    with medir_etapa("geo_index", perfil=perfil):
+        generar_centroides(valid_ids["geolocation_zip_code_prefix"], CLEAN_DIR, args.format, cargar=args.load)
+
+    # Cubo de KPIs para los dashboards (sql/metrics_cube.sql), desde la capa clean
+    print("Building KPI cube")
+    with medir_etapa("kpi_cube", perfil=perfil):
+        generar_cubo(CLEAN_DIR, args.format, cargar=args.load)
+
+    # Filas que cada regla de limpieza descartó, anuló, corrigió o imputó (de
+    # los conteos acumulados al limpiar, sin volver a leer las tablas)
+    print("Collecting quality metrics")
+    with medir_etapa("quality_metrics", perfil=perfil):
+        generar_calidad(sello, inicio, REPORTS_DIR, args.format, cargar=args.load)
+
+    # Con los datos nuevos en Postgres, recalcular el modelo materializado
+    if args.load:
+        print("Refreshing analytics model")
+        with medir_etapa("analytics", perfil=perfil):
+            refrescar_analitica()
+
+    # Con workers cada proceso tiene su propio cache
+    if args.workers <= 1:
+        print("Normalization cache:", CACHE_NORMALIZACION.resumen())
+
+    # Reporte JSON de la corrida (para comparar corridas y encontrar regresiones)
+    reporte = guardar_reporte(
+        REPORTS_DIR / f"run_{sello}.json",
+        inicio=inicio.isoformat(),
+        argv=sys.argv[1:] if argv is None else list(argv),
+        opciones=vars(args),
+        wall_s=(datetime.now() - inicio).total_seconds(),
+    )
+    print(f"Run report: {reporte}")
+    print("CLEAN pipeline finished")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from almacenamiento import leer_tabla
+from carga import cargar_tabla, conexion
+
+
+# -----------------------
+# Cubo de KPIs
+# -----------------------
+# Grano: día de compra x categoría x estado del cliente x tipo de pago
+DIMENSIONES_CUBO = ["date", "category", "customer_state", "payment_type"]
+
+# Mismo orden que las columnas de analytics.kpi_cube (sql/kpi_cube.sql)
+COLUMNAS_CUBO = DIMENSIONES_CUBO + [
+    "revenue", "freight", "items", "orders", "freight_orders", "customers",
+    "category_orders", "category_freight_orders",
+]
+
+CUBO_SQL = Path(__file__).resolve().parent.parent / "sql" / "kpi_cube.sql"
+
+# payment_type de las órdenes sin filas en payments (el JOIN con dim_payment
+# las descarta); las que tienen pagos sin tipo quedan en NULL, como en dim_payment
+SIN_PAGOS = "no_payments"
+
+
+def _tipo_pago_por_orden(payments: pd.DataFrame) -> pd.Series:
+    """Tipos de pago de cada orden, como STRING_AGG(DISTINCT payment_type, ', ') de dim_payment."""
+    pagos = payments.dropna(subset=["payment_type"]).drop_duplicates(["order_id", "payment_type"])
+    pagos = pagos.sort_values(["order_id", "payment_type"])
+    tipos = pagos.groupby("order_id")["payment_type"].agg(", ".join)
+    return tipos.reindex(payments["order_id"].unique())
+
+
+def construir_cubo(items, orders, products, categories, customers, payments) -> pd.DataFrame:
+    """
+    Calcula las medidas de sql/metrics_final.sql al grano del cubo.
+
+    Cada orden tiene un solo día, estado y tipo de pago, pero puede tener
+    ítems de varias categorías. Por eso hay dos conteos de órdenes:
+    - `orders` y `freight_orders` cuentan cada orden una sola vez, en la
+      celda de su primer ítem: se suman con cualquier filtro salvo categoría;
+    - `category_orders` y `category_freight_orders` cuentan cada orden una
+      vez en cada categoría en la que tiene ítems: son exactos filtrando o
+      agrupando por categoría, pero sumados entre categorías cuentan de más.
+    `customers` cuenta cada cliente una vez por día (en la celda de su primer
+    ítem del día): es exacto sin filtro de categoría, dentro de un día y
+    entre días mientras cada orden tenga su propio customer_id, como en Olist.
+    """
+    # Mismo join que analytics.fact_order_items
+    fact = items[["order_id", "order_item_id", "product_id", "price", "freight_value"]].merge(
+        orders[["order_id", "customer_id", "order_purchase_timestamp"]], on="order_id"
+    )
+
+    categoria = products[["product_id", "product_category_name"]].merge(
+        categories[["product_category_name", "product_category_name_english"]],
+        on="product_category_name", how="left"
+    ).set_index("product_id")["product_category_name_english"]
+    estado = customers.drop_duplicates("customer_id").set_index("customer_id")["customer_state"]
+
+    cubo = pd.DataFrame({
+        "date": pd.to_datetime(fact["order_purchase_timestamp"]).dt.date,
+        "category": fact["product_id"].map(categoria),
+        "customer_state": fact["customer_id"].map(estado),
+        "payment_type": fact["order_id"].map(_tipo_pago_por_orden(payments)).where(
+            fact["order_id"].isin(payments["order_id"]), SIN_PAGOS
+        ),
+        "revenue": fact["price"] + fact["freight_value"].fillna(0),
+        "freight": fact["freight_value"],
+    })
+
+    # Cada orden se cuenta una vez, en la fila de su primer ítem, y cada
+    # cliente una vez por día
+    primera = fact["order_item_id"] == fact.groupby("order_id")["order_item_id"].transform("min")
+    con_flete = fact["freight_value"].notna().groupby(fact["order_id"]).transform("any")
+    ordenado = fact.assign(date=cubo["date"]).sort_values(["order_id", "order_item_id"])
+    cliente_del_dia = ~ordenado.duplicated(["customer_id", "date"])
+
+    # Por categoría: cada orden una vez en la fila de su primer ítem de cada categoría
+    por_categoria = pd.DataFrame({"order_id": fact["order_id"], "category": cubo["category"]})
+    primera_de_categoria = ~por_categoria.duplicated()
+    con_flete_en_categoria = fact["freight_value"].notna().groupby(
+        [por_categoria["order_id"], por_categoria["category"]], dropna=False
+    ).transform("any")
+
+    cubo["items"] = 1
+    cubo["orders"] = primera.astype(int)
+    cubo["freight_orders"] = (primera & con_flete).astype(int)
+    cubo["customers"] = cliente_del_dia.reindex(fact.index).astype(int)
+    cubo["category_orders"] = primera_de_categoria.astype(int)
+    cubo["category_freight_orders"] = (primera_de_categoria & con_flete_en_categoria).astype(int)
+
+    agregado = cubo.groupby(DIMENSIONES_CUBO, dropna=False, observed=True, sort=True).agg(
+        revenue=("revenue", "sum"),
+        freight=("freight", "sum"),
+        items=("items", "sum"),
+        orders=("orders", "sum"),
+        freight_orders=("freight_orders", "sum"),
+        customers=("customers", "sum"),
+        category_orders=("category_orders", "sum"),
+        category_freight_orders=("category_freight_orders", "sum"),
+    ).reset_index()
+
+    # Precios en centavos: redondear el ruido de la suma en float
+    agregado[["revenue", "freight"]] = agregado[["revenue", "freight"]].round(2)
+    return agregado[COLUMNAS_CUBO]
+
+
+def cubo_desde_tablas_limpias(directorio: Path, formato: str = "csv") -> pd.DataFrame:
+    """Arma el cubo leyendo de la capa clean solo las columnas que usa."""
+    columnas = {
+        "order_items": ["order_id", "order_item_id", "product_id", "price", "freight_value"],
+        "orders": ["order_id", "customer_id", "order_purchase_timestamp"],
+        "products": ["product_id", "product_category_name"],
+        "categories": ["product_category_name", "product_category_name_english"],
+        "customers": ["customer_id", "customer_state"],
+        "payments": ["order_id", "payment_type"],
+    }
+    tablas = {nombre: leer_tabla(nombre, directorio, formato, columnas=cols) for nombre, cols in columnas.items()}
+    return construir_cubo(
+        tablas["order_items"], tablas["orders"], tablas["products"],
+        tablas["categories"], tablas["customers"], tablas["payments"],
+    )
+
+
+def guardar_cubo(cubo: pd.DataFrame, directorio: Path, formato: str = "csv") -> Path:
+    if formato == "parquet":
+        destino = directorio / "kpi_cube.parquet"
+        cubo.to_parquet(destino, engine="pyarrow", index=False)
+    else:
+        destino = directorio / "kpi_cube.csv"
+        cubo.to_csv(destino, index=False)
+    return destino
+
+
+def cargar_cubo(cubo: pd.DataFrame):
+    """
+    Reemplaza analytics.kpi_cube. La crea desde sql/kpi_cube.sql si no existe
+    o si es de una versión con otras columnas.
+    """
+    con = conexion()
+    with con.cursor() as cur:
+        cur.execute(
+            "SELECT array_agg(column_name::text ORDER BY ordinal_position) FROM information_schema.columns "
+            "WHERE table_schema = 'analytics' AND table_name = 'kpi_cube'"
+        )
+        if cur.fetchone()[0] != COLUMNAS_CUBO:
+            cur.execute(CUBO_SQL.read_text(encoding="utf-8"))
+        cur.execute("TRUNCATE TABLE analytics.kpi_cube")
+    # TRUNCATE y COPY en la misma transacción: si la carga falla queda el cubo anterior
+    cargar_tabla(cubo, "kpi_cube", tabla="analytics.kpi_cube")
+
+
+def generar_cubo(directorio: Path, formato: str = "csv", cargar: bool = False) -> pd.DataFrame:
+    inicio = time.perf_counter()
+    cubo = cubo_desde_tablas_limpias(directorio, formato)
+    guardar_cubo(cubo, directorio, formato)
+    print(f"  KPI cube built: {len(cubo)} cells in {time.perf_counter() - inicio:.2f}s")
+    if cargar:
+        cargar_cubo(cubo)
+    return cubo
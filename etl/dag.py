@@ -0,0 +1,152 @@
+import contextlib
+import io
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import instrumentacion
+
+
+# -----------------------
+# Grafo de etapas
+# -----------------------
+class Etapa:
+    """
+    Una tabla del pipeline: archivo crudo, función de limpieza, columnas de IDs
+    válidos que necesita (en el orden de los argumentos de la función) y la
+    columna de IDs que aporta a las etapas siguientes. `despues_de` agrega
+    etapas que tienen que terminar antes sin pasar IDs (p. ej. por una FK).
+
+    Lo que se pasa a las siguientes por `genera` es un IndiceClaves de esa
+    columna, salvo que `indice` indique otra función que lo arme desde la
+    tabla limpia (p. ej. el IndiceGeo de geolocation).
+    """
+
+    def __init__(self, nombre, archivo, funcion, requiere=(), genera=None, despues_de=(), indice=None):
+        self.nombre = nombre
+        self.archivo = archivo
+        self.funcion = funcion
+        self.requiere = tuple(requiere)
+        self.genera = genera
+        self.despues_de = tuple(despues_de)
+        self.indice = indice
+
+    def __repr__(self):
+        return f"Etapa({self.nombre!r})"
+
+
+class GrafoEtapas:
+    """
+    Dependencias entre etapas derivadas de requiere/genera: una etapa depende
+    de la que genera cada columna de IDs que requiere (y de sus `despues_de`).
+    """
+
+    def __init__(self, etapas):
+        self.etapas = {etapa.nombre: etapa for etapa in etapas}
+
+        productores = {e.genera: e.nombre for e in etapas if e.genera is not None}
+        self.dependencias = {}
+        for etapa in etapas:
+            faltantes = [col for col in etapa.requiere if col not in productores]
+            if faltantes:
+                raise ValueError(f"{etapa.nombre}: no stage generates {faltantes}")
+            desconocidas = [n for n in etapa.despues_de if n not in self.etapas]
+            if desconocidas:
+                raise ValueError(f"{etapa.nombre}: unknown stages {desconocidas}")
+            self.dependencias[etapa.nombre] = (
+                {productores[col] for col in etapa.requiere} | set(etapa.despues_de)
+            )
+
+        self.orden = self._orden_topologico()
+
+    def _orden_topologico(self):
+        """Orden topológico estable: respeta el orden declarado cuando no hay dependencias."""
+        orden = []
+        pendientes = list(self.etapas)
+        while pendientes:
+            listas = [n for n in pendientes if self.dependencias[n].issubset(orden)]
+            if not listas:
+                raise ValueError(f"Cycle between stages: {pendientes}")
+            orden.append(listas[0])
+            pendientes.remove(listas[0])
+        return orden
+
+    def dependientes(self, nombre):
+        """Cantidad de etapas que dependen (directa o indirectamente) de `nombre`."""
+        alcanzadas = set()
+        frontera = [nombre]
+        while frontera:
+            actual = frontera.pop()
+            for otra, deps in self.dependencias.items():
+                if actual in deps and otra not in alcanzadas:
+                    alcanzadas.add(otra)
+                    frontera.append(otra)
+        return len(alcanzadas)
+
+
+# -----------------------
+# Ejecución
+# -----------------------
+def _ejecutar_capturando(funcion, *args):
+    """Corre la etapa en un worker y devuelve su salida y sus mediciones junto al resultado."""
+    instrumentacion.reiniciar()
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        resultado = funcion(*args)
+    return salida.getvalue(), resultado, instrumentacion.extraer()
+
+
+def ejecutar_grafo(grafo: GrafoEtapas, funcion, workers: int = 1, args=()):
+    """
+    Ejecuta `funcion(etapa, ids_requeridos, *args)` para cada etapa del grafo.
+
+    `funcion` devuelve los IDs válidos que la etapa genera (o None); se guardan
+    por columna y se pasan, en el orden de `etapa.requiere`, a las etapas que
+    los necesitan.
+
+    Con workers > 1 las etapas cuyas dependencias ya terminaron corren en
+    paralelo en un pool de procesos. Los IDs viajan entre procesos como
+    IndiceClaves o el índice de la etapa (serializados con pickle), y la
+    salida de cada etapa se imprime junta al terminar.
+    """
+    valid_ids = {}
+
+    def ids_requeridos(etapa):
+        return [valid_ids[col] for col in etapa.requiere]
+
+    def registrar(etapa, ids):
+        if etapa.genera is not None:
+            valid_ids[etapa.genera] = ids
+
+    if workers <= 1:
+        for nombre in grafo.orden:
+            etapa = grafo.etapas[nombre]
+            registrar(etapa, funcion(etapa, ids_requeridos(etapa), *args))
+        return valid_ids
+
+    # Primero las etapas de las que dependen más tablas (camino crítico)
+    prioridad = {n: (-grafo.dependientes(n), i) for i, n in enumerate(grafo.orden)}
+    terminadas = set()
+    pendientes = set(grafo.orden)
+    en_curso = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pendientes or en_curso:
+            listas = sorted(
+                (n for n in pendientes if grafo.dependencias[n] <= terminadas),
+                key=prioridad.get
+            )
+            for nombre in listas:
+                etapa = grafo.etapas[nombre]
+                futuro = pool.submit(_ejecutar_capturando, funcion, etapa, ids_requeridos(etapa), *args)
+                en_curso[futuro] = etapa
+                pendientes.remove(nombre)
+
+            hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                etapa = en_curso.pop(futuro)
+                salida, ids, mediciones = futuro.result()
+                print(salida, end='')
+                instrumentacion.incorporar(mediciones)
+                registrar(etapa, ids)
+                terminadas.add(etapa.nombre)
+
+    return valid_ids
@@ -0,0 +1,461 @@
+import hashlib
+import pickle
+import re
+import shutil
+import tempfile
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from normalizacion import _categorica, normalizar_serie
+from instrumentacion import contar_regla, medido
+
+
+# -----------------------
+# Hash de filas
+# -----------------------
+def hash_filas(df: pd.DataFrame, subset=None) -> np.ndarray:
+    """
+    Hash de 64 bits por fila sobre las columnas indicadas (todas si subset es None).
+    Las columnas numéricas pasan a float64 y todo a object antes de hashear, así
+    un mismo valor da el mismo hash aunque read_csv infiera otro dtype en otro chunk.
+    """
+    if subset is not None:
+        columnas = [subset] if isinstance(subset, str) else list(subset)
+        df = df[columnas]
+
+    canonico = pd.DataFrame({
+        col: (
+            df[col].astype('float64') if pd.api.types.is_numeric_dtype(df[col]) else df[col]
+        ).astype(object)
+        for col in df.columns
+    })
+    return pd.util.hash_pandas_object(canonico, index=False).to_numpy()
+
+
+# Multiplicador para combinar hashes de 64 bits en uno
+_MEZCLA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def en_ordenado(ordenado: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    """Máscara de los `hashes` que están en el array ordenado (en memoria o en disco)."""
+    if len(ordenado) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    posiciones = np.searchsorted(ordenado, hashes)
+    posiciones[posiciones == len(ordenado)] = 0
+    return np.asarray(ordenado[posiciones]) == hashes
+
+
+# -----------------------
+# Claves vistas (con volcado a disco)
+# -----------------------
+# Hashes que se guardan en memoria antes de volcarlos a disco (8 bytes cada uno);
+# --dedup-memory-mb lo cambia para la corrida
+MAX_HASHES_EN_MEMORIA = 32 * 1024 * 1024
+
+
+def fijar_memoria(mb: int):
+    """--dedup-memory-mb: hashes en memoria antes de volcar a disco (los workers lo heredan)."""
+    global MAX_HASHES_EN_MEMORIA
+    MAX_HASHES_EN_MEMORIA = mb * 1024 * 1024 // 8
+
+
+class ClavesVistas:
+    """
+    Claves ya vistas en chunks anteriores, guardadas como hashes de 64 bits
+    en un array ordenado (8 bytes por clave distinta).
+
+    Cuando el array pasa de MAX_HASHES_EN_MEMORIA se vuelca a un archivo
+    temporal (un tramo ordenado, abierto con memory map) y se empieza otro:
+    las tablas enormes deduplican entre chunks sin tener todas las claves en
+    memoria. Cada chunk se busca en los tramos con searchsorted.
+    """
+
+    def __init__(self, hashes: np.ndarray = None):
+        self._hashes = np.empty(0, dtype=np.uint64) if hashes is None else hashes
+        self._tramos = []
+        self._directorio = None
+
+    def __len__(self):
+        return len(self._hashes) + sum(len(tramo) for tramo in self._tramos)
+
+    def __reduce__(self):
+        # Al serializar (estado incremental, workers) los tramos vuelven a memoria
+        return (ClavesVistas, (self.hashes,))
+
+    @property
+    def hashes(self) -> np.ndarray:
+        """Todos los hashes vistos, ordenados (los tramos en disco incluidos)."""
+        if not self._tramos:
+            return self._hashes
+        return np.sort(np.concatenate([self._hashes, *self._tramos]))
+
+    def nuevas(self, df: pd.DataFrame, subset=None) -> np.ndarray:
+        """
+        Máscara de las filas a conservar: sin duplicados dentro del chunk ni
+        claves vistas antes (se queda con la primera). Las registra como vistas.
+        """
+        hashes = hash_filas(df, subset)
+        nuevas = ~pd.Series(hashes).duplicated().to_numpy()
+        for vistas in (self._hashes, *self._tramos):
+            nuevas &= ~en_ordenado(vistas, hashes)
+
+        self._hashes = np.union1d(self._hashes, hashes[nuevas])
+        if len(self._hashes) > MAX_HASHES_EN_MEMORIA:
+            self._volcar()
+        return nuevas
+
+    def _volcar(self):
+        if self._directorio is None:
+            self._directorio = tempfile.mkdtemp(prefix="claves_vistas_")
+            weakref.finalize(self, shutil.rmtree, self._directorio, True)
+        destino = Path(self._directorio) / f"tramo_{len(self._tramos)}.npy"
+        np.save(destino, self._hashes)
+        self._tramos.append(np.load(destino, mmap_mode="r"))
+        self._hashes = np.empty(0, dtype=np.uint64)
+
+
+# -----------------------
+# Claves en conflicto
+# -----------------------
+def _pares_clave_identidad(claves: pd.Series, identidades: pd.Series) -> pd.DataFrame:
+    """Pares (clave, identidad) distintos, normalizados y sin nulos."""
+    pares = pd.DataFrame({
+        "clave": claves.to_numpy(dtype=object),
+        "identidad": normalizar_serie(identidades).to_numpy(dtype=object),
+    }).dropna()
+    return pares.drop_duplicates()
+
+
+def valores_en_conflicto(claves: pd.Series, identidades: pd.Series) -> np.ndarray:
+    """
+    Claves (ya normalizadas) que aparecen con más de una identidad distinta:
+    no identifican una entidad sino que son un marcador (p. ej. FAKE_KEY_1
+    compartido por cientos de clientes distintos). Solo se miran las claves
+    repetidas, y las identidades nulas no cuentan.
+    """
+    repetidas = (claves.duplicated(keep=False) & claves.notna()).to_numpy()
+    if not repetidas.any():
+        return np.empty(0, dtype=object)
+    pares = _pares_clave_identidad(claves[repetidas], identidades[repetidas])
+    identidades_por_clave = pares.groupby("clave").size()
+    return identidades_por_clave.index[identidades_por_clave > 1].to_numpy()
+
+
+# Cubetas en disco del recorrido del crudo (por los 4 bits altos del hash de la clave)
+CUBETAS = 16
+
+
+def _repetidas_en(pares: np.ndarray) -> np.ndarray:
+    """Hashes de clave con más de un hash de identidad entre pares (clave, identidad) de uint64."""
+    if len(pares) == 0:
+        return np.empty(0, dtype=np.uint64)
+    # Pares distintos por un hash de los dos (un unique de una dimensión, no por filas)
+    _, primeros = np.unique(pares[:, 0] * _MEZCLA ^ pares[:, 1], return_index=True)
+    claves = np.sort(pares[primeros, 0])
+    return np.unique(claves[1:][claves[1:] == claves[:-1]])
+
+
+@medido("claves_en_conflicto")
+def claves_en_conflicto(path: Path, clave: str, identidad: str, dtype: dict = None,
+                        chunksize: int = 1_000_000) -> np.ndarray:
+    """
+    Hashes (hash_filas) de las claves en conflicto de todo el CSV crudo, para
+    los modos que no ven la tabla entera (--chunksize, --incremental). Lee
+    solo las dos columnas por chunks; los pares (clave, identidad) distintos
+    se juntan en memoria y, si pasan de MAX_HASHES_EN_MEMORIA, se vuelcan a
+    CUBETAS archivos por los bits altos de la clave, que se resuelven de a uno.
+    """
+    tipos = {col: t for col, t in (dtype or {}).items() if col in (clave, identidad)}
+    en_memoria, filas_en_memoria = [], 0
+    with tempfile.TemporaryDirectory(prefix="claves_en_conflicto_") as directorio:
+        cubetas = [Path(directorio) / f"cubeta_{i}.bin" for i in range(CUBETAS)]
+        volcado = False
+
+        def volcar():
+            pares = np.concatenate(en_memoria)
+            cubeta = pares[:, 0] >> np.uint64(60)
+            for i, destino in enumerate(cubetas):
+                with open(destino, "ab") as f:
+                    pares[cubeta == i].tofile(f)
+
+        for chunk in pd.read_csv(path, usecols=[clave, identidad], dtype=tipos, chunksize=chunksize):
+            pares = _pares_clave_identidad(normalizar_serie(chunk[clave]), chunk[identidad])
+            if pares.empty:
+                continue
+            en_memoria.append(np.column_stack([
+                hash_filas(pares[["clave"]].rename(columns={"clave": clave})),
+                hash_filas(pares, ["identidad"]),
+            ]))
+            filas_en_memoria += len(pares)
+            if 2 * filas_en_memoria > MAX_HASHES_EN_MEMORIA:
+                volcar()
+                en_memoria, filas_en_memoria, volcado = [], 0, True
+
+        if not volcado:
+            return _repetidas_en(np.concatenate(en_memoria) if en_memoria else np.empty((0, 2), np.uint64))
+        if en_memoria:
+            volcar()
+        partes = [
+            _repetidas_en(np.fromfile(destino, dtype=np.uint64).reshape(-1, 2))
+            for destino in cubetas if destino.exists()
+        ]
+    return np.sort(np.concatenate(partes))
+
+
+# -----------------------
+# Ciudades casi duplicadas (MinHash)
+# -----------------------
+# Nombres de los estados (sin acentos): "Carapicuiba / Sao Paulo" o
+# "Lages - Sc" repiten el estado después de la ciudad
+NOMBRES_ESTADOS = {
+    'AC': 'acre', 'AL': 'alagoas', 'AP': 'amapa', 'AM': 'amazonas', 'BA': 'bahia',
+    'CE': 'ceara', 'DF': 'distrito federal', 'ES': 'espirito santo', 'GO': 'goias',
+    'MA': 'maranhao', 'MT': 'mato grosso', 'MS': 'mato grosso do sul', 'MG': 'minas gerais',
+    'PA': 'para', 'PB': 'paraiba', 'PR': 'parana', 'PE': 'pernambuco', 'PI': 'piaui',
+    'RJ': 'rio de janeiro', 'RN': 'rio grande do norte', 'RS': 'rio grande do sul',
+    'RO': 'rondonia', 'RR': 'roraima', 'SC': 'santa catarina', 'SP': 'sao paulo',
+    'SE': 'sergipe', 'TO': 'tocantins',
+}
+
+NGRAMA = 3
+PERMUTACIONES = 64
+# 16 bandas de 4 valores: un par con Jaccard 0.75 es candidato con probabilidad > 0.999
+BANDAS = 16
+UMBRAL_JACCARD = 0.75
+
+# Cambia con el algoritmo: invalida las ciudades canónicas cacheadas
+VERSION_CIUDADES = 1
+
+_PRIMO = np.uint64((1 << 61) - 1)
+_A, _B = (
+    np.random.default_rng(20180901).integers(1, 1 << 32, size=(2, PERMUTACIONES), dtype=np.uint64)
+)
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+_NUMEROS = re.compile(r"\d+")
+
+
+def clave_ciudad(ciudad: str, estado: str) -> str:
+    """
+    Forma de comparar una ciudad: minúsculas, sin puntuación y sin el estado
+    repetido al final ("Sao Paulo - Sp" y "sao paulo/sao paulo" dan "sao paulo").
+    """
+    clave = " ".join(_NO_ALFANUMERICO.sub(" ", ciudad.lower()).split())
+    for sufijo in (estado.lower(), NOMBRES_ESTADOS.get(estado, "")):
+        if sufijo and clave.endswith(" " + sufijo):
+            clave = clave[:-len(sufijo) - 1]
+    return clave
+
+
+def _ngramas(clave: str) -> set:
+    texto = f" {clave} "
+    return {texto[i:i + NGRAMA] for i in range(max(len(texto) - NGRAMA + 1, 1))}
+
+
+def _numeros(clave: str) -> tuple:
+    # "Cidade 101" y "Cidade 1019" se parecen pero son otras ciudades
+    return tuple(_NUMEROS.findall(clave))
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def firmas_minhash(conjuntos: list) -> np.ndarray:
+    """
+    Firma MinHash (PERMUTACIONES valores) de cada conjunto de n-gramas, toda
+    con NumPy: cada n-grama se hashea una vez y el mínimo por conjunto sale
+    de un reduceat sobre los n-gramas de todos los conjuntos juntos.
+    """
+    largos = np.fromiter(map(len, conjuntos), dtype=np.int64, count=len(conjuntos))
+    if len(conjuntos) == 0:
+        return np.empty((0, PERMUTACIONES), dtype=np.uint64)
+    gramas = np.array([g for conjunto in conjuntos for g in sorted(conjunto)], dtype=object)
+    hashes = pd.util.hash_array(gramas) & np.uint64(0xFFFFFFFF)
+    # a * h + b < 2^64 con a, h < 2^32: sin desborde antes del módulo
+    valores = (hashes[:, None] * _A[None, :] + _B[None, :]) % _PRIMO
+    inicios = np.concatenate(([0], np.cumsum(largos)[:-1]))
+    return np.minimum.reduceat(valores, inicios, axis=0)
+
+
+def bandas_lsh(firmas: np.ndarray) -> np.ndarray:
+    """
+    Un hash por banda de cada firma (BANDAS columnas): dos firmas con una
+    banda igual son candidatas. Una colisión solo agrega un candidato de más,
+    que después se descarta por Jaccard.
+    """
+    bloques = firmas.reshape(len(firmas), BANDAS, PERMUTACIONES // BANDAS)
+    bandas = np.zeros((len(firmas), BANDAS), dtype=np.uint64)
+    for j in range(bloques.shape[2]):
+        bandas = bandas * _MEZCLA ^ bloques[:, :, j]
+    return bandas
+
+
+class CiudadesCanonicas:
+    """
+    Nombre canónico de cada ciudad por estado, aprendido de una tabla de
+    referencia (geolocation limpia) con la cantidad de filas de cada escritura.
+
+    Las escrituras con la misma clave_ciudad se juntan directo; las demás se
+    agrupan por similitud de n-gramas (Jaccard >= UMBRAL_JACCARD) con MinHash
+    y LSH por bandas dentro de cada estado: solo se comparan los pares que
+    comparten una banda (y los mismos números en el nombre), nunca todos
+    contra todos. De mayor a menor cantidad de filas, cada ciudad se une a
+    la cabeza más parecida o pasa a ser una (sin encadenar parecidos); el
+    nombre canónico es la escritura más frecuente de la cabeza.
+
+    Es chico (una entrada por ciudad distinta) y se serializa con pickle.
+    """
+
+    def __init__(self, conteos: pd.DataFrame):
+        """`conteos`: columnas ciudad, estado y filas (una fila por escritura distinta)."""
+        conteos = conteos[conteos["filas"] > 0].dropna(subset=["ciudad", "estado"])
+        conteos = conteos.assign(
+            ciudad=conteos["ciudad"].astype(str), estado=conteos["estado"].astype(str)
+        )
+        conteos = conteos.assign(clave=[
+            clave_ciudad(c, e) for c, e in zip(conteos["ciudad"], conteos["estado"])
+        ])
+
+        # Una entrada por (estado, clave): filas totales y su escritura más frecuente
+        escrituras = conteos.sort_values(["filas", "ciudad"], ascending=[False, True], kind="mergesort")
+        claves = escrituras.groupby(["estado", "clave"], sort=False).agg(
+            filas=("filas", "sum"), ciudad=("ciudad", "first")
+        ).reset_index()
+        claves = claves.sort_values(["filas", "estado", "clave"], ascending=[False, True, True],
+                                    kind="mergesort").reset_index(drop=True)
+
+        self._ngramas = [_ngramas(c) for c in claves["clave"]]
+        self._numeros = [_numeros(c) for c in claves["clave"]]
+        bandas = bandas_lsh(firmas_minhash(self._ngramas))
+        self._estados = claves["estado"].tolist()
+        self._nombres = claves["ciudad"].tolist()
+        self._cubetas = {}
+        self._cabeza_de_clave = {}
+
+        for i, (estado, clave) in enumerate(zip(self._estados, claves["clave"])):
+            claves_bandas = self._claves_bandas(estado, bandas[i])
+            cabeza = self._mas_parecida(self._ngramas[i], self._numeros[i], claves_bandas)
+            if cabeza is None:
+                cabeza = i
+                for banda in claves_bandas:
+                    self._cubetas.setdefault(banda, []).append(i)
+            self._cabeza_de_clave[(estado, clave)] = cabeza
+
+        # Escritura original -> nombre canónico
+        self._canonica = {
+            (ciudad, estado): self._nombres[self._cabeza_de_clave[(estado, clave)]]
+            for ciudad, estado, clave in zip(conteos["ciudad"], conteos["estado"], conteos["clave"])
+        }
+        self.escrituras = len(conteos)
+        self.ciudades = len(set(self._cabeza_de_clave.values()))
+
+    def __repr__(self):
+        return f"CiudadesCanonicas({self.escrituras} spellings -> {self.ciudades} cities)"
+
+    def huella(self) -> str:
+        """sha256 de la agrupación: cambia si cambia la canónica de alguna escritura de la referencia."""
+        grupos = sorted((e, c, self._nombres[cabeza]) for (e, c), cabeza in self._cabeza_de_clave.items())
+        return hashlib.sha256(repr(grupos).encode()).hexdigest()
+
+    @staticmethod
+    def _claves_bandas(estado: str, bandas: np.ndarray) -> list:
+        # Las cubetas son por estado: solo se comparan ciudades del mismo estado
+        return [(estado, b, banda) for b, banda in enumerate(bandas.tolist())]
+
+    def _mas_parecida(self, ngramas: set, numeros: tuple, claves_bandas: list):
+        """Cabeza con los mismos números y mayor Jaccard (>= UMBRAL_JACCARD) entre las candidatas de las cubetas."""
+        candidatas = sorted(
+            c for c in {c for banda in claves_bandas for c in self._cubetas.get(banda, ())}
+            if self._numeros[c] == numeros
+        )
+        mejor, mejor_jaccard = None, UMBRAL_JACCARD
+        for c in candidatas:
+            jaccard = _jaccard(ngramas, self._ngramas[c])
+            if jaccard >= mejor_jaccard and (mejor is None or jaccard > mejor_jaccard):
+                mejor, mejor_jaccard = c, jaccard
+        return mejor
+
+    def canonica(self, ciudad: str, estado: str):
+        """Nombre canónico de (ciudad, estado), o None si no se parece a ninguna ciudad de la referencia."""
+        if (ciudad, estado) not in self._canonica:
+            clave = clave_ciudad(ciudad, estado)
+            cabeza = self._cabeza_de_clave.get((estado, clave))
+            if cabeza is None:
+                ngramas = _ngramas(clave)
+                bandas = bandas_lsh(firmas_minhash([ngramas]))[0]
+                cabeza = self._mas_parecida(ngramas, _numeros(clave), self._claves_bandas(estado, bandas))
+            self._canonica[(ciudad, estado)] = self._nombres[cabeza] if cabeza is not None else None
+        return self._canonica[(ciudad, estado)]
+
+    def canonizar(self, ciudades: pd.Series, estados: pd.Series, regla: str = None) -> pd.Series:
+        """
+        Las ciudades con su nombre canónico (las que no se parecen a ninguna
+        de la referencia, o sin estado, quedan igual). Se resuelve una vez por
+        par (ciudad, estado) distinto; las columnas category siguen siéndolo.
+        Con `regla`, las filas cambiadas se cuentan como esa regla de calidad.
+        """
+        codigos_ciudad, ciudades_unicas = pd.factorize(ciudades, use_na_sentinel=True)
+        codigos_estado, estados_unicos = pd.factorize(estados, use_na_sentinel=True)
+        codigos, pares = pd.factorize(
+            codigos_ciudad.astype(np.int64) * (len(estados_unicos) + 1) + (codigos_estado + 1)
+        )
+        valores = np.empty(len(pares), dtype=object)
+        cambiadas = np.zeros(len(pares), dtype=bool)
+        for i, par in enumerate(pares):
+            c, e = divmod(int(par), len(estados_unicos) + 1)
+            if c < 0 or e == 0:
+                # Ciudad o estado nulo: queda igual
+                valores[i] = ciudades_unicas[c] if c >= 0 else np.nan
+                continue
+            ciudad = ciudades_unicas[c]
+            canonica = self.canonica(str(ciudad), str(estados_unicos[e - 1]))
+            valores[i] = canonica if canonica is not None else ciudad
+            # Solo cuenta si cambió la escritura, no las mayúsculas (sellers va en minúsculas)
+            cambiadas[i] = canonica is not None and canonica.lower() != str(ciudad).lower()
+
+        if regla is not None:
+            contar_regla(ciudades.name, regla, "corrige", np.count_nonzero(cambiadas[codigos]))
+        if isinstance(ciudades.dtype, pd.CategoricalDtype):
+            return _categorica(valores, codigos, ciudades)
+        return pd.Series(valores[codigos], index=ciudades.index, name=ciudades.name)
+
+    @classmethod
+    def desde_tabla(cls, df: pd.DataFrame, col_ciudad: str, col_estado: str,
+                    cache_dir: Path = None) -> "CiudadesCanonicas":
+        """
+        Ciudades canónicas de la tabla. Con `cache_dir` se reutilizan las de
+        la corrida anterior si las escrituras y sus cantidades no cambiaron.
+        """
+        conteos = (
+            df.groupby([col_ciudad, col_estado], observed=True).size()
+            .rename("filas").rename_axis(["ciudad", "estado"]).reset_index()
+        )
+        conteos["ciudad"] = conteos["ciudad"].astype(object)
+        conteos["estado"] = conteos["estado"].astype(object)
+        if cache_dir is None:
+            return cls(conteos)
+
+        parametros = f"{VERSION_CIUDADES}|{NGRAMA}|{PERMUTACIONES}|{BANDAS}|{UMBRAL_JACCARD}|"
+        firma = hashlib.sha256(
+            (parametros + conteos.sort_values(["estado", "ciudad"]).to_csv(index=False)).encode()
+        ).hexdigest()
+        destino = Path(cache_dir) / "ciudades_canonicas.pkl"
+        try:
+            with open(destino, "rb") as f:
+                guardado = pickle.load(f)
+            if guardado["firma"] == firma:
+                return guardado["ciudades"]
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError):
+            pass
+
+        ciudades = cls(conteos)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporal = destino.with_name(f"{destino.name}.tmp")
+        with open(temporal, "wb") as f:
+            pickle.dump({"firma": firma, "ciudades": ciudades}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        temporal.replace(destino)
+        return ciudades
@@ -0,0 +1,215 @@
+import re
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from almacenamiento import tipos_crudos
+from dag import Etapa, GrafoEtapas, ejecutar_grafo
+
+
+# -----------------------
+# DDL de las tablas clean
+# -----------------------
+CLEAN_TABLES_SQL = Path(__file__).resolve().parent.parent / "sql" / "clean_tables.sql"
+
+_TABLA = re.compile(r"CREATE TABLE public\.(\w+)_clean \((.*?)\n\);", re.S)
+_COLUMNA = re.compile(r"^\s*(\w+)\s+([A-Z][A-Z ]*?)(\s+NOT NULL)?\s*,?\s*$")
+_CLAVE = re.compile(r"ALTER TABLE (?:public\.)?(\w+)_clean\s+ADD CONSTRAINT \w+\s+PRIMARY KEY \(([^)]*)\)")
+
+
+def esquema_ddl(path: Path = CLEAN_TABLES_SQL) -> dict:
+    """
+    Columnas (nombre, tipo, NOT NULL) en orden y clave primaria de cada
+    tabla public.{nombre}_clean del DDL.
+    """
+    texto = Path(path).read_text(encoding="utf-8")
+    esquema = {}
+    for nombre, cuerpo in _TABLA.findall(texto):
+        columnas = []
+        for linea in cuerpo.splitlines():
+            coincide = _COLUMNA.match(linea)
+            if coincide:
+                columnas.append((coincide.group(1), coincide.group(2), bool(coincide.group(3))))
+        esquema[nombre] = {"columnas": columnas, "clave": []}
+    for nombre, clave in _CLAVE.findall(texto):
+        if nombre in esquema:
+            esquema[nombre]["clave"] = [col.strip() for col in clave.split(",")]
+    return esquema
+
+
+def _compatible(serie: pd.Series, tipo: str) -> bool:
+    """Si COPY puede cargar la columna (escrita como en el CSV) en una columna SQL de `tipo`."""
+    if tipo in ("BIGINT", "INTEGER", "SMALLINT"):
+        # Un float se escribe "123.0": Postgres no lo acepta como entero
+        return pd.api.types.is_integer_dtype(serie.dtype)
+    if tipo in ("NUMERIC", "DOUBLE PRECISION", "REAL"):
+        return pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype)
+    if tipo.startswith("TIMESTAMP") or tipo == "DATE":
+        return pd.api.types.is_datetime64_any_dtype(serie.dtype)
+    return True
+
+
+def validar_ddl(df: pd.DataFrame, tabla: dict):
+    """
+    Errores y notas de cargar `df` en la tabla del DDL. La carga es por
+    posición (como sql/load_clean_data.sql): un nombre distinto es solo una
+    nota, una columna de más o de menos es un error.
+    """
+    errores, notas = [], []
+    esperadas = tabla["columnas"]
+    if len(df.columns) != len(esperadas):
+        errores.append(
+            f"{len(df.columns)} columns, DDL has {len(esperadas)}: "
+            f"got {list(df.columns)}, expected {[col for col, _, _ in esperadas]}"
+        )
+        return errores, notas
+
+    for posicion, (col_df, (col_sql, tipo, no_nulo)) in enumerate(zip(df.columns, esperadas)):
+        serie = df.iloc[:, posicion]
+        # Las columnas de la clave primaria son NOT NULL aunque no lo digan
+        no_nulo = no_nulo or col_sql in tabla["clave"]
+        if col_df != col_sql:
+            notas.append(f"column {posicion + 1} is {col_df!r}, DDL names it {col_sql!r} (loaded by position)")
+        if not _compatible(serie, tipo):
+            errores.append(f"{col_df}: dtype {serie.dtype} does not fit {tipo}")
+        if no_nulo and serie.isna().any():
+            errores.append(f"{col_df}: {int(serie.isna().sum())} nulls in a NOT NULL column")
+
+    # La clave primaria, por posición de sus columnas en el DDL
+    nombres_sql = [col for col, _, _ in esperadas]
+    clave = [df.columns[nombres_sql.index(col)] for col in tabla["clave"] if col in nombres_sql]
+    if clave and df.duplicated(subset=clave).any():
+        errores.append(f"{int(df.duplicated(subset=clave).sum())} duplicated primary keys {clave}")
+    return errores, notas
+
+
+# -----------------------
+# Muestra estratificada
+# -----------------------
+# Bloques del archivo de los que sale la muestra (filas consecutivas de cada uno)
+ESTRATOS = 10
+
+BYTES_POR_BLOQUE = 8 * 1024 * 1024
+
+
+def contar_filas(path: Path) -> int:
+    """Filas de datos del CSV contando saltos de línea (aproximado si hay texto con saltos entre comillas)."""
+    lineas, ultimo = 0, b"\n"
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(BYTES_POR_BLOQUE), b""):
+            lineas += bloque.count(b"\n")
+            ultimo = bloque[-1:]
+    if ultimo != b"\n":
+        lineas += 1
+    return max(lineas - 1, 0)
+
+
+def leer_muestra(path: Path, filas: int, dtype: dict = None, total: int = None, estratos: int = ESTRATOS):
+    """
+    Muestra de ~`filas` filas repartidas en `estratos` bloques del archivo
+    (skiprows: el resto de las filas se saltea sin convertir) y segundos de
+    lectura por fila, medidos con las primeras filas.
+    """
+    por_estrato = max(1, -(-filas // estratos))
+    inicio = time.perf_counter()
+    cabeza = pd.read_csv(path, dtype=dtype, nrows=por_estrato)
+    segundos_por_fila = (time.perf_counter() - inicio) / max(len(cabeza), 1)
+
+    total = contar_filas(path) if total is None else total
+    if total <= filas:
+        return pd.read_csv(path, dtype=dtype), segundos_por_fila
+
+    paso = total // estratos
+    muestra = pd.read_csv(
+        path, dtype=dtype, nrows=por_estrato * estratos,
+        # Línea 0: encabezado; de cada bloque de `paso` filas quedan las primeras
+        skiprows=lambda i: i > 0 and (i - 1) % paso >= por_estrato,
+    )
+    return muestra, segundos_por_fila
+
+
+# -----------------------
+# Ensayo de las etapas
+# -----------------------
+def ensayar_etapa(etapa: Etapa, ids_requeridos, raw_dir: Path, filas: int, esquema: dict) -> dict:
+    """
+    Limpia una muestra de la tabla sin IDs válidos de otras etapas (con
+    muestras, casi ninguna FK coincidiría) y valida la salida contra el DDL.
+    """
+    path = Path(raw_dir) / etapa.archivo
+    resultado = {"tabla": etapa.nombre, "errores": [], "notas": [], "filas": 0, "muestra": 0}
+    errores = resultado["errores"]
+
+    try:
+        encabezado = list(pd.read_csv(path, nrows=0).columns)
+    except (OSError, ValueError) as e:
+        errores.append(f"cannot read header: {e}")
+        return resultado
+    tipos = tipos_crudos(etapa.nombre)
+    faltantes = [col for col in tipos if col not in encabezado]
+    if faltantes:
+        errores.append(f"raw columns missing: {faltantes} (header: {encabezado})")
+
+    resultado["filas"] = total = contar_filas(path)
+    muestra, segundos_por_fila = leer_muestra(path, filas, tipos, total)
+    resultado["muestra"] = len(muestra)
+
+    inicio = time.perf_counter()
+    try:
+        limpio = etapa.funcion(muestra)
+    except Exception as e:  # cualquier falla de la limpieza es el resultado del ensayo
+        errores.append(f"clean failed: {type(e).__name__}: {e}")
+        return resultado
+    segundos_limpieza = time.perf_counter() - inicio
+
+    # Costos por fila de la muestra, llevados a la tabla entera
+    escala = total / max(len(muestra), 1)
+    resultado["segundos"] = segundos_por_fila * total + segundos_limpieza * escala
+    resultado["mb"] = (
+        muestra.memory_usage(deep=True).sum() + limpio.memory_usage(deep=True).sum()
+    ) * escala / 1024 ** 2
+
+    if etapa.nombre not in esquema:
+        errores.append("no table in the DDL")
+        return resultado
+    errores_ddl, notas = validar_ddl(limpio, esquema[etapa.nombre])
+    errores.extend(errores_ddl)
+    resultado["notas"] = notas
+    return resultado
+
+
+def ensayar(etapas: GrafoEtapas, raw_dir: Path, filas: int, workers: int = 1,
+            ddl: Path = CLEAN_TABLES_SQL) -> bool:
+    """
+    --dry-run: limpia una muestra de cada tabla (todas en paralelo, sin
+    dependencias entre ellas), estima tiempo y memoria de la corrida completa
+    y valida las salidas contra el DDL. Devuelve si no hubo errores.
+    """
+    esquema = esquema_ddl(ddl)
+    independientes = GrafoEtapas([
+        Etapa(e.nombre, e.archivo, e.funcion, genera=e.nombre) for e in etapas.etapas.values()
+    ])
+    resultados = ejecutar_grafo(
+        independientes, ensayar_etapa, workers=workers, args=(raw_dir, filas, esquema)
+    )
+
+    print(f"Dry run ({filas} rows per table, {ESTRATOS} strata):")
+    problemas = 0
+    for nombre in etapas.orden:
+        r = resultados[nombre]
+        estimado = f", est. {r['segundos']:.1f}s and ~{r['mb']:.0f} MB" if "segundos" in r else ""
+        estado = "FAILED" if r["errores"] else "ok"
+        print(f"  {nombre}: {r['muestra']} of {r['filas']:,} rows sampled{estimado} ... {estado}")
+        for nota in r["notas"]:
+            print(f"    note: {nota}")
+        for error in r["errores"]:
+            print(f"    error: {error}")
+        problemas += len(r["errores"])
+
+    estimados = [r for r in resultados.values() if "segundos" in r]
+    if estimados:
+        print(f"Estimated full run: {sum(r['segundos'] for r in estimados):.1f}s serial, "
+              f"~{max(r['mb'] for r in estimados):.0f} MB for the largest table")
+    print("Dry run passed" if problemas == 0 else f"Dry run failed: {problemas} problems")
+    return problemas == 0
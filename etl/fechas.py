@@ -0,0 +1,301 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from instrumentacion import contar_regla, medido
+
+
+# -----------------------
+# Parseo de fechas
+# -----------------------
+# Rango válido de años del dataset Olist
+ANIO_MIN = 2016
+ANIO_MAX = 2018
+
+# Strings que pd.to_datetime ignora al elegir el valor del que infiere el formato
+_CADENAS_NAT = ['', 'nan', 'NaN', 'NAN', 'NaT', 'nat', 'NAT']
+
+_DIAS_POR_MES = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Formatos de ancho fijo: (regex, posiciones de cada componente en el string).
+# Se parsean cortando columnas de bytes con NumPy, sin strptime por valor.
+_HORA = {'hour': (11, 13), 'minute': (14, 16), 'second': (17, 19)}
+_ANCHO_FIJO = {
+    '%d/%m/%Y %H:%M:%S': (
+        r'[0-9]{2}/[0-9]{2}/[0-9]{4} [0-9]{2}:[0-9]{2}:[0-9]{2}',
+        {'day': (0, 2), 'month': (3, 5), 'year': (6, 10), **_HORA},
+    ),
+    '%d/%m/%Y %H:%M': (
+        r'[0-9]{2}/[0-9]{2}/[0-9]{4} [0-9]{2}:[0-9]{2}',
+        {'day': (0, 2), 'month': (3, 5), 'year': (6, 10), 'hour': (11, 13), 'minute': (14, 16)},
+    ),
+    '%d/%m/%Y': (
+        r'[0-9]{2}/[0-9]{2}/[0-9]{4}',
+        {'day': (0, 2), 'month': (3, 5), 'year': (6, 10)},
+    ),
+    '%m/%d/%Y %H:%M:%S': (
+        r'[0-9]{2}/[0-9]{2}/[0-9]{4} [0-9]{2}:[0-9]{2}:[0-9]{2}',
+        {'month': (0, 2), 'day': (3, 5), 'year': (6, 10), **_HORA},
+    ),
+    '%m/%d/%Y %H:%M': (
+        r'[0-9]{2}/[0-9]{2}/[0-9]{4} [0-9]{2}:[0-9]{2}',
+        {'month': (0, 2), 'day': (3, 5), 'year': (6, 10), 'hour': (11, 13), 'minute': (14, 16)},
+    ),
+    '%m/%d/%Y': (
+        r'[0-9]{2}/[0-9]{2}/[0-9]{4}',
+        {'month': (0, 2), 'day': (3, 5), 'year': (6, 10)},
+    ),
+}
+_FORMATOS_DIA_PRIMERO = ['%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y']
+_FORMATOS_MES_PRIMERO = ['%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y']
+
+# DD/MM/YYYY seguido opcionalmente de un token de hora
+_PATRON_DD_MM_YYYY = (
+    r'^(?P<dia>[+-]?\d+)/(?P<mes>[+-]?\d+)/(?P<anio>[+-]?\d+)'
+    r'(?:\s+(?P<hora>\S+))?(?:\s|$)'
+)
+# Horas que el parser ISO8601 de pandas resuelve igual que el parseo escalar
+_PATRON_HORA = r'\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?'
+
+
+def _dias_en_mes(anio, mes):
+    """Equivalente vectorizado de calendar.monthrange(anio, mes)[1]."""
+    anio = np.asarray(anio)
+    mes = np.asarray(mes)
+    bisiesto = ((anio % 4 == 0) & (anio % 100 != 0)) | (anio % 400 == 0)
+    return _DIAS_POR_MES[mes - 1] + ((mes == 2) & bisiesto)
+
+
+def _posicion_ancla(valores: pd.Series):
+    """Posición del primer valor no nulo: el que usa pd.to_datetime para inferir el formato."""
+    candidatos = ~valores.isin(_CADENAS_NAT).to_numpy()
+    if not candidatos.any():
+        return None
+    return int(np.argmax(candidatos))
+
+
+def _ancla(valores: pd.Series):
+    posicion = _posicion_ancla(valores)
+    return None if posicion is None else valores.iloc[posicion]
+
+
+def detectar_formato(valores: pd.Series, dayfirst: bool = False):
+    """
+    Devuelve el formato explícito (strftime) que pd.to_datetime inferiría para
+    la serie: el del primer valor no nulo. None si no se reconoce ninguno.
+    """
+    ancla = _ancla(valores)
+    if ancla is None:
+        return None
+    return guess_datetime_format(ancla, dayfirst=dayfirst)
+
+
+class FormatosFecha:
+    """
+    Formato elegido en cada pasada de corregir_fecha_invalida para una columna.
+    En modo streaming se fija con el primer chunk que tiene un valor del cual
+    inferirlo, así todos los chunks se parsean igual que la columna completa.
+    `fijados` permite arrancar con formatos ya decididos (modo particionado).
+    """
+
+    def __init__(self, fijados: dict = None):
+        self._por_pasada = dict(fijados or {})
+        # Etiqueta (índice) de la fila de la que se infirió cada pasada
+        self.anclas = {}
+
+    @property
+    def fijados(self) -> dict:
+        return dict(self._por_pasada)
+
+    def resolver(self, pasada: int, valores: pd.Series, dayfirst: bool):
+        if pasada in self._por_pasada:
+            return self._por_pasada[pasada]
+
+        posicion = _posicion_ancla(valores)
+        if posicion is None:
+            return None
+
+        formato = guess_datetime_format(valores.iloc[posicion], dayfirst=dayfirst)
+        self._por_pasada[pasada] = formato
+        self.anclas[pasada] = valores.index[posicion]
+        return formato
+
+
+def _desde_componentes(valores: pd.Series, cortes: dict) -> np.ndarray:
+    """Arma fechas desde strings de ancho fijo cortando columnas de dígitos."""
+    largo = max(fin for _, fin in cortes.values())
+    digitos = (
+        np.array(valores.tolist(), dtype=f'S{largo}')
+        .view(np.uint8)
+        .reshape(-1, largo)
+        .astype(np.int64) - ord('0')
+    )
+
+    componentes = {}
+    for nombre, (inicio, fin) in cortes.items():
+        pesos = 10 ** np.arange(fin - inicio - 1, -1, -1)
+        componentes[nombre] = digitos[:, inicio:fin] @ pesos
+
+    anio, mes, dia = componentes['year'], componentes['month'], componentes['day']
+    hora = componentes.get('hour', np.zeros_like(anio))
+    minuto = componentes.get('minute', np.zeros_like(anio))
+    segundo = componentes.get('second', np.zeros_like(anio))
+
+    validos = (
+        (mes >= 1) & (mes <= 12) & (dia >= 1) &
+        (hora < 24) & (minuto < 60) & (segundo < 60)
+    )
+    validos[validos] &= dia[validos] <= _dias_en_mes(anio[validos], mes[validos])
+
+    resultado = np.full(len(valores), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if validos.any():
+        resultado[validos] = pd.to_datetime(
+            pd.DataFrame({
+                'year': anio[validos], 'month': mes[validos], 'day': dia[validos],
+                'hour': hora[validos], 'minute': minuto[validos], 'second': segundo[validos],
+            }),
+            errors='coerce',
+        ).to_numpy()
+    return resultado
+
+
+def _parsear_formato(valores: pd.Series, formato: str) -> pd.Series:
+    """pd.to_datetime(valores, format=formato), con camino rápido de ancho fijo."""
+    if formato not in _ANCHO_FIJO:
+        return pd.to_datetime(valores, format=formato, errors='coerce')
+
+    patron, cortes = _ANCHO_FIJO[formato]
+    resultado = pd.Series(pd.NaT, index=valores.index, dtype='datetime64[ns]')
+
+    fijos = valores.str.fullmatch(patron).to_numpy(dtype=bool)
+    if fijos.any():
+        resultado.iloc[fijos] = _desde_componentes(valores[fijos], cortes)
+
+    # Variantes sin ceros a la izquierda ('5/6/2017'): strptime, como antes
+    resto = ~fijos & ~valores.isin(_CADENAS_NAT).to_numpy()
+    if resto.any():
+        resultado.iloc[resto] = pd.to_datetime(valores[resto], format=formato, errors='coerce').to_numpy()
+
+    return resultado
+
+
+def _parsear_sin_formato(valores: pd.Series, dayfirst: bool) -> pd.Series:
+    """
+    Camino de pd.to_datetime cuando no se puede inferir el formato: cada valor
+    se intenta como ISO y si no con dateutil. Los valores ISO válidos y los
+    DD/MM (o MM/DD) de ancho fijo válidos se resuelven vectorizados; dateutil
+    queda solo para el resto.
+    """
+    resultado = pd.to_datetime(valores, format='ISO8601', errors='coerce')
+
+    formatos = _FORMATOS_DIA_PRIMERO if dayfirst else _FORMATOS_MES_PRIMERO
+    for formato in formatos:
+        pendientes = resultado.isna().to_numpy()
+        if not pendientes.any():
+            break
+        patron, cortes = _ANCHO_FIJO[formato]
+        fijos = pendientes & valores.str.fullmatch(patron).to_numpy(dtype=bool)
+        if fijos.any():
+            resultado.iloc[fijos] = _desde_componentes(valores[fijos], cortes)
+
+    # format='mixed': el mismo parseo por valor, sin volver a inferir formato
+    resto = resultado.isna().to_numpy() & ~valores.isin(_CADENAS_NAT).to_numpy()
+    if resto.any():
+        resultado.iloc[resto] = pd.to_datetime(
+            valores[resto], format='mixed', errors='coerce', dayfirst=dayfirst
+        ).to_numpy()
+
+    return resultado
+
+
+def _parsear(valores: pd.Series, dayfirst: bool = False,
+             formatos: FormatosFecha = None, pasada: int = 1) -> pd.Series:
+    """Una pasada de pd.to_datetime(errors='coerce'), con el formato explícito."""
+    if formatos is not None:
+        formato = formatos.resolver(pasada, valores, dayfirst)
+    else:
+        formato = detectar_formato(valores, dayfirst=dayfirst)
+    if formato is None:
+        return _parsear_sin_formato(valores, dayfirst)
+    return _parsear_formato(valores, formato)
+
+
+def _a_fecha_o_nat(texto):
+    try:
+        return pd.to_datetime(texto)
+    except:
+        return pd.NaT
+
+
+def _parsear_dd_mm_yyyy(valores: pd.Series) -> pd.Series:
+    """
+    Parseo estricto de DD/MM/YYYY [hora], vectorizado: mes entre 1 y 12, año
+    entre ANIO_MIN y ANIO_MAX y día válido para el mes. Si no, NaT.
+    """
+    resultado = pd.Series(pd.NaT, index=valores.index, dtype='datetime64[ns]')
+
+    partes = valores.str.extract(_PATRON_DD_MM_YYYY)
+    dia = pd.to_numeric(partes['dia'], errors='coerce')
+    mes = pd.to_numeric(partes['mes'], errors='coerce')
+    anio = pd.to_numeric(partes['anio'], errors='coerce')
+
+    validos = mes.between(1, 12) & anio.between(ANIO_MIN, ANIO_MAX) & (dia >= 1)
+    validos.loc[validos] &= dia[validos] <= _dias_en_mes(anio[validos].astype(int), mes[validos].astype(int))
+    if not validos.any():
+        return resultado
+
+    hora = partes['hora'][validos].fillna('00:00:00')
+    texto = (
+        anio[validos].astype(int).astype(str) + '-' +
+        mes[validos].astype(int).astype(str).str.zfill(2) + '-' +
+        dia[validos].astype(int).astype(str).str.zfill(2) + ' ' + hora
+    )
+
+    # Horas estándar en una sola llamada; el resto (raro) con el parseo escalar
+    estandar = hora.str.fullmatch(_PATRON_HORA).to_numpy(dtype=bool)
+    posiciones = np.flatnonzero(validos.to_numpy())
+    resultado.iloc[posiciones[estandar]] = pd.to_datetime(
+        texto[estandar], format='ISO8601', errors='coerce'
+    ).to_numpy()
+    if (~estandar).any():
+        resultado.iloc[posiciones[~estandar]] = texto[~estandar].map(_a_fecha_o_nat).to_numpy()
+
+    return resultado
+
+
+@medido()
+def corregir_fecha_invalida(serie, formatos: FormatosFecha = None):
+    """
+    Parsea fechas en múltiples formatos.
+    Si la fecha es inválida (mes > 12 o componentes fuera de rango), devuelve NaT
+    (se cuenta como regla fecha_invalida de la columna).
+    `formatos` fija el formato de cada pasada entre chunks de una misma columna.
+    """
+    # Columnas string (Arrow): los nulos como NaN, así astype(str) da 'nan' igual que en object
+    if serie.dtype != object:
+        serie = pd.Series(serie.to_numpy(dtype=object, na_value=np.nan), index=serie.index, name=serie.name)
+
+    # 0. Limpiar la serie antes de parsear
+    serie_limpia = serie.astype(str).str.strip()
+    presentes = serie.notna().to_numpy()
+
+    # 1. Primer intento: formato estándar detectado (ISO y formatos estándar)
+    resultado = _parsear(serie_limpia, formatos=formatos, pasada=1)
+
+    # 2. Segundo intento: para los que fallaron, con dayfirst=True (formato brasileño DD/MM/YYYY)
+    mask_fallidos = resultado.isna().to_numpy() & presentes
+    if mask_fallidos.any():
+        resultado.iloc[mask_fallidos] = _parsear(
+            serie_limpia[mask_fallidos], dayfirst=True, formatos=formatos, pasada=2
+        ).to_numpy()
+
+    # 3. Los que TODAVÍA fallan y tienen '/': DD/MM/YYYY estricto
+    mask_procesar = (
+        resultado.isna().to_numpy() & presentes &
+        serie_limpia.str.contains('/', regex=False).to_numpy(dtype=bool)
+    )
+    if mask_procesar.any():
+        resultado.iloc[mask_procesar] = _parsear_dd_mm_yyyy(serie_limpia[mask_procesar]).to_numpy()
+
+    contar_regla(serie.name, "fecha_invalida", "anula", np.count_nonzero(presentes & resultado.isna().to_numpy()))
+    return resultado
@@ -0,0 +1,272 @@
+import hashlib
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from carga import cargar_tabla, conexion
+from duplicados import CiudadesCanonicas
+
+
+# -----------------------
+# Centroides por prefijo y por estado
+# -----------------------
+# Mismas columnas que analytics.dim_zip_codes (sql/analytics_model.sql)
+COLUMNAS_PREFIJOS = ["zip_code_prefix", "avg_lat", "avg_lng", "city", "state", "total_locations"]
+COLUMNAS_ESTADOS = ["state", "avg_lat", "avg_lng", "zip_code_prefixes", "total_locations"]
+
+GEO_SQL = Path(__file__).resolve().parent.parent / "sql" / "geo_index.sql"
+
+
+def _moda_por_prefijo(geo: pd.DataFrame, col: str) -> pd.Series:
+    """
+    MODE() WITHIN GROUP (ORDER BY col) por prefijo: el valor más frecuente
+    y, en empate, el menor. Los nulos no cuentan.
+    """
+    conteos = geo.groupby(["geolocation_zip_code_prefix", col], observed=True).size().reset_index(name="conteo")
+    conteos[col] = conteos[col].astype(object)
+    conteos = conteos.sort_values(["conteo", col], ascending=[False, True], kind="mergesort")
+    return conteos.drop_duplicates("geolocation_zip_code_prefix").set_index("geolocation_zip_code_prefix")[col]
+
+
+def centroides_por_prefijo(geo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Centroide, ciudad y estado modales y cantidad de puntos de cada prefijo de
+    geolocation limpia: lo mismo que calcula analytics.dim_zip_codes.
+    """
+    grupos = geo.groupby("geolocation_zip_code_prefix")
+    centroides = pd.DataFrame({
+        "avg_lat": grupos["geolocation_lat"].mean().round(6),
+        "avg_lng": grupos["geolocation_lng"].mean().round(6),
+        "total_locations": grupos.size(),
+    })
+    centroides["city"] = _moda_por_prefijo(geo, "geolocation_city")
+    centroides["state"] = _moda_por_prefijo(geo, "geolocation_state")
+    centroides.index = centroides.index.astype("int64")
+    return centroides.rename_axis("zip_code_prefix").reset_index()[COLUMNAS_PREFIJOS]
+
+
+def _promedio_ponderado(centroides: pd.DataFrame, claves) -> pd.DataFrame:
+    """Centro de cada grupo de prefijos, ponderado por la cantidad de puntos de cada uno."""
+    pesos = centroides["total_locations"]
+    ponderados = centroides.assign(
+        avg_lat=centroides["avg_lat"] * pesos,
+        avg_lng=centroides["avg_lng"] * pesos,
+    )
+    grupos = ponderados.groupby(claves, sort=True)
+    totales = grupos["total_locations"].sum()
+    return pd.DataFrame({
+        "avg_lat": grupos["avg_lat"].sum() / totales,
+        "avg_lng": grupos["avg_lng"].sum() / totales,
+        "zip_code_prefixes": grupos.size(),
+        "total_locations": totales,
+    })
+
+
+def centroides_por_estado(centroides: pd.DataFrame) -> pd.DataFrame:
+    """Centro de cada estado (promedio de todos sus puntos de geolocation), para el mapa."""
+    estados = _promedio_ponderado(centroides, "state")
+    estados[["avg_lat", "avg_lng"]] = estados[["avg_lat", "avg_lng"]].round(6)
+    return estados.rename_axis("state").reset_index()[COLUMNAS_ESTADOS]
+
+
+# -----------------------
+# Índice de grilla
+# -----------------------
+# Proyección equirectangular centrada en Brasil: con la longitud escalada por
+# cos(-15°), la distancia euclídea en grados es casi la real en todo el país
+_ESCALA_LNG = np.cos(np.radians(-15.0))
+
+# Lado de cada celda de la grilla, en grados de latitud (~55 km)
+CELDA_GRADOS = 0.5
+
+
+def _proyectar(lat, lng):
+    return np.asarray(lng, dtype="float64") * _ESCALA_LNG, np.asarray(lat, dtype="float64")
+
+
+class IndiceGeo:
+    """
+    Centroides de los prefijos de zip code (de geolocation limpia) en una
+    grilla de celdas de CELDA_GRADOS, para buscar el prefijo más cercano a
+    un punto recorriendo solo las celdas vecinas, de adentro hacia afuera.
+
+    Con los centroides de cada ciudad (promedio de sus prefijos) permite
+    imputar el zip code de un cliente o vendedor cuya ciudad no tiene moda
+    en su propia tabla: el prefijo más cercano al centro de la ciudad.
+
+    Con `ciudades` (CiudadesCanonicas de geolocation) lleva además el nombre
+    canónico de cada ciudad, para unificar las escrituras de otras tablas.
+
+    Es chico (un array por columna de los centroides) y se serializa con
+    pickle, así viaja a los workers de las etapas que lo usan.
+    """
+
+    def __init__(self, centroides: pd.DataFrame, celda: float = CELDA_GRADOS,
+                 ciudades: CiudadesCanonicas = None):
+        self.centroides = centroides.reset_index(drop=True)
+        self.celda = celda
+        self.ciudades = ciudades
+        self._x, self._y = _proyectar(self.centroides["avg_lat"], self.centroides["avg_lng"])
+
+        # Celdas (ix, iy) desde la esquina de la grilla, y puntos ordenados por celda
+        ix, iy = self._celdas(self._x, self._y)
+        self._origen = (ix.min(), iy.min()) if len(ix) else (0, 0)
+        ix, iy = ix - self._origen[0], iy - self._origen[1]
+        self._ancho = int(ix.max()) + 1 if len(ix) else 0
+        self._alto = int(iy.max()) + 1 if len(iy) else 0
+        claves = ix * self._alto + iy
+        self._orden = np.argsort(claves, kind="stable")
+        self._claves = claves[self._orden]
+
+        # Centro de cada ciudad, por (ciudad en minúsculas, estado), y el
+        # prefijo más cercano a cada uno a medida que se consulta
+        ciudades = self.centroides.assign(ciudad=self.centroides["city"].str.lower())
+        centros = _promedio_ponderado(ciudades.dropna(subset=["ciudad", "state"]), ["ciudad", "state"])
+        self._ciudades = dict(zip(centros.index, zip(centros["avg_lat"], centros["avg_lng"])))
+        self._prefijo_de_ciudad = {}
+
+    @classmethod
+    def desde_geolocation(cls, geo: pd.DataFrame, ciudades: CiudadesCanonicas = None) -> "IndiceGeo":
+        """
+        Índice sobre los centroides de geolocation limpia. Con `ciudades`, la
+        ciudad modal de cada prefijo se cuenta con los nombres canónicos.
+        """
+        if ciudades is not None:
+            geo = geo.assign(geolocation_city=ciudades.canonizar(geo["geolocation_city"], geo["geolocation_state"]))
+        return cls(centroides_por_prefijo(geo), ciudades=ciudades)
+
+    def __len__(self):
+        return len(self.centroides)
+
+    def __repr__(self):
+        return f"IndiceGeo({len(self)} zip prefixes)"
+
+    def huella(self) -> str:
+        """sha256 de los centroides y las ciudades canónicas (lo que usan la imputación y la canonización)."""
+        huella = hashlib.sha256(pd.util.hash_pandas_object(self.centroides, index=False).to_numpy().tobytes())
+        if self.ciudades is not None:
+            huella.update(self.ciudades.huella().encode())
+        return huella.hexdigest()
+
+    def canonizar_ciudades(self, ciudades: pd.Series, estados: pd.Series) -> pd.Series:
+        """Las ciudades con el nombre canónico de geolocation (sin ciudades canónicas, igual)."""
+        if self.ciudades is None:
+            return ciudades
+        return self.ciudades.canonizar(ciudades, estados, regla="ciudad_no_canonica")
+
+    def _celdas(self, x, y):
+        return np.floor(x / self.celda).astype("int64"), np.floor(y / self.celda).astype("int64")
+
+    def _en_anillo(self, cx: int, cy: int, radio: int) -> np.ndarray:
+        """Posiciones de los centroides en las celdas a distancia (Chebyshev) `radio` de (cx, cy)."""
+        if radio == 0:
+            xs, ys = np.array([cx]), np.array([cy])
+        else:
+            lado = np.arange(-radio, radio + 1)
+            interior = lado[1:-1]
+            xs = np.concatenate([cx + lado, cx + lado, np.full(len(interior), cx - radio), np.full(len(interior), cx + radio)])
+            ys = np.concatenate([np.full(len(lado), cy - radio), np.full(len(lado), cy + radio), cy + interior, cy + interior])
+        dentro = (xs >= 0) & (xs < self._ancho) & (ys >= 0) & (ys < self._alto)
+        claves = xs[dentro] * self._alto + ys[dentro]
+        desde = np.searchsorted(self._claves, claves, side="left")
+        hasta = np.searchsorted(self._claves, claves, side="right")
+        return np.concatenate([self._orden[d:h] for d, h in zip(desde, hasta)] or [np.empty(0, dtype="int64")])
+
+    def _mas_cercano(self, x: float, y: float) -> int:
+        ix, iy = self._celdas(np.array([x]), np.array([y]))
+        cx, cy = int(ix[0]) - self._origen[0], int(iy[0]) - self._origen[1]
+        mejor, mejor_distancia = -1, np.inf
+        # Un punto fuera de la grilla empieza por el primer anillo que la toca
+        radio = max(0, -cx, -cy, cx - self._ancho + 1, cy - self._alto + 1)
+        while True:
+            candidatos = self._en_anillo(cx, cy, radio)
+            if len(candidatos):
+                distancias = (self._x[candidatos] - x) ** 2 + (self._y[candidatos] - y) ** 2
+                i = np.argmin(distancias)
+                if distancias[i] < mejor_distancia:
+                    mejor, mejor_distancia = int(candidatos[i]), distancias[i]
+            # Lo que queda fuera de los anillos recorridos está a más de radio * celda
+            if mejor >= 0 and mejor_distancia <= (radio * self.celda) ** 2:
+                return mejor
+            # El anillo ya no toca la grilla: no quedan centroides por ver
+            if cx - radio < 0 and cy - radio < 0 and cx + radio >= self._ancho and cy + radio >= self._alto:
+                return mejor
+            radio += 1
+
+    def mas_cercanos(self, lat, lng) -> np.ndarray:
+        """
+        Posición en `centroides` del prefijo más cercano a cada punto (-1 si
+        el punto no tiene coordenadas o el índice está vacío).
+        """
+        x, y = _proyectar(lat, lng)
+        posiciones = np.full(len(x), -1, dtype="int64")
+        if len(self):
+            for k in np.flatnonzero(np.isfinite(x) & np.isfinite(y)):
+                posiciones[k] = self._mas_cercano(x[k], y[k])
+        return posiciones
+
+    def prefijo_de_ciudad(self, ciudades, estados) -> np.ndarray:
+        """
+        Prefijo más cercano al centro de cada (ciudad, estado) según
+        geolocation (NaN si la ciudad no aparece). La ciudad se compara sin
+        distinguir mayúsculas y se busca una sola vez por ciudad.
+        """
+        claves = [
+            (ciudad.lower() if isinstance(ciudad, str) else ciudad, estado)
+            for ciudad, estado in zip(ciudades, estados)
+        ]
+        prefijos = self.centroides["zip_code_prefix"].to_numpy()
+        for clave in set(claves).difference(self._prefijo_de_ciudad):
+            centro = self._ciudades.get(clave)
+            posicion = self.mas_cercanos([centro[0]], [centro[1]])[0] if centro is not None else -1
+            self._prefijo_de_ciudad[clave] = prefijos[posicion] if posicion >= 0 else np.nan
+        return np.array([self._prefijo_de_ciudad[clave] for clave in claves], dtype="float64")
+
+
+# -----------------------
+# Capa clean y Postgres
+# -----------------------
+def guardar_centroides(prefijos: pd.DataFrame, estados: pd.DataFrame, directorio: Path,
+                       formato: str = "csv") -> list:
+    destinos = []
+    for nombre, tabla in (("zip_centroids", prefijos), ("state_centroids", estados)):
+        if formato == "parquet":
+            destino = directorio / f"{nombre}.parquet"
+            tabla.to_parquet(destino, engine="pyarrow", index=False)
+        else:
+            destino = directorio / f"{nombre}.csv"
+            tabla.to_csv(destino, index=False)
+        destinos.append(destino)
+    return destinos
+
+
+def cargar_centroides(prefijos: pd.DataFrame, estados: pd.DataFrame):
+    """
+    Reemplaza analytics.zip_centroids y analytics.state_centroids (las crea
+    desde sql/geo_index.sql si no existen).
+    """
+    con = conexion()
+    with con.cursor() as cur:
+        cur.execute("SELECT to_regclass('analytics.zip_centroids'), to_regclass('analytics.state_centroids')")
+        if None in cur.fetchone():
+            cur.execute(GEO_SQL.read_text(encoding="utf-8"))
+        cur.execute("TRUNCATE TABLE analytics.zip_centroids, analytics.state_centroids")
+    # TRUNCATE y COPY en la misma transacción: si la carga falla quedan las anteriores
+    cargar_tabla(prefijos, "zip_centroids", tabla="analytics.zip_centroids", confirmar=False)
+    cargar_tabla(estados, "state_centroids", tabla="analytics.state_centroids", confirmar=False)
+    con.commit()
+
+
+def generar_centroides(indice: IndiceGeo, directorio: Path, formato: str = "csv",
+                       cargar: bool = False) -> pd.DataFrame:
+    """Guarda (y con `cargar` carga) los centroides del índice; devuelve los de cada estado."""
+    inicio = time.perf_counter()
+    estados = centroides_por_estado(indice.centroides)
+    guardar_centroides(indice.centroides, estados, directorio, formato)
+    print(f"  Geo index built: {len(indice)} zip prefixes, {len(estados)} states "
+          f"in {time.perf_counter() - inicio:.2f}s")
+    if cargar:
+        cargar_centroides(indice.centroides, estados)
+    return estados
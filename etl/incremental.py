@@ -0,0 +1,250 @@
+import hashlib
+import io
+import json
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+from claves import IndiceClaves
+from streaming import EstadoChunks
+from instrumentacion import sin_conteos
+
+
+# Tamaño de los bloques del manifiesto: un cambio en el medio del archivo se
+# detecta comparando bloques, sin guardar copia del crudo anterior
+BYTES_POR_BLOQUE = 8 * 1024 * 1024
+
+
+# -----------------------
+# Manifiesto de archivos crudos
+# -----------------------
+def _hash_rango(f, inicio: int, fin: int) -> str:
+    f.seek(inicio)
+    return hashlib.sha256(f.read(fin - inicio)).hexdigest()
+
+
+def hashes_bloques(path: Path, tamanio: int = None) -> list:
+    """sha256 de cada bloque de BYTES_POR_BLOQUE bytes (los primeros `tamanio` bytes)."""
+    tamanio = path.stat().st_size if tamanio is None else tamanio
+    with open(path, 'rb') as f:
+        return [
+            _hash_rango(f, inicio, min(inicio + BYTES_POR_BLOQUE, tamanio))
+            for inicio in range(0, tamanio, BYTES_POR_BLOQUE)
+        ]
+
+
+def detectar_cambios(path: Path, manifiesto: dict):
+    """
+    Compara el crudo con el manifiesto de la corrida anterior.
+
+    Devuelve (modo, byte desde el que hay filas nuevas, tamaño, bloques actuales):
+    - 'sin_cambios': mismo contenido;
+    - 'delta': el contenido anterior está intacto y solo se agregaron filas al final;
+    - 'completo': no hay manifiesto o cambió algo ya procesado.
+    """
+    tamanio = path.stat().st_size
+    bloques = hashes_bloques(path, tamanio)
+
+    if manifiesto is None or tamanio < manifiesto['bytes']:
+        return 'completo', 0, tamanio, bloques
+
+    previo = manifiesto['bytes']
+    anteriores = manifiesto['bloques']
+    enteros = previo // BYTES_POR_BLOQUE
+
+    intacto = bloques[:enteros] == anteriores[:enteros]
+    if intacto and previo % BYTES_POR_BLOQUE:
+        # El último bloque anterior estaba incompleto: comparar solo su parte vieja
+        with open(path, 'rb') as f:
+            intacto = _hash_rango(f, enteros * BYTES_POR_BLOQUE, previo) == anteriores[enteros]
+
+    if not intacto:
+        return 'completo', 0, tamanio, bloques
+    if tamanio == previo:
+        return 'sin_cambios', previo, tamanio, bloques
+    return 'delta', previo, tamanio, bloques
+
+
+def leer_desde(path: Path, desde: int, dtype=None) -> pd.DataFrame:
+    """Lee las filas del CSV que empiezan en el byte `desde` (con el header del archivo)."""
+    if desde == 0:
+        return pd.read_csv(path, dtype=dtype)
+
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(desde)
+        nuevas = f.read()
+    return pd.read_csv(io.BytesIO(header + nuevas), dtype=dtype)
+
+
+# -----------------------
+# Estado entre corridas
+# -----------------------
+class EstadoIncremental:
+    """
+    Archivos de estado de una tabla: el manifiesto (JSON) y el estado de
+    limpieza (claves vistas, formatos de fecha, conteos de zips e IDs válidos).
+    """
+
+    def __init__(self, directorio: Path, nombre: str):
+        self.manifiesto_path = directorio / f"{nombre}.json"
+        self.estado_path = directorio / f"{nombre}.pkl"
+
+    def manifiesto(self):
+        if not self.manifiesto_path.exists():
+            return None
+        return json.loads(self.manifiesto_path.read_text())
+
+    def cargar(self):
+        with open(self.estado_path, 'rb') as f:
+            return pickle.load(f)
+
+    def guardar(self, manifiesto: dict, datos: dict):
+        self.manifiesto_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.estado_path, 'wb') as f:
+            pickle.dump(datos, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.manifiesto_path.write_text(json.dumps(manifiesto, indent=2))
+
+
+def perdio_claves_en(directorio: Path, nombre: str, corrida: str) -> bool:
+    """
+    True si la tabla se limpió completa en la corrida indicada y sus IDs
+    válidos ya no incluyen todos los de la corrida anterior (o no se sabe).
+    """
+    manifiesto = EstadoIncremental(directorio, nombre).manifiesto()
+    return (
+        manifiesto is not None and manifiesto['corrida'] == corrida
+        and manifiesto.get('claves_perdidas', manifiesto['modo'] == 'completo')
+    )
+
+
+def _hay_que_reconstruir(datos: dict, ids_padres: dict, huella: str) -> bool:
+    """
+    Si las filas ya limpias pueden haber cambiado aunque su crudo no: cambió
+    lo global que usa la limpieza (`huella`) o llegaron claves del padre para
+    FKs que una corrida anterior rechazó.
+    """
+    if datos.get('huella') != huella:
+        return True
+    huerfanas = datos['estado'].get('huerfanas') or {}
+    return any(
+        col in ids_padres and IndiceClaves(ids_padres[col]).comparte(valores)
+        for col, valores in huerfanas.items()
+    )
+
+
+def _mismas_modas(previas: dict, actuales: dict) -> bool:
+    return previas.keys() == actuales.keys() and all(
+        previas[claves].sort_index().equals(actuales[claves].sort_index()) for claves in previas
+    )
+
+
+# -----------------------
+# Limpieza incremental
+# -----------------------
+def _datos_vacios() -> dict:
+    return {'estado': EstadoChunks().exportar(), 'ids': IndiceClaves()}
+
+
+def _acumular_modas(func, df, args, datos, modas_zip):
+    """Primera pasada: suma los conteos de zips de `df` y cierra `modas_zip`."""
+    with sin_conteos():
+        func(df, *args, estado=EstadoChunks.desde(datos['estado'], modas_zip))
+    modas_zip.cerrar()
+
+
+def limpiar_incremental(path: Path, func, destino: Path, destino_delta: Path,
+                        directorio_estado: Path, nombre: str, corrida: str, args=(),
+                        id_col: str = None, modas_zip=None, con_estado: bool = True,
+                        forzar_completo: bool = False, ids_padres: dict = None, huella: str = None,
+                        dtype=None, **to_csv_kwargs):
+    """
+    Limpia solo las filas agregadas al crudo desde la corrida anterior.
+
+    Las filas nuevas se limpian con el estado guardado (claves ya vistas,
+    formatos de fecha fijados y conteos de zips), se agregan a `destino` y se
+    escriben solas en `destino_delta`. Se limpia el archivo entero (y el
+    delta contiene la tabla completa) si cambió algo ya procesado, si
+    `forzar_completo` (una tabla de la que depende perdió IDs), si cambió
+    `huella` (lo global que usa la limpieza, p. ej. el índice geo), si
+    `ids_padres` ({columna FK: IDs del padre}) trae claves que una corrida
+    anterior rechazó por huérfanas, o si las filas nuevas cambian alguna
+    moda de zip con la que ya se imputó.
+
+    Las tablas sin parámetro `estado` (con_estado=False) se limpian completas
+    ante cualquier cambio.
+
+    Devuelve (modo, filas leídas, filas escritas, IDs válidos acumulados como IndiceClaves).
+    """
+    archivos = EstadoIncremental(directorio_estado, nombre)
+    anterior = archivos.manifiesto()
+    modo, desde, tamanio, bloques = detectar_cambios(path, anterior)
+
+    if forzar_completo or not destino.exists() or (modo == 'delta' and not con_estado):
+        modo, desde = 'completo', 0
+
+    datos = archivos.cargar() if anterior is not None and archivos.estado_path.exists() else None
+    ids_previos = datos['ids'] if datos is not None else None
+    if modo != 'completo' and (datos is None or _hay_que_reconstruir(datos, ids_padres or {}, huella)):
+        modo, desde = 'completo', 0
+
+    if modo == 'sin_cambios':
+        # Delta vacío con el header de la tabla limpia
+        pd.read_csv(destino, nrows=0).to_csv(destino_delta, index=False)
+        filas_leidas = filas_escritas = 0
+    else:
+        if modo == 'completo':
+            datos = _datos_vacios()
+        df = leer_desde(path, desde, dtype=dtype)
+
+        if not con_estado:
+            limpio = func(df, *args)
+        else:
+            if modas_zip is not None:
+                # Primera pasada: sumar los conteos de zips de las filas nuevas
+                modas_zip.importar(datos['estado']['modas_zip'])
+                previas = modas_zip.todas()
+                _acumular_modas(func, df, args, datos, modas_zip)
+                if modo == 'delta' and not _mismas_modas(previas, modas_zip.todas()):
+                    # Las filas ya limpias se imputaron con otras modas: limpiar todo de nuevo
+                    print(f"  {nombre}: new rows change zip code modes, cleaning the whole table")
+                    modo, datos = 'completo', _datos_vacios()
+                    df = leer_desde(path, 0, dtype=dtype)
+                    modas_zip.reiniciar()
+                    _acumular_modas(func, df, args, datos, modas_zip)
+
+            estado = EstadoChunks.desde(datos['estado'], modas_zip)
+            limpio = func(df, *args, estado=estado)
+            datos['estado'] = estado.exportar()
+
+        filas_leidas, filas_escritas = len(df), len(limpio)
+
+        limpio.to_csv(destino, mode='w' if modo == 'completo' else 'a',
+                      header=(modo == 'completo'), index=False, **to_csv_kwargs)
+        limpio.to_csv(destino_delta, index=False, **to_csv_kwargs)
+
+        if id_col is not None:
+            datos['ids'] = IndiceClaves(datos['ids']).unir(limpio[id_col])
+
+    datos['huella'] = huella
+    claves_perdidas = modo == 'completo' and id_col is not None and (
+        ids_previos is None or not IndiceClaves(datos['ids']).incluye(IndiceClaves(ids_previos))
+    )
+
+    previas = anterior if modo != 'completo' else {}
+    archivos.guardar(
+        {
+            'archivo': path.name,
+            'bytes': tamanio,
+            'bloques': bloques,
+            'filas': previas.get('filas', 0) + filas_leidas,
+            'filas_limpias': previas.get('filas_limpias', 0) + filas_escritas,
+            'modo': modo,
+            'claves_perdidas': claves_perdidas,
+            'corrida': corrida,
+        },
+        datos,
+    )
+
+    return modo, filas_leidas, filas_escritas, datos['ids'] if id_col is not None else None
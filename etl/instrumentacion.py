@@ -0,0 +1,302 @@
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: sin medición de memoria
+    resource = None
+
+
+# -----------------------
+# Mediciones
+# -----------------------
+def rss_pico_kb():
+    """Pico de memoria residente del proceso en KB (None si no se puede medir)."""
+    # Linux: VmHWM es del proceso actual; ru_maxrss arrastra el pico del padre
+    # a través de exec (un subprocess lanzado por un proceso grande lo hereda)
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB y macOS bytes
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+
+def _filas(obj):
+    """Filas de un DataFrame/Series (None para cualquier otra cosa)."""
+    return len(obj) if hasattr(obj, "shape") else None
+
+
+# Acumulado del proceso: (etapa, paso) -> totales, etapa -> totales,
+# (etapa, nombre) -> conteo (p. ej. filas huérfanas por FK) y
+# (etapa, columna, regla, acción) -> filas afectadas por cada regla de limpieza.
+# Se puede medir desde varios hilos (E/S solapada): la etapa actual es de cada hilo
+_PASOS = {}
+_ETAPAS = {}
+_CONTEOS = {}
+_REGLAS = {}
+_CANDADO = threading.Lock()
+_HILO = threading.local()
+
+
+def etapa_actual() -> str:
+    return getattr(_HILO, "etapa", "pipeline")
+
+
+def _fijar_etapa(nombre: str):
+    _HILO.etapa = nombre
+
+
+@contextlib.contextmanager
+def en_etapa(nombre: str):
+    """Asigna a la etapa `nombre` los pasos que corren adentro, sin medir la etapa (p. ej. en otro hilo)."""
+    anterior = etapa_actual()
+    _fijar_etapa(nombre)
+    try:
+        yield
+    finally:
+        _fijar_etapa(anterior)
+
+
+def _acumular(destino: dict, clave, wall, cpu, rss, entrada, salida):
+    with _CANDADO:
+        registro = destino.setdefault(clave, {
+            "llamadas": 0, "wall_s": 0.0, "cpu_s": 0.0, "rss_pico_delta_kb": None,
+            "filas_entrada": None, "filas_salida": None,
+        })
+        registro["llamadas"] += 1
+        registro["wall_s"] += wall
+        registro["cpu_s"] += cpu
+        # Lo que no se pudo medir (o no son filas) queda en None
+        for campo, valor in (("rss_pico_delta_kb", rss), ("filas_entrada", entrada), ("filas_salida", salida)):
+            if valor is not None:
+                registro[campo] = (registro[campo] or 0) + valor
+
+
+class Paso:
+    """
+    Mide un bloque: tiempo de reloj, tiempo de CPU, cuánto subió el pico de
+    RSS y filas de entrada/salida. Se acumula por (etapa actual del hilo, nombre).
+
+        with Paso("filtro", df) as paso:
+            df = df[mask]
+            paso.filas_salida = len(df)
+    """
+
+    def __init__(self, nombre: str, filas_entrada: int = None):
+        self.nombre = nombre
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+
+    def __enter__(self):
+        self._rss = rss_pico_kb()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        rss = rss_pico_kb() - self._rss if self._rss is not None else None
+        _acumular(_PASOS, (etapa_actual(), self.nombre), wall, cpu, rss,
+                  self.filas_entrada, self.filas_salida)
+        return False
+
+
+def contar(nombre: str, cantidad: int):
+    """Suma `cantidad` al conteo `nombre` de la etapa actual (sale en el reporte)."""
+    clave = (etapa_actual(), nombre)
+    with _CANDADO:
+        _CONTEOS[clave] = _CONTEOS.get(clave, 0) + int(cantidad)
+
+
+def contar_regla(columna: str, regla: str, accion: str, filas):
+    """
+    Suma las filas en las que la regla `regla` de la etapa actual actuó sobre
+    `columna` ("*" para la fila entera); `accion` es lo que hizo: "descarta"
+    (la fila), "anula", "corrige" o "imputa" (el valor). Recibe la suma de
+    una máscara que la limpieza ya calculó: no se vuelve a recorrer la tabla.
+    """
+    clave = (etapa_actual(), columna, regla, accion)
+    with _CANDADO:
+        _REGLAS[clave] = _REGLAS.get(clave, 0) + int(filas)
+
+
+@contextlib.contextmanager
+def sin_conteos():
+    """
+    Descarta los conteos y las reglas de lo que corre adentro: una pasada
+    que solo acumula estado (p. ej. las modas de zips) no limpia filas.
+    """
+    with _CANDADO:
+        conteos, reglas = dict(_CONTEOS), dict(_REGLAS)
+    try:
+        yield
+    finally:
+        with _CANDADO:
+            _CONTEOS.clear()
+            _CONTEOS.update(conteos)
+            _REGLAS.clear()
+            _REGLAS.update(reglas)
+
+
+def reglas_aplicadas() -> dict:
+    """(etapa, columna, regla, acción) -> filas afectadas, acumulado en este proceso."""
+    with _CANDADO:
+        return dict(_REGLAS)
+
+
+def pasos_de_etapa(etapa: str) -> dict:
+    """Paso -> totales de los pasos medidos en la etapa, en el orden en que se midieron por primera vez."""
+    with _CANDADO:
+        return {paso: dict(registro) for (nombre, paso), registro in _PASOS.items() if nombre == etapa}
+
+
+def filas_de_etapas() -> dict:
+    """Filas de entrada de cada etapa medida."""
+    return {nombre: totales["filas_entrada"] for nombre, totales in _ETAPAS.items()}
+
+
+def medido(nombre: str = None, arg: int = 0):
+    """
+    Decorador que mide cada llamada como un Paso. Las filas de entrada son
+    las del argumento posicional `arg` (1 en métodos) y las de salida, las
+    del resultado, si son DataFrames o Series.
+    """
+    def decorador(func):
+        paso_nombre = nombre or func.__name__
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            entrada = _filas(args[arg]) if len(args) > arg else None
+            with Paso(paso_nombre, entrada) as paso:
+                resultado = func(*args, **kwargs)
+                paso.filas_salida = _filas(resultado)
+            return resultado
+
+        return envoltura
+
+    return decorador
+
+
+@contextlib.contextmanager
+def medir_etapa(nombre: str, perfil: Path = None):
+    """
+    Mide una etapa completa y asigna a ella los pasos que corren adentro.
+    Devuelve un Paso para informar las filas de entrada/salida de la etapa.
+    Con `perfil` (directorio) guarda además un cProfile de la etapa en
+    {perfil}/{nombre}.prof, para abrir con pstats o snakeviz.
+    """
+    anterior = etapa_actual()
+    _fijar_etapa(nombre)
+
+    medicion = Paso(nombre)
+    perfilador = cProfile.Profile() if perfil is not None else None
+    rss = rss_pico_kb()
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    if perfilador is not None:
+        perfilador.enable()
+    try:
+        yield medicion
+    finally:
+        if perfilador is not None:
+            perfilador.disable()
+            Path(perfil).mkdir(parents=True, exist_ok=True)
+            perfilador.dump_stats(Path(perfil) / f"{nombre}.prof")
+
+        _acumular(_ETAPAS, nombre, time.perf_counter() - wall, time.process_time() - cpu,
+                  rss_pico_kb() - rss if rss is not None else None,
+                  medicion.filas_entrada, medicion.filas_salida)
+        _ETAPAS[nombre]["pid"] = os.getpid()
+        _fijar_etapa(anterior)
+
+
+def medir_lectura(nombre: str, iterable):
+    """Itera midiendo cada lectura como un Paso (p. ej. los chunks de read_csv)."""
+    iterador = iter(iterable)
+    while True:
+        with Paso(nombre) as paso:
+            item = next(iterador, None)
+            paso.filas_salida = _filas(item)
+        if item is None:
+            return
+        yield item
+
+
+# -----------------------
+# Entre procesos
+# -----------------------
+def reiniciar(etapa: str = None):
+    """Descarta lo acumulado (p. ej. lo heredado por un worker creado con fork)."""
+    _PASOS.clear()
+    _ETAPAS.clear()
+    _CONTEOS.clear()
+    _REGLAS.clear()
+    if etapa is not None:
+        _fijar_etapa(etapa)
+
+
+def extraer() -> dict:
+    """Lo acumulado en este proceso, para devolverlo desde un worker."""
+    datos = {"pasos": dict(_PASOS), "etapas": dict(_ETAPAS), "conteos": dict(_CONTEOS), "reglas": dict(_REGLAS)}
+    _PASOS.clear()
+    _ETAPAS.clear()
+    _CONTEOS.clear()
+    _REGLAS.clear()
+    return datos
+
+
+def incorporar(datos: dict):
+    """Suma lo medido en un worker a lo acumulado en este proceso."""
+    for destino, origen in ((_PASOS, datos.get("pasos", {})), (_ETAPAS, datos.get("etapas", {}))):
+        for clave, registro in origen.items():
+            previo = destino.get(clave)
+            if previo is None:
+                destino[clave] = dict(registro)
+                continue
+            for campo, valor in registro.items():
+                if campo != "pid" and valor is not None:
+                    previo[campo] = (previo[campo] or 0) + valor
+    for clave, cantidad in datos.get("conteos", {}).items():
+        _CONTEOS[clave] = _CONTEOS.get(clave, 0) + cantidad
+    for clave, filas in datos.get("reglas", {}).items():
+        _REGLAS[clave] = _REGLAS.get(clave, 0) + filas
+
+
+# -----------------------
+# Reporte de la corrida
+# -----------------------
+def reporte(**metadatos) -> dict:
+    """Reporte de la corrida: metadatos, totales, conteos y pasos de cada etapa (los más lentos primero)."""
+    etapas = []
+    for nombre, totales in _ETAPAS.items():
+        pasos = [
+            {"paso": paso, **registro}
+            for (etapa, paso), registro in _PASOS.items() if etapa == nombre
+        ]
+        pasos.sort(key=lambda p: p["wall_s"], reverse=True)
+        conteos = {conteo: n for (etapa, conteo), n in _CONTEOS.items() if etapa == nombre}
+        etapas.append({"etapa": nombre, **totales, "conteos": conteos, "pasos": pasos})
+
+    return {**metadatos, "rss_pico_kb": rss_pico_kb(), "etapas": etapas}
+
+
+def guardar_reporte(destino: Path, **metadatos) -> Path:
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(json.dumps(reporte(**metadatos), indent=2, default=str))
+    return destino
@@ -0,0 +1,220 @@
+import math
+from pathlib import Path
+
+import pandas as pd
+
+from instrumentacion import medido
+from normalizacion import normalizar_serie
+from particiones import COLUMNA_FILA, ParteEnDisco
+
+
+# -----------------------
+# Motores fuera de memoria
+# -----------------------
+# Un motor lee el CSV crudo en streaming y con varios hilos, y lo escribe en
+# partes por hash de la clave de deduplicación sin juntar la tabla en memoria.
+# Cada parte se limpia después con los mismos clean_* de pandas
+# (particiones.limpiar_partes), así el resultado es el mismo que sin motor.
+
+# Tamaño aproximado de CSV crudo por parte: lo que un worker tiene en memoria por vez
+BYTES_POR_PARTE = 256 * 1024 * 1024
+
+# Columna auxiliar con la parte de cada fila
+COLUMNA_PARTE = "__parte"
+
+# Tokens que read_csv lee como nulos (na_values por defecto de pandas)
+NULOS_READ_CSV = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Texto que read_csv infiere como entero
+ENTERO = r"^\s*[+-]?[0-9]+\s*$"
+
+
+def _importar(modulo: str):
+    try:
+        return __import__(modulo)
+    except ImportError as e:
+        raise ImportError(f"--engine {modulo} requires {modulo} (pip install {modulo})") from e
+
+
+def cantidad_de_partes(path: Path, particiones: int = 1) -> int:
+    """Al menos `particiones`, y las necesarias para que ninguna pase de BYTES_POR_PARTE."""
+    return max(particiones, math.ceil(Path(path).stat().st_size / BYTES_POR_PARTE))
+
+
+def _tipo_read_csv(filas: int, no_nulas: int, enteras: int, reales: int):
+    """dtype que read_csv infiere para una columna sin dtype explícito, según sus conteos."""
+    if filas == 0:
+        return object
+    if no_nulas == 0:
+        return "float64"
+    if enteras == no_nulas:
+        # Un entero con nulos queda float, como NaN
+        return "int64" if no_nulas == filas else "float64"
+    return "float64" if reales == no_nulas else object
+
+
+def _normalizar_lote(valores):
+    """normalizar_serie sobre un lote Arrow de claves (la normalización que deduplica)."""
+    import pyarrow as pa
+
+    valores = valores.cast(pa.large_string())
+    serie = pd.Series(pd.arrays.ArrowStringArray(valores))
+    return pa.array(normalizar_serie(serie).array).cast(pa.large_string())
+
+
+class _Motor:
+    """
+    Pasos comunes: tipos de las columnas que read_csv infiere (una pasada de
+    conteos) y partes por hash. Las subclases arman las consultas.
+    """
+
+    @medido("particionar")
+    def particionar(self, path: Path, n_partes: int, clave: str, tipos: dict, directorio: Path):
+        """
+        Escribe el crudo en `n_partes` partes dentro de `directorio`: las filas
+        con la misma clave normalizada (o la misma fila, si clave es None)
+        caen en la misma parte, cada una con su posición original.
+        Devuelve (ParteEnDisco de las partes con filas, filas leídas).
+        """
+        columnas = list(pd.read_csv(path, nrows=0).columns)
+        sin_tipo = [col for col in columnas if col not in tipos]
+        filas, conteos = self._conteos(path, sin_tipo, Path(directorio))
+        inferidos = {col: _tipo_read_csv(filas, *conteos[col]) for col in sin_tipo}
+        numericas = [col for col, tipo in inferidos.items() if tipo is not object]
+
+        self._escribir_partes(path, n_partes, clave, columnas, numericas, Path(directorio))
+
+        partes = [
+            ParteEnDisco(sorted((Path(directorio) / f"{COLUMNA_PARTE}={i}").glob("*.csv")),
+                         columnas, {**tipos, **inferidos})
+            for i in range(n_partes)
+        ]
+        return [parte for parte in partes if parte.archivos] or partes[:1], filas
+
+
+class MotorPolars(_Motor):
+    """Polars lazy: scan_csv y sink_csv por partes, en streaming."""
+
+    nombre = "polars"
+
+    def __init__(self):
+        self.pl = _importar("polars")
+
+    def _crudo(self, path: Path):
+        return self.pl.scan_csv(path, infer_schema=False, row_index_name=COLUMNA_FILA)
+
+    def _sin_nulos(self, col: str):
+        pl = self.pl
+        return pl.when(pl.col(col).is_in(NULOS_READ_CSV)).then(None).otherwise(pl.col(col)).alias(col)
+
+    def _conteos(self, path: Path, columnas: list, directorio: Path):
+        pl = self.pl
+        agregados = []
+        for i, col in enumerate(columnas):
+            valor = self._sin_nulos(col)
+            agregados += [
+                valor.count().alias(f"{i}_no_nulas"),
+                valor.str.contains(ENTERO).sum().alias(f"{i}_enteras"),
+                valor.str.strip_chars().cast(pl.Float64, strict=False).count().alias(f"{i}_reales"),
+            ]
+        fila = self._crudo(path).select(pl.len(), *agregados).collect(engine="streaming").row(0)
+        return fila[0], {col: fila[1 + 3 * i:4 + 3 * i] for i, col in enumerate(columnas)}
+
+    def _escribir_partes(self, path, n_partes, clave, columnas, numericas, directorio):
+        pl = self.pl
+        if clave is None:
+            valores = [
+                self._sin_nulos(col).str.strip_chars().cast(pl.Float64, strict=False)
+                if col in numericas else self._sin_nulos(col)
+                for col in columnas
+            ]
+            hashes = pl.struct(valores).hash()
+        else:
+            hashes = self._sin_nulos(clave).map_batches(
+                lambda serie: pl.from_arrow(_normalizar_lote(serie.to_arrow())),
+                return_dtype=pl.String, is_elementwise=True,
+            ).hash()
+        self._crudo(path).with_columns((hashes % n_partes).alias(COLUMNA_PARTE)).sink_csv(
+            pl.PartitionBy(directorio, key=COLUMNA_PARTE, include_key=False), mkdir=True
+        )
+
+
+class MotorDuckDB(_Motor):
+    """DuckDB: read_csv en paralelo y COPY ... PARTITION_BY, que vuelca a disco lo que no entra."""
+
+    nombre = "duckdb"
+
+    def __init__(self):
+        self.duckdb = _importar("duckdb")
+
+    @staticmethod
+    def _literal(texto) -> str:
+        return "'" + str(texto).replace("'", "''") + "'"
+
+    @staticmethod
+    def _columna(nombre: str) -> str:
+        return '"' + nombre.replace('"', '""') + '"'
+
+    def _conexion(self, directorio: Path):
+        con = self.duckdb.connect()
+        con.execute(f"SET temp_directory = {self._literal(Path(directorio) / '_duckdb')}")
+        return con
+
+    def _crudo(self, path: Path) -> str:
+        # row_number() sobre el scan sin ORDER BY sigue el orden del archivo (preserve_insertion_order)
+        return (
+            f"SELECT row_number() OVER () - 1 AS {COLUMNA_FILA}, * FROM read_csv("
+            f"{self._literal(path)}, header = true, all_varchar = true, delim = ',', "
+            f"quote = '\"', escape = '\"', null_padding = true)"
+        )
+
+    def _sin_nulos(self, col: str) -> str:
+        nulos = ", ".join(self._literal(token) for token in NULOS_READ_CSV)
+        return f"CASE WHEN {self._columna(col)} IN ({nulos}) THEN NULL ELSE {self._columna(col)} END"
+
+    def _conteos(self, path: Path, columnas: list, directorio: Path):
+        agregados = []
+        for col in columnas:
+            valor = self._sin_nulos(col)
+            agregados += [
+                f"count({valor})",
+                f"count_if(regexp_matches({valor}, {self._literal(ENTERO)}))",
+                f"count(TRY_CAST(trim({valor}) AS DOUBLE))",
+            ]
+        with self._conexion(directorio) as con:
+            fila = con.execute(f"SELECT {', '.join(['count(*)', *agregados])} FROM ({self._crudo(path)})").fetchone()
+        return fila[0], {col: fila[1 + 3 * i:4 + 3 * i] for i, col in enumerate(columnas)}
+
+    def _escribir_partes(self, path, n_partes, clave, columnas, numericas, directorio):
+        with self._conexion(directorio) as con:
+            if clave is None:
+                valores = ", ".join(
+                    f"TRY_CAST(trim({self._sin_nulos(col)}) AS DOUBLE)" if col in numericas
+                    else self._sin_nulos(col)
+                    for col in columnas
+                )
+            else:
+                con.create_function(
+                    "normalizar_clave", _normalizar_lote, ["VARCHAR"], "VARCHAR",
+                    type="arrow", null_handling="special", side_effects=False,
+                )
+                valores = f"normalizar_clave({self._sin_nulos(clave)})"
+            con.execute(
+                f"COPY (SELECT *, hash({valores}) % {n_partes} AS {COLUMNA_PARTE} "
+                f"FROM ({self._crudo(path)})) TO {self._literal(directorio)} "
+                f"(FORMAT csv, HEADER, PARTITION_BY ({COLUMNA_PARTE}))"
+            )
+
+
+MOTORES = {
+    MotorPolars.nombre: MotorPolars,
+    MotorDuckDB.nombre: MotorDuckDB,
+}
+
+
+def obtener_motor(nombre: str):
+    """Motor fuera de memoria por nombre, o None para leer y limpiar todo con pandas."""
+    return MOTORES[nombre]() if nombre in MOTORES else None
@@ -0,0 +1,304 @@
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentacion import Paso, pasos_de_etapa
+
+
+# -----------------------
+# Normalización de strings
+# -----------------------
+VALORES_NULOS = ['NONE', 'NÃNE', 'NÃ³NE', 'NAN', 'NULL', 'N/A', 'NA', '']
+
+# Largo máximo de un token nulo ASCII ('NONE', 'NULL')
+_LARGO_MAX_NULO = 4
+
+
+def normalizar_string(valor):
+    """Normaliza strings limpiando encoding, espacios y caracteres especiales."""
+    if pd.isna(valor):
+        return np.nan
+
+    valor = str(valor).strip()
+
+    # Detectar valores nulos
+    if valor.upper() in VALORES_NULOS:
+        return np.nan
+
+    # Corregir encoding
+    try:
+        valor = valor.encode('latin1', errors='ignore').decode('utf-8', errors='ignore')
+    except:
+        pass
+
+    # Normalizar Unicode y eliminar acentos
+    valor = unicodedata.normalize('NFKD', valor)
+    valor = valor.encode('ASCII', 'ignore').decode('ASCII')
+    valor = ' '.join(valor.split())
+
+    return np.nan if valor == '' else valor
+
+
+def _celdas_sucias(textos: np.ndarray, largos: np.ndarray) -> np.ndarray:
+    """
+    Marca las celdas que necesitan el camino completo de normalizar_string:
+    caracteres no ASCII, espacios en los extremos o espacios a colapsar.
+    La columna se une en un solo buffer de code points y se revisa con NumPy,
+    sin bucle Python por celda.
+    """
+    unido = ''.join(textos)
+    if unido.isascii():
+        codigos = np.frombuffer(unido.encode('ascii'), dtype=np.uint8)
+    else:
+        try:
+            codigos = np.frombuffer(unido.encode('utf-32-le'), dtype=np.uint32)
+        except UnicodeEncodeError:
+            # Surrogates sueltos: no se puede mapear a code points, todo al camino Python
+            return np.ones(len(textos), dtype=bool)
+
+    # No ASCII, o whitespace distinto de ' ' (\t\n\v\f\r y \x1c-\x1f)
+    marcas = (
+        (codigos > 0x7f) |
+        ((codigos >= 0x09) & (codigos <= 0x0d)) |
+        ((codigos >= 0x1c) & (codigos <= 0x1f))
+    )
+    # Espacios dobles a colapsar
+    espacios = codigos == 0x20
+    marcas[1:] |= espacios[1:] & espacios[:-1]
+
+    inicios = np.concatenate(([0], np.cumsum(largos)[:-1]))
+    sucias = np.zeros(len(textos), dtype=bool)
+
+    # Espacios en los extremos de cada celda
+    con_texto = largos > 0
+    sucias[con_texto] = espacios[inicios[con_texto]] | espacios[inicios[con_texto] + largos[con_texto] - 1]
+
+    posiciones = np.flatnonzero(marcas)
+    if len(posiciones):
+        sucias[np.searchsorted(inicios, posiciones, side='right') - 1] = True
+    return sucias
+
+
+# Lo que _celdas_sucias marca en celdas ASCII, como regex (RE2) de pyarrow
+_PATRON_SUCIAS_ASCII = r'^ | $|  |[\x09-\x0d\x1c-\x1f]'
+
+
+def _normalizar_arrow(serie: pd.Series) -> pd.Series:
+    """
+    normalizar_serie para columnas string de Arrow: las celdas limpias y los
+    tokens nulos se resuelven con pyarrow.compute sin crear un str de Python
+    por celda; solo las sucias pasan por normalizar_string.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    textos = pa.array(serie.array)
+    sucias = pc.or_(
+        pc.invert(pc.string_is_ascii(textos)),
+        pc.match_substring_regex(textos, _PATRON_SUCIAS_ASCII),
+    ).fill_null(False)
+    nulas = pc.and_(pc.invert(sucias), pc.is_in(pc.utf8_upper(textos), value_set=pa.array(VALORES_NULOS)))
+
+    salida = pd.Series(
+        pd.arrays.ArrowStringArray(pc.if_else(nulas, pa.scalar(None, textos.type), textos)),
+        index=serie.index, name=serie.name,
+    )
+    posiciones = np.flatnonzero(sucias.to_numpy(zero_copy_only=False))
+    if len(posiciones):
+        salida.iloc[posiciones] = [
+            normalizar_string(v) for v in textos.take(pa.array(posiciones)).to_pylist()
+        ]
+    return salida
+
+
+def normalizar_serie(serie: pd.Series) -> pd.Series:
+    """
+    Equivalente vectorizado de serie.apply(normalizar_string).
+    Las celdas ASCII ya limpias se resuelven a nivel columna; solo las celdas
+    sucias (no ASCII, espacios de más o valores que no son str) pasan por
+    normalizar_string. Las columnas string de Arrow salen con el mismo dtype.
+    """
+    if isinstance(serie.array, pd.arrays.ArrowStringArray):
+        return _normalizar_arrow(serie)
+
+    # Columnas no textuales: str(valor) depende del tipo, se delega al camino original
+    if serie.dtype != object and not pd.api.types.is_string_dtype(serie.dtype):
+        return serie.apply(normalizar_string).astype(object)
+
+    salida = np.full(len(serie), np.nan, dtype=object)
+
+    posiciones = np.flatnonzero(serie.notna().to_numpy())
+    if len(posiciones) == 0:
+        return pd.Series(salida, index=serie.index, name=serie.name)
+
+    textos = serie.to_numpy(dtype=object)[posiciones]
+
+    # Valores que no son str (números sueltos en columnas object)
+    if pd.api.types.infer_dtype(textos, skipna=True) != 'string':
+        es_str = np.fromiter((isinstance(v, str) for v in textos), dtype=bool, count=len(textos))
+        salida[posiciones[~es_str]] = [normalizar_string(v) for v in textos[~es_str]]
+        posiciones = posiciones[es_str]
+        textos = textos[es_str]
+
+    largos = np.fromiter(map(len, textos), dtype=np.int64, count=len(textos))
+
+    # Celdas sucias: camino Python original
+    sucias = _celdas_sucias(textos, largos)
+    if sucias.any():
+        salida[posiciones[sucias]] = [normalizar_string(v) for v in textos[sucias]]
+
+    # Celdas limpias: solo resta detectar tokens nulos (todos de largo <= 4)
+    limpias = ~sucias
+    cortas = limpias & (largos <= _LARGO_MAX_NULO)
+    nulas = np.zeros(len(textos), dtype=bool)
+    if cortas.any():
+        nulas[cortas] = pd.Series(textos[cortas], dtype=object).str.upper().isin(VALORES_NULOS).to_numpy()
+
+    conservar = limpias & ~nulas
+    salida[posiciones[conservar]] = textos[conservar]
+
+    return pd.Series(salida, index=serie.index, name=serie.name)
+
+
+# -----------------------
+# Columnas category
+# -----------------------
+def _categorica(valores: np.ndarray, codigos: np.ndarray, serie: pd.Series) -> pd.Series:
+    """
+    Serie category con valores[codigos] (código -1 = nulo), sin armar un
+    objeto por fila. Las categorías quedan ordenadas: las partes de una misma
+    tabla limpiadas por separado se concatenan sin perder el dtype.
+    """
+    inverso, categorias = pd.factorize(pd.Series(valores, dtype=object), sort=True)
+    if len(inverso) == 0:
+        nuevos = np.full(len(codigos), -1)
+    else:
+        nuevos = np.where(codigos >= 0, inverso[codigos], -1)
+    return pd.Series(
+        pd.Categorical.from_codes(nuevos, categories=categorias),
+        index=serie.index, name=serie.name,
+    )
+
+
+def aplicar_a_valores(serie: pd.Series, func) -> pd.Series:
+    """
+    Aplica `func` (vectorizada, Series -> Series: .str.lower(), .replace(...))
+    a una columna. En columnas category se aplica solo a las categorías y se
+    recodifica, así la columna sigue siendo category.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return func(serie)
+    valores = func(pd.Series(serie.cat.categories, dtype=object)).to_numpy(dtype=object)
+    return _categorica(valores, serie.cat.codes.to_numpy(), serie)
+
+
+# -----------------------
+# Cache por valores distintos
+# -----------------------
+class CacheNormalizacion:
+    """
+    Cache LRU acotado de valor crudo -> valor normalizado.
+    Las columnas se factorizan, solo los valores distintos que no están en
+    cache se normalizan, y el resultado se expande de nuevo con los códigos.
+    """
+
+    def __init__(self, max_entradas: int = 200_000):
+        self.max_entradas = max_entradas
+        self._valores = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._valores)
+
+    def limpiar(self):
+        """Vacía el cache y reinicia los contadores (una vez por corrida)."""
+        self._valores.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def normalizar(self, serie: pd.Series, valores=None) -> pd.Series:
+        """
+        Las columnas category y string de Arrow conservan su dtype. `valores`
+        (Series -> Series: .str.lower(), .replace(...)) se aplica a los valores
+        distintos ya normalizados, antes de expandir: una sola pasada por fila.
+        """
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+        unicos = np.asarray(unicos, dtype=object)
+
+        normalizados = np.empty(len(unicos) + 1, dtype=object)
+        normalizados[-1] = np.nan  # código -1 (NaN) apunta a la última posición
+
+        faltantes = []
+        for i, valor in enumerate(unicos):
+            # Solo se cachean str: 1, 1.0 y True colisionan como claves de dict
+            if isinstance(valor, str) and valor in self._valores:
+                self._valores.move_to_end(valor)
+                normalizados[i] = self._valores[valor]
+                self.hits += 1
+            else:
+                faltantes.append(i)
+
+        if faltantes:
+            faltantes = np.array(faltantes)
+            resueltos = normalizar_serie(pd.Series(unicos[faltantes], dtype=object)).to_numpy()
+            normalizados[faltantes] = resueltos
+            self.misses += len(faltantes)
+
+            for valor, resuelto in zip(unicos[faltantes], resueltos):
+                if isinstance(valor, str):
+                    self._valores[valor] = resuelto
+            while len(self._valores) > self.max_entradas:
+                self._valores.popitem(last=False)
+
+        if valores is not None:
+            normalizados[:-1] = valores(pd.Series(normalizados[:-1], dtype=object)).to_numpy(dtype=object)
+
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return _categorica(normalizados[:-1], codigos, serie)
+        dtype = serie.dtype if isinstance(serie.array, pd.arrays.ArrowStringArray) else None
+        return pd.Series(normalizados[codigos], index=serie.index, name=serie.name, dtype=dtype)
+
+    def resumen(self) -> str:
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({ratio:.1%} hit rate), {len(self)} entries"
+
+
+# Cache compartido por todas las tablas de una misma corrida
+CACHE_NORMALIZACION = CacheNormalizacion()
+
+
+# Paso de cada columna normalizada: "normalizar_columna:{columna}" en la etapa de la tabla
+PASO_NORMALIZACION = "normalizar_columna:"
+
+
+def normalizar_columna(serie: pd.Series, cache: CacheNormalizacion = None, valores=None) -> pd.Series:
+    """
+    Normaliza una columna completa. Filas y tiempo se acumulan como un paso
+    por columna (también entre chunks y partes) e informar_normalizacion
+    muestra el throughput una vez por tabla.
+    Con cache, solo se normalizan los valores distintos (columnas de baja cardinalidad).
+    `valores` transforma el resultado como en aplicar_a_valores.
+    """
+    with Paso(f"{PASO_NORMALIZACION}{serie.name}", len(serie)) as paso:
+        if cache is not None:
+            resultado = cache.normalizar(serie, valores)
+        else:
+            resultado = normalizar_serie(serie)
+            if valores is not None:
+                resultado = aplicar_a_valores(resultado, valores)
+        paso.filas_salida = len(resultado)
+    return resultado
+
+
+def informar_normalizacion(etapa: str):
+    """Filas y filas/seg de cada columna normalizada en la etapa, sumando todas las llamadas."""
+    for paso, registro in pasos_de_etapa(etapa).items():
+        if not paso.startswith(PASO_NORMALIZACION):
+            continue
+        filas, segundos = registro["filas_entrada"] or 0, registro["wall_s"]
+        filas_seg = filas / segundos if segundos > 0 else float('inf')
+        print(f"  {paso[len(PASO_NORMALIZACION):]} normalized: {filas} rows ({filas_seg:,.0f} rows/s)")
@@ -0,0 +1,269 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import instrumentacion
+from instrumentacion import medido
+from normalizacion import normalizar_serie
+from streaming import EstadoChunks
+
+
+# -----------------------
+# Partición por hash
+# -----------------------
+def particionar(df: pd.DataFrame, n_particiones: int, clave: str = None) -> list:
+    """
+    Parte la tabla en `n_particiones` por hash de la clave de deduplicación ya
+    normalizada (o de la fila completa si clave es None): todas las filas con la
+    misma clave caen en la misma parte, así drop_duplicates(subset) sigue siendo
+    correcto dentro de cada una. Cada parte conserva el orden original.
+    """
+    if clave is None:
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    else:
+        hashes = pd.util.hash_pandas_object(normalizar_serie(df[clave]), index=False).to_numpy()
+
+    destino = hashes % np.uint64(n_particiones)
+    return [df[destino == i] for i in range(n_particiones)]
+
+
+# Columna con la posición de cada fila en el CSV crudo (índice de las partes en disco)
+COLUMNA_FILA = "__fila"
+
+
+class ParteEnDisco:
+    """
+    Parte de una tabla que un motor (motores.py) escribió en uno o más CSV,
+    con la posición original de cada fila. El worker la lee recién al
+    limpiarla, así la tabla entera nunca está en memoria.
+    """
+
+    def __init__(self, archivos: list, columnas: list, tipos: dict):
+        self.archivos = list(archivos)
+        self.columnas = list(columnas)
+        self.tipos = dict(tipos)
+
+    @medido("read_csv")
+    def leer(self) -> pd.DataFrame:
+        if not self.archivos:
+            return pd.DataFrame({col: pd.Series(dtype=self.tipos.get(col, object)) for col in self.columnas})
+        tipos = {**self.tipos, COLUMNA_FILA: "int64"}
+        df = pd.concat([pd.read_csv(archivo, dtype=tipos, index_col=COLUMNA_FILA) for archivo in self.archivos])
+        if len(self.archivos) > 1:
+            # concat de categóricas con categorías distintas las deja object
+            df = df.astype({col: tipo for col, tipo in self.tipos.items() if tipo == "category"})
+        df.index.name = None
+        return df.sort_index(kind='stable')
+
+
+# Filas por lote al recorrer las partes limpias: lo que se tiene en memoria por parte
+FILAS_POR_LOTE = 100_000
+
+
+def _tipo_comun(tipos: list):
+    """dtype que queda al concatenar columnas con estos dtypes (como pd.concat de las partes)."""
+    if all(tipo == tipos[0] for tipo in tipos):
+        return tipos[0]
+    if all(isinstance(tipo, pd.CategoricalDtype) for tipo in tipos):
+        return "category"
+    if all(isinstance(tipo, np.dtype) and tipo.kind in "iuf" for tipo in tipos):
+        return np.result_type(*tipos)
+    return object
+
+
+class ParteLimpia:
+    """Parte ya limpia que un worker escribió en parquet, con la posición original de cada fila."""
+
+    def __init__(self, archivo, filas: int, tipos: pd.Series):
+        self.archivo = archivo
+        self.filas = filas
+        self.tipos = tipos
+
+
+class TablaEnPartes:
+    """
+    Tabla limpia repartida en partes en disco (limpiar_partes con `directorio`).
+    `bloques` la recorre en el orden original de las filas con un lote por
+    parte en memoria, sin juntar la tabla entera.
+    """
+
+    def __init__(self, partes: list):
+        self.partes = partes
+        self.filas = sum(parte.filas for parte in partes)
+        # Las partes vacías no aportan filas y podrían cambiar dtypes
+        con_filas = [parte for parte in partes if parte.filas] or partes[:1]
+        columnas = list(con_filas[0].tipos.index)
+        self.tipos = {col: _tipo_comun([parte.tipos[col] for parte in con_filas]) for col in columnas}
+
+    @property
+    def shape(self):
+        return self.filas, len(self.tipos)
+
+    def bloques(self, filas_por_lote: int = None):
+        """Genera la tabla de a bloques, con las filas en el orden del crudo."""
+        import pyarrow.parquet as pq
+
+        lectores = [
+            pq.ParquetFile(parte.archivo).iter_batches(batch_size=filas_por_lote or FILAS_POR_LOTE)
+            for parte in self.partes if parte.filas
+        ]
+        if not lectores:
+            yield pd.read_parquet(self.partes[0].archivo).rename_axis(None).astype(self.tipos)
+            return
+
+        pendientes = [None] * len(lectores)
+        while True:
+            for i, lector in enumerate(lectores):
+                if lector is not None and (pendientes[i] is None or not len(pendientes[i])):
+                    lote = next(lector, None)
+                    if lote is None:
+                        lectores[i] = pendientes[i] = None
+                    else:
+                        pendientes[i] = lote.to_pandas().rename_axis(None)
+
+            activos = [df for df in pendientes if df is not None and len(df)]
+            if not activos:
+                return
+            # Cada parte está ordenada: hasta la menor última posición leída ya están todas las filas
+            limite = min(df.index[-1] for df in activos)
+            piezas = [df[df.index <= limite].astype(self.tipos) for df in activos]
+            bloque = pd.concat([pieza for pieza in piezas if len(pieza)]).sort_index(kind='stable')
+            pendientes = [None if df is None else df[df.index > limite] for df in pendientes]
+            yield bloque.astype(self.tipos)
+
+
+# -----------------------
+# Ejecución en paralelo
+# -----------------------
+def _limpiar_parte(func, parte, args, estado, etapa, solo_estado=False, salida=None):
+    # Los pasos medidos en el worker se devuelven para sumarlos a la etapa
+    instrumentacion.reiniciar(etapa)
+    if isinstance(parte, ParteEnDisco):
+        parte = parte.leer()
+    resultado = func(parte, *args, estado=estado)
+    if salida is not None and not solo_estado:
+        # El worker escribe su parte: al padre vuelve solo la ruta
+        resultado.sort_index(kind='stable').rename_axis(COLUMNA_FILA).to_parquet(salida, index=True)
+        resultado = ParteLimpia(salida, len(resultado), resultado.dtypes)
+    return (None if solo_estado else resultado), estado, instrumentacion.extraer()
+
+
+def _formatos_a_fijar(estados: list, fijados: dict) -> dict:
+    """
+    Siguiente pasada sin decidir de cada columna de fechas. Con las pasadas
+    anteriores ya iguales en todas las partes, el formato global es el de la
+    parte cuya ancla está primero en la tabla original (menor etiqueta).
+    """
+    candidatos = {}
+    for estado in estados:
+        for col, formatos in estado.formatos_por_columna.items():
+            decididas = fijados.get(col, {})
+            pendientes = [p for p in formatos.fijados if p not in decididas]
+            if not pendientes:
+                continue
+            pasada = min(pendientes)
+            propuesta = (formatos.anclas[pasada], formatos.fijados[pasada])
+            actual = candidatos.get(col)
+            if actual is None or (pasada, propuesta[0]) < (actual[0], actual[1][0]):
+                candidatos[col] = (pasada, propuesta)
+
+    return {col: (pasada, formato) for col, (pasada, (_, formato)) in candidatos.items()}
+
+
+def _coincide(estado, fijados: dict) -> bool:
+    for col, formatos in estado.formatos_por_columna.items():
+        propios = formatos.fijados
+        for pasada, formato in fijados.get(col, {}).items():
+            if pasada in propios and propios[pasada] != formato:
+                return False
+    return True
+
+
+def limpiar_particionado(df: pd.DataFrame, func, n_particiones: int, workers: int,
+                         args=(), clave: str = None, modas_zip=None) -> pd.DataFrame:
+    """
+    Limpia una tabla grande repartiéndola en particiones por hash que corren
+    en un pool de procesos, y une los resultados en el orden original.
+    """
+    return limpiar_partes(particionar(df, n_particiones, clave), func, workers, args, modas_zip)
+
+
+def limpiar_partes(partes: list, func, workers: int, args=(), modas_zip=None, directorio=None):
+    """
+    Limpia las partes (DataFrames o ParteEnDisco, indexadas por la posición
+    original de cada fila) en un pool de procesos y une los resultados.
+    Con `directorio`, cada worker escribe ahí su parte limpia y se devuelve
+    una TablaEnPartes en vez de la tabla en memoria.
+
+    Da el mismo resultado que limpiar la tabla entera:
+    - la deduplicación queda dentro de cada parte (ver `particionar`);
+    - si hay imputación de zips, una primera pasada suma los conteos de
+      todas las partes para que las modas sean globales;
+    - el formato de fecha que pandas infiere del primer valor de la columna
+      se reconcilia entre partes, y solo se vuelven a limpiar las partes que
+      infirieron otro formato (en datos consistentes, ninguna).
+    """
+    if directorio is not None:
+        Path(directorio).mkdir(parents=True, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        def ejecutar(indices, fijados=None, modas=None, solo_estado=False):
+            futuros = [
+                pool.submit(
+                    _limpiar_parte, func, partes[i], args,
+                    EstadoChunks(modas, entre_chunks=False, formatos_fijados=fijados),
+                    instrumentacion.etapa_actual(), solo_estado,
+                    None if directorio is None else Path(directorio) / f"parte_{i}.parquet"
+                )
+                for i in indices
+            ]
+            resultados = []
+            for futuro in futuros:
+                limpio, estado, mediciones = futuro.result()
+                # Los conteos (filas huérfanas, reglas de calidad) valen solo
+                # para la última limpieza de cada parte: se suman al final
+                conteos = {"conteos": mediciones.pop("conteos"), "reglas": mediciones.pop("reglas")}
+                instrumentacion.incorporar(mediciones)
+                resultados.append((limpio, estado, conteos))
+            return resultados
+
+        todas = range(len(partes))
+
+        if modas_zip is not None:
+            for _, estado, _ in ejecutar(todas, modas=modas_zip, solo_estado=True):
+                modas_zip.combinar(estado.modas_zip)
+            modas_zip.cerrar()
+
+        resultados = ejecutar(todas, modas=modas_zip)
+
+        fijados = {}
+        while True:
+            nuevos = _formatos_a_fijar([estado for _, estado, _ in resultados], fijados)
+            if not nuevos:
+                break
+            for col, (pasada, formato) in nuevos.items():
+                fijados.setdefault(col, {})[pasada] = formato
+
+            distintas = [i for i, (_, estado, _) in enumerate(resultados) if not _coincide(estado, fijados)]
+            for i, resultado in zip(distintas, ejecutar(distintas, fijados, modas_zip)):
+                resultados[i] = resultado
+
+    for _, _, conteos in resultados:
+        instrumentacion.incorporar(conteos)
+
+    if directorio is not None:
+        return TablaEnPartes([limpia for limpia, _, _ in resultados])
+
+    # Las partes vacías no aportan filas y podrían cambiar dtypes al concatenar
+    limpios = [limpio for limpio, _, _ in resultados if len(limpio)] or [resultados[0][0]]
+    resultado = pd.concat(limpios).sort_index(kind='stable')
+
+    # Las partes leídas de disco tienen cada una sus categorías: concat las deja object
+    categoricas = [
+        col for col in resultado.columns
+        if resultado[col].dtype == object and all(isinstance(l[col].dtype, pd.CategoricalDtype) for l in limpios)
+    ]
+    return resultado.astype({col: "category" for col in categoricas}) if categoricas else resultado
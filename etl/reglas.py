@@ -0,0 +1,285 @@
+import numpy as np
+import pandas as pd
+
+from normalizacion import CACHE_NORMALIZACION, aplicar_a_valores, normalizar_columna
+from streaming import EstadoChunks, filas_nuevas
+from claves import IndiceClaves
+from duplicados import en_ordenado, hash_filas, valores_en_conflicto
+from instrumentacion import contar, contar_regla, medido
+
+
+# -----------------------
+# Máscara de filas conservadas
+# -----------------------
+class FiltroFilas:
+    """
+    Filas de `df` que un clean_* conserva, acumuladas en una sola máscara.
+    Cada filtro se evalúa sobre las filas que siguen en pie (los duplicados
+    y los conteos de descartes dan lo mismo que filtrando paso a paso) y la
+    tabla se copia una sola vez, en aplicar().
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.mantener = np.ones(len(df), dtype=bool)
+
+    def conservar(self, mascara):
+        self.mantener &= np.asarray(mascara, dtype=bool)
+
+    def quitar(self, mascara):
+        self.mantener &= ~np.asarray(mascara, dtype=bool)
+
+    def descartar(self, mascara, columna, regla):
+        """quitar() contando las filas en pie que descarta la regla (métricas de calidad)."""
+        mascara = np.asarray(mascara, dtype=bool)
+        contar_regla(columna, regla, "descarta", np.count_nonzero(self.mantener & mascara))
+        self.mantener &= ~mascara
+
+    def quitar_vacias_y_duplicadas(self, estado: EstadoChunks = None):
+        """
+        dropna(how='all') + drop_duplicates(). Una fila vacía no duplica a
+        ninguna otra, así que los duplicados se buscan en la tabla entera.
+        """
+        self.descartar(self.df.isna().all(axis=1), "*", "fila_vacia")
+        self.descartar(~filas_nuevas(self.df, estado=estado), "*", "fila_duplicada")
+
+    def deduplicar(self, subset, estado: EstadoChunks = None):
+        """drop_duplicates(subset) entre las filas que siguen en pie."""
+        en_pie = np.count_nonzero(self.mantener)
+        self.mantener = filas_nuevas(self.df, subset, estado, filas=np.flatnonzero(self.mantener))
+        columna = subset if isinstance(subset, str) else ",".join(subset)
+        contar_regla(columna, "clave_duplicada", "descarta", en_pie - np.count_nonzero(self.mantener))
+
+    @medido("filtro_ids")
+    def ids_validos(self, col, valid_ids, tabla, estado: EstadoChunks = None):
+        """
+        Descarta las filas cuyo `col` no está entre los IDs válidos (integridad
+        referencial). `valid_ids` es un IndiceClaves (o cualquier array de IDs).
+        Las filas huérfanas quedan como conteo huerfanas_{col} de la etapa
+        y, si el estado las junta, sus valores en el estado.
+        """
+        if valid_ids is None:
+            return
+        validos = IndiceClaves(valid_ids).contiene(self.df[col])
+        huerfanas = np.count_nonzero(self.mantener & ~validos)
+        contar(f"huerfanas_{col}", huerfanas)
+        contar_regla(col, "fk_invalida", "descarta", huerfanas)
+        print(f"  Removed {huerfanas} {tabla} with invalid {col}")
+        if estado is not None:
+            estado.registrar_huerfanas(col, self.df[col][self.mantener & ~validos])
+        self.mantener &= validos
+
+    def claves_en_conflicto(self, clave, identidad, tabla, en_pie, conflictivas=None):
+        """
+        Después de deduplicar(clave): descarta todas las filas de las claves
+        que aparecen con más de una `identidad` (marcadores como FAKE_KEY_1,
+        no entidades). `en_pie` es la máscara de antes de deduplicar.
+        `conflictivas` son los hashes de esas claves en el crudo entero, si se
+        calcularon antes (modos por chunks); si no, se buscan en `df`, solo
+        entre las claves que la deduplicación encontró repetidas.
+        """
+        claves = self.df[clave]
+        if conflictivas is not None:
+            en_conflicto = en_ordenado(conflictivas, hash_filas(self.df, [clave]))
+        else:
+            repetidas = claves.isin(claves[en_pie & ~self.mantener].unique()).to_numpy() & en_pie
+            conflicto = valores_en_conflicto(claves[repetidas], self.df[identidad][repetidas])
+            en_conflicto = claves.isin(conflicto).to_numpy()
+        descartadas = np.count_nonzero(en_pie & en_conflicto)
+        contar(f"conflictos_{clave}", descartadas)
+        # Para la métrica, solo las que la deduplicación no había quitado ya
+        contar_regla(clave, "clave_en_conflicto", "descarta", np.count_nonzero(self.mantener & en_conflicto))
+        print(f"  Removed {descartadas} {tabla} with conflicting {clave}")
+        self.quitar(en_conflicto)
+
+    def aplicar(self) -> pd.DataFrame:
+        """La tabla con las filas conservadas: una copia, o ninguna si no se quitó nada."""
+        if not self.mantener.all():
+            self.df = self.df.iloc[np.flatnonzero(self.mantener)]
+            self.mantener = np.ones(len(self.df), dtype=bool)
+        return self.df
+
+
+# -----------------------
+# Reglas declarativas
+# -----------------------
+class Columna:
+    """
+    Regla de limpieza de una columna:
+
+    - `numerico`: pd.to_numeric(errors='coerce').
+    - `normalizar`: normalizar_string por celda; con `cache`, por valor distinto
+      con CACHE_NORMALIZACION (columnas de baja cardinalidad).
+    - `caso`: métodos de .str a aplicar en orden ("lower", "upper", "title").
+    - `reemplazos`: valor -> corrección (None deja nulo).
+    - `permitidos`: los valores fuera del conjunto pasan a nulo.
+    - `rango`: (mínimo, máximo) con `incluir` como en Series.between; fuera
+      de rango pasa a nulo, o descarta la fila con fuera_de_rango="descartar"
+      (un nulo también la descarta).
+    - `dtype`: tipo final de la columna (p. ej. "Int64").
+
+    Con `antes_de_filtrar` se limpia sobre la tabla entera, antes de armar
+    la máscara de filas (p. ej. si un filtro propio del clean_* la usa).
+    """
+
+    def __init__(self, nombre, numerico=False, normalizar=False, cache=False, caso=(),
+                 reemplazos=None, permitidos=None, rango=None, incluir="both",
+                 fuera_de_rango="nulo", dtype=None, antes_de_filtrar=False):
+        if fuera_de_rango not in ("nulo", "descartar"):
+            raise ValueError(f"{nombre}: unknown fuera_de_rango {fuera_de_rango!r}")
+        self.nombre = nombre
+        self.numerico = numerico
+        self.normalizar = normalizar
+        self.cache = cache
+        self.caso = (caso,) if isinstance(caso, str) else tuple(caso)
+        self.reemplazos = dict(reemplazos) if reemplazos else None
+        self.permitidos = list(permitidos) if permitidos is not None else None
+        self.rango = rango
+        self.incluir = incluir
+        self.fuera_de_rango = fuera_de_rango
+        self.dtype = dtype
+        self.antes_de_filtrar = antes_de_filtrar
+
+    def __repr__(self):
+        return f"Columna({self.nombre!r})"
+
+    @property
+    def descarta_filas(self) -> bool:
+        return self.rango is not None and self.fuera_de_rango == "descartar"
+
+    def _transformar_valores(self, valores: pd.Series) -> pd.Series:
+        """Caso, reemplazos y conjunto permitido sobre los valores (distintos) de la columna."""
+        for metodo in self.caso:
+            valores = getattr(valores.str, metodo)()
+        if self.reemplazos:
+            valores = valores.replace(self.reemplazos)
+        if self.permitidos is not None:
+            valores = valores.where(valores.isin(self.permitidos))
+        return valores
+
+    def limpiar(self, serie: pd.Series) -> pd.Series:
+        """
+        Todas las transformaciones de valores, en una pasada por la columna.
+        Los valores que cada paso deja nulos se cuentan como reglas de calidad.
+        """
+        nulos = int(serie.isna().sum())
+        if self.numerico:
+            serie = pd.to_numeric(serie, errors="coerce")
+            nulos = self._contar_nulos(serie, nulos, "no_numerico")
+
+        valores = None
+        if self.caso or self.reemplazos or self.permitidos is not None:
+            valores = self._transformar_valores
+        if self.normalizar:
+            cache = CACHE_NORMALIZACION if self.cache else None
+            serie = normalizar_columna(serie, cache=cache, valores=valores)
+        elif valores is not None:
+            serie = aplicar_a_valores(serie, valores)
+        if valores is not None or self.normalizar:
+            self._contar_nulos(serie, nulos, "valor_invalido")
+
+        if self.rango is not None and self.fuera_de_rango == "nulo":
+            fuera = serie.notna() & ~serie.between(*self.rango, inclusive=self.incluir)
+            contar_regla(self.nombre, "fuera_de_rango", "anula", fuera.sum())
+            # Como df.loc[...] = np.nan: las columnas enteras pasan a float aunque no haya cambios
+            serie = serie.copy()
+            serie.loc[fuera] = np.nan
+        return serie
+
+    def _contar_nulos(self, serie: pd.Series, antes: int, regla: str) -> int:
+        nulos = int(serie.isna().sum())
+        contar_regla(self.nombre, regla, "anula", nulos - antes)
+        return nulos
+
+    def en_rango(self, serie: pd.Series) -> np.ndarray:
+        return serie.between(*self.rango, inclusive=self.incluir).to_numpy(dtype=bool)
+
+
+class ReglasTabla:
+    """
+    Reglas de limpieza de una tabla, compiladas al crearse en pasadas fusionadas:
+
+    1. filtrar(): filas vacías y duplicadas, columnas que deciden qué filas
+       quedan (`requeridas`, `padres`, rangos que descartan), no nulos, FKs
+       contra los IDs válidos de cada padre y duplicados por `clave`, todo
+       en la máscara de un FiltroFilas. Con `identidad` (requiere `clave`),
+       las claves que aparecen con más de una identidad se descartan enteras.
+    2. completar(): descartes por rango, una sola copia de las filas que
+       quedan y el resto de las columnas.
+    3. finalizar(): columnas a descartar y dtypes finales.
+
+    Cada columna se recorre una vez. Entre las fases el clean_* puede
+    agregar pasos propios (fechas, imputación, filtros que no son reglas);
+    si no tiene, limpiar() hace las tres.
+    """
+
+    def __init__(self, nombre, columnas, requeridas=(), padres=(), clave=None,
+                 identidad=None, descartar=("noise_flag",)):
+        self.nombre = nombre
+        self.columnas = {regla.nombre: regla for regla in columnas}
+        self.requeridas = list(requeridas)
+        self.padres = list(padres)
+        self.clave = clave
+        self.identidad = identidad
+        # Hashes de las claves en conflicto del crudo entero (los fija main en los modos por chunks)
+        self.conflictivas = None
+        self.descartar = list(descartar)
+
+        antes = set(self.requeridas) | set(self.padres)
+        self._antes = [
+            r for r in self.columnas.values()
+            if r.nombre in antes or r.descarta_filas or r.antes_de_filtrar
+        ]
+        self._despues = [r for r in self.columnas.values() if r not in self._antes]
+        self._descartes = [r for r in self.columnas.values() if r.descarta_filas]
+        self._dtypes = {r.nombre: r.dtype for r in self.columnas.values() if r.dtype is not None}
+
+    def __repr__(self):
+        return f"ReglasTabla({self.nombre!r})"
+
+    def filtrar(self, df: pd.DataFrame, ids: dict = None, estado: EstadoChunks = None):
+        """
+        Copia perezosa de `df` con las columnas de la fase 1 limpias y su
+        FiltroFilas. `ids` tiene los IDs válidos de cada columna de `padres`.
+        """
+        # Copia perezosa: los cambios no llegan al DataFrame de quien llama
+        df = df.copy(deep=False)
+        filtro = FiltroFilas(df)
+
+        # Sin clave, los duplicados de fila entera se buscan también entre chunks
+        filtro.quitar_vacias_y_duplicadas(estado if self.clave is None else None)
+
+        for regla in self._antes:
+            df[regla.nombre] = regla.limpiar(df[regla.nombre])
+
+        for col in self.requeridas:
+            filtro.descartar(df[col].isna(), col, "requerido_nulo")
+
+        for col in self.padres:
+            filtro.ids_validos(col, (ids or {}).get(col), self.nombre, estado)
+
+        if self.clave is not None:
+            en_pie = filtro.mantener.copy()
+            filtro.deduplicar(self.clave, estado)
+            if self.identidad is not None:
+                filtro.claves_en_conflicto(self.clave, self.identidad, self.nombre, en_pie, self.conflictivas)
+        return df, filtro
+
+    def completar(self, df: pd.DataFrame, filtro: FiltroFilas) -> pd.DataFrame:
+        for regla in self._descartes:
+            filtro.descartar(~regla.en_rango(df[regla.nombre]), regla.nombre, "fuera_de_rango")
+        df = filtro.aplicar()
+
+        # aplicar() puede devolver una vista de filas: las columnas van con
+        # assign, que arma un DataFrame nuevo en vez de escribir en la vista
+        return df.assign(**{regla.nombre: regla.limpiar(df[regla.nombre]) for regla in self._despues})
+
+    def finalizar(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.drop(self.descartar, axis=1, errors='ignore')
+        for col, dtype in self._dtypes.items():
+            df[col] = df[col].astype(dtype)
+        return df
+
+    def limpiar(self, df: pd.DataFrame, ids: dict = None, estado: EstadoChunks = None) -> pd.DataFrame:
+        df, filtro = self.filtrar(df, ids, estado)
+        return self.finalizar(self.completar(df, filtro))
@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentacion import en_etapa
+
+
+# -----------------------
+# E/S solapada con la limpieza
+# -----------------------
+class EntradaSalidaSolapada:
+    """
+    Lee y escribe tablas en hilos aparte mientras el hilo principal limpia:
+    mientras se limpia una tabla, un hilo ya lee el CSV crudo de la siguiente
+    (en el orden de `lecturas`) y otro escribe (y carga) la anterior. Así la
+    corrida tiende a max(lectura, limpieza, escritura) en vez de la suma.
+
+    La limpieza sigue en el hilo principal y en el orden del grafo, así que
+    los IDs válidos se siguen pasando como antes; las escrituras corren en
+    un solo hilo en el orden en que se envían (la carga respeta las FKs).
+
+    `capacidad` acota la memoria: tablas crudas leídas por adelantado sin
+    consumir y tablas limpias esperando su escritura, como máximo cada una.
+
+        with EntradaSalidaSolapada({"orders": leer_orders, ...}) as es:
+            df = es.leer("orders")
+            es.escribir("orders", guardar, limpio)
+    """
+
+    def __init__(self, lecturas: dict, capacidad: int = 1):
+        self._lecturas = dict(lecturas)
+        self._orden = list(self._lecturas)
+        self._capacidad = max(1, capacidad)
+        self._leidas = {}
+        self._lector = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lectura")
+        self._escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escritura")
+        self._lugares = threading.BoundedSemaphore(self._capacidad)
+        self._escrituras = []
+
+    def __enter__(self):
+        self._anticipar()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        # Con un error en la limpieza no se espera lo que quedaba por leer
+        for futuro in self._leidas.values():
+            futuro.cancel()
+        self._lector.shutdown(wait=True)
+        try:
+            if tipo is None:
+                self.esperar()
+        finally:
+            self._escritor.shutdown(wait=True)
+        return False
+
+    def leidas_por_adelantado(self, nombre: str) -> bool:
+        return nombre in self._lecturas
+
+    def _anticipar(self):
+        """Lanza las próximas lecturas hasta tener `capacidad` tablas en curso o sin consumir."""
+        while self._orden and len(self._leidas) < self._capacidad:
+            nombre = self._orden.pop(0)
+            self._leidas[nombre] = self._lector.submit(self._leer, nombre, self._lecturas[nombre])
+
+    @staticmethod
+    def _leer(nombre, funcion):
+        with en_etapa(nombre):
+            return funcion()
+
+    def leer(self, nombre: str):
+        """Tabla cruda `nombre` (espera si todavía se está leyendo) y lanza la lectura de la siguiente."""
+        if nombre not in self._leidas:
+            # Se pidió fuera de orden: se lee ya, salteando las anteriores
+            self._orden.remove(nombre)
+            self._leidas[nombre] = self._lector.submit(self._leer, nombre, self._lecturas[nombre])
+        futuro = self._leidas.pop(nombre)
+        self._anticipar()
+        return futuro.result()
+
+    def escribir(self, nombre: str, funcion, *args):
+        """
+        Corre `funcion(*args)` en el hilo de escritura, midiendo sus pasos en
+        la etapa `nombre`. Espera si ya hay `capacidad` escrituras pendientes.
+        """
+        self._revisar_errores()
+        self._lugares.acquire()
+
+        def escribir():
+            try:
+                with en_etapa(nombre):
+                    return funcion(*args)
+            finally:
+                self._lugares.release()
+
+        self._escrituras.append(self._escritor.submit(escribir))
+
+    def _revisar_errores(self):
+        """Propaga el error de una escritura ya terminada (sin esperar a las demás)."""
+        for futuro in self._escrituras:
+            if futuro.done() and futuro.exception() is not None:
+                raise futuro.exception()
+        self._escrituras = [f for f in self._escrituras if not f.done()]
+
+    def esperar(self):
+        """Espera a que terminen todas las escrituras enviadas (propaga el primer error)."""
+        for futuro in self._escrituras:
+            futuro.result()
+        self._escrituras = []
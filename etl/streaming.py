@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from claves import IndiceClaves
+from duplicados import ClavesVistas
+from fechas import FormatosFecha
+from instrumentacion import Paso, medido, medir_lectura, sin_conteos
+
+
+# -----------------------
+# Deduplicación entre chunks
+# -----------------------
+class EstadoChunks:
+    """
+    Estado que una tabla arrastra entre chunks: claves ya vistas para deduplicar,
+    formatos de fecha fijados por columna y modas de zip code globales.
+    Con entre_chunks=False no guarda claves (cada parte deduplica sola).
+    Con `huerfanas` (dict, modo incremental) junta además los valores de FK
+    rechazados por columna, para revisarlos cuando lleguen claves del padre.
+    """
+
+    def __init__(self, modas_zip=None, entre_chunks: bool = True, formatos_fijados: dict = None,
+                 huerfanas: dict = None):
+        self.claves_vistas = ClavesVistas() if entre_chunks else None
+        self.modas_zip = modas_zip
+        self._formatos_fecha = {
+            col: FormatosFecha(fijados) for col, fijados in (formatos_fijados or {}).items()
+        }
+        self.huerfanas = huerfanas
+
+    def registrar_huerfanas(self, col: str, valores: pd.Series):
+        if self.huerfanas is not None:
+            self.huerfanas[col] = IndiceClaves(self.huerfanas.get(col, ())).unir(valores)
+
+    def formatos_fecha(self, col: str) -> FormatosFecha:
+        return self._formatos_fecha.setdefault(col, FormatosFecha())
+
+    @property
+    def formatos_por_columna(self) -> dict:
+        return dict(self._formatos_fecha)
+
+    def exportar(self) -> dict:
+        """Estado como datos simples, para guardarlo entre corridas (modo incremental)."""
+        return {
+            'claves': self.claves_vistas.hashes if self.claves_vistas is not None else None,
+            'formatos': {col: f.fijados for col, f in self._formatos_fecha.items()},
+            'modas_zip': self.modas_zip.exportar() if self.modas_zip is not None else {},
+            'huerfanas': self.huerfanas,
+        }
+
+    @classmethod
+    def desde(cls, datos: dict, modas_zip=None) -> "EstadoChunks":
+        """Reconstruye el estado exportado. Los conteos de zips los importa quien llama."""
+        estado = cls(modas_zip, formatos_fijados=datos['formatos'], huerfanas=dict(datos.get('huerfanas') or {}))
+        estado.claves_vistas = ClavesVistas(datos['claves'])
+        return estado
+
+
+@medido("deduplicar")
+def filas_nuevas(df: pd.DataFrame, subset=None, estado: EstadoChunks = None, filas: np.ndarray = None) -> np.ndarray:
+    """
+    Máscara de drop_duplicates(subset), extendido a los chunks anteriores si
+    hay estado. Con `filas` (posiciones) solo compite entre esas filas, como
+    si el resto ya se hubiera filtrado; las demás quedan en False.
+    """
+    claves = df if subset is None else df[[subset] if isinstance(subset, str) else list(subset)]
+    if filas is not None:
+        # Copia solo las columnas de la clave, no la tabla
+        claves = claves.iloc[filas]
+
+    if estado is None or estado.claves_vistas is None:
+        nuevas = ~claves.duplicated().to_numpy()
+    else:
+        nuevas = estado.claves_vistas.nuevas(claves)
+
+    if filas is None:
+        return nuevas
+    mascara = np.zeros(len(df), dtype=bool)
+    mascara[filas] = nuevas
+    return mascara
+
+
+# -----------------------
+# Ejecución por chunks
+# -----------------------
+def limpiar_en_chunks(path: Path, func, destino: Path, chunksize: int, args=(),
+                      id_col: str = None, modas_zip=None, dtype=None, **to_csv_kwargs):
+    """
+    Limpia un CSV crudo por chunks de `chunksize` filas y va agregando el
+    resultado a `destino`, sin tener la tabla completa en memoria.
+
+    Si la tabla imputa zip codes (`modas_zip`), se hace una primera pasada
+    que solo acumula los conteos de zips para que las modas sean globales.
+
+    `dtype` son los tipos de lectura del CSV crudo (por columna).
+
+    Devuelve (filas leídas, filas escritas, IndiceClaves de los `id_col` escritos).
+    """
+    if modas_zip is not None:
+        estado = EstadoChunks(modas_zip)
+        with sin_conteos():
+            for chunk in medir_lectura("read_csv", pd.read_csv(path, chunksize=chunksize, dtype=dtype)):
+                func(chunk, *args, estado=estado)
+        modas_zip.cerrar()
+
+    estado = EstadoChunks(modas_zip)
+
+    filas_leidas = 0
+    filas_escritas = 0
+    ids = []
+
+    for i, chunk in enumerate(medir_lectura("read_csv", pd.read_csv(path, chunksize=chunksize, dtype=dtype))):
+        limpio = func(chunk, *args, estado=estado)
+
+        with Paso("to_csv", len(limpio)):
+            limpio.to_csv(
+                destino,
+                mode='w' if i == 0 else 'a',
+                header=(i == 0),
+                index=False,
+                **to_csv_kwargs
+            )
+
+        filas_leidas += len(chunk)
+        filas_escritas += len(limpio)
+        if id_col is not None:
+            ids.append(IndiceClaves(limpio[id_col]))
+
+    return filas_leidas, filas_escritas, IndiceClaves.desde_partes(ids) if id_col is not None else None
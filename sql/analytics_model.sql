@@ -1,21 +1,48 @@
 -- =========================================
 -- ANALYTICS MODEL
--- Schema + Dimensions + Fact
+-- Schema + Dimensions + Fact + Rollups
 -- =========================================
 
+-- Las tablas pesadas (fact, dimensiones con agregados y rollups diarios) son
+-- vistas materializadas con índices: los dashboards leen datos ya calculados
+-- en lugar de recalcular los joins y agregados en cada carga. El ETL las
+-- refresca después de cada carga (etl/clean_pipeline.py --load).
+
 -- -------------------------
 -- Schema
 -- -------------------------
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+-- El modelo se puede re-ejecutar: borra solo las vistas que define este
+-- archivo, comunes o materializadas según cómo existan hoy (otras vistas del
+-- schema y las tablas, p. ej. kpi_cube, no se tocan)
+DO $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT c.relname, c.relkind
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'analytics' AND c.relkind IN ('v', 'm')
+          AND c.relname IN (
+              'fact_order_items', 'dim_time', 'dim_product', 'dim_payment', 'dim_zip_codes',
+              'daily_sales', 'daily_totals', 'dim_customer', 'dim_seller', 'dim_order'
+          )
+    LOOP
+        EXECUTE format(
+            'DROP %s IF EXISTS analytics.%I CASCADE',
+            CASE r.relkind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+            r.relname
+        );
+    END LOOP;
+END $$;
+
 -- =====================================================
 -- DIMENSIÓN: ZIP CODES
 -- Grain: 1 row = 1 zip code prefix
 -- =====================================================
-
-CREATE SCHEMA IF NOT EXISTS analytics;
-
-DROP VIEW IF EXISTS analytics.dim_zip_codes CASCADE;
-
-CREATE OR REPLACE VIEW analytics.dim_zip_codes AS
+CREATE MATERIALIZED VIEW analytics.dim_zip_codes AS
 SELECT
     geolocation_zip_code_prefix                          AS zip_code_prefix,
     ROUND(AVG(geolocation_lat)::numeric, 6)             AS avg_lat,
@@ -26,10 +53,14 @@ SELECT
 FROM geolocation_clean
 GROUP BY geolocation_zip_code_prefix;
 
+-- Los índices únicos permiten REFRESH ... CONCURRENTLY (sin bloquear lecturas;
+-- recalcula la vista entera, no es incremental)
+CREATE UNIQUE INDEX ux_dim_zip_codes ON analytics.dim_zip_codes (zip_code_prefix);
+
 -- -------------------------
 -- Dimension: Time
 -- -------------------------
-CREATE OR REPLACE VIEW analytics.dim_time AS
+CREATE MATERIALIZED VIEW analytics.dim_time AS
 SELECT DISTINCT
     DATE(o.order_purchase_timestamp)                 AS date,
     EXTRACT(YEAR FROM o.order_purchase_timestamp)    AS year,
@@ -40,6 +71,9 @@ SELECT DISTINCT
 FROM orders_clean o
 WHERE o.order_purchase_timestamp IS NOT NULL;
 
+CREATE UNIQUE INDEX ux_dim_time ON analytics.dim_time (date);
+CREATE INDEX ix_dim_time_year_month ON analytics.dim_time (year_month);
+
 -- -------------------------
 -- Dimension: Customer
 -- -------------------------
@@ -54,7 +88,7 @@ FROM customers_clean;
 -- -------------------------
 -- Dimension: Product
 -- -------------------------
-CREATE OR REPLACE VIEW analytics.dim_product AS
+CREATE MATERIALIZED VIEW analytics.dim_product AS
 SELECT
     p.product_id,
     p.product_category_name,
@@ -67,6 +101,9 @@ FROM products_clean p
 LEFT JOIN categories_clean ct
   ON p.product_category_name = ct.product_category_name;
 
+CREATE UNIQUE INDEX ux_dim_product ON analytics.dim_product (product_id);
+CREATE INDEX ix_dim_product_category ON analytics.dim_product (product_category_name_english);
+
 -- -------------------------
 -- Dimension: Seller
 -- -------------------------
@@ -96,7 +133,7 @@ FROM orders_clean;
 -- Dimension: Payment
 -- Grain: 1 row = 1 order
 -- -------------------------
-CREATE OR REPLACE VIEW analytics.dim_payment AS
+CREATE MATERIALIZED VIEW analytics.dim_payment AS
 SELECT
     order_id,
     STRING_AGG(DISTINCT payment_type, ', ') AS payment_type,
@@ -104,11 +141,13 @@ SELECT
 FROM payments_clean
 GROUP BY order_id;
 
+CREATE UNIQUE INDEX ux_dim_payment ON analytics.dim_payment (order_id);
+
 -- -------------------------
 -- Fact: Order Items
 -- Grain: 1 row = 1 item sold
 -- -------------------------
-CREATE OR REPLACE VIEW analytics.fact_order_items AS
+CREATE MATERIALIZED VIEW analytics.fact_order_items AS
 SELECT
     -- Keys
     oi.order_id,
@@ -132,3 +171,52 @@ SELECT
 FROM order_items_clean oi
 JOIN orders_clean o
   ON oi.order_id = o.order_id;
+
+-- El índice único empieza por order_id: sirve también para los joins por orden
+CREATE UNIQUE INDEX ux_fact_order_items ON analytics.fact_order_items (order_id, order_item_id);
+CREATE INDEX ix_fact_order_items_purchase_date ON analytics.fact_order_items (purchase_date);
+CREATE INDEX ix_fact_order_items_product_id ON analytics.fact_order_items (product_id);
+CREATE INDEX ix_fact_order_items_customer_id ON analytics.fact_order_items (customer_id);
+
+-- =====================================================
+-- ROLLUP: VENTAS DIARIAS
+-- Grain: 1 row = 1 día x categoría x estado del cliente
+-- orders cuenta órdenes distintas dentro de la celda: una orden con
+-- ítems de varias categorías aparece en cada una (no sumar entre categorías)
+-- =====================================================
+CREATE MATERIALIZED VIEW analytics.daily_sales AS
+SELECT
+    f.purchase_date                     AS date,
+    p.product_category_name_english     AS category,
+    c.customer_state,
+    SUM(f.total_item_value)             AS revenue,
+    SUM(f.freight_value)                AS freight,
+    COUNT(*)                            AS items,
+    COUNT(DISTINCT f.order_id)          AS orders
+FROM analytics.fact_order_items f
+LEFT JOIN analytics.dim_product p
+  ON f.product_id = p.product_id
+LEFT JOIN customers_clean c
+  ON f.customer_id = c.customer_id
+GROUP BY 1, 2, 3;
+
+CREATE UNIQUE INDEX ux_daily_sales ON analytics.daily_sales (date, category, customer_state);
+CREATE INDEX ix_daily_sales_category ON analytics.daily_sales (category, date);
+CREATE INDEX ix_daily_sales_state ON analytics.daily_sales (customer_state, date);
+
+-- =====================================================
+-- ROLLUP: TOTALES DIARIOS
+-- Grain: 1 row = 1 día
+-- Una orden tiene una sola fecha de compra: orders se puede sumar entre días
+-- =====================================================
+CREATE MATERIALIZED VIEW analytics.daily_totals AS
+SELECT
+    purchase_date                       AS date,
+    SUM(total_item_value)               AS revenue,
+    SUM(freight_value)                  AS freight,
+    COUNT(*)                            AS items,
+    COUNT(DISTINCT order_id)            AS orders
+FROM analytics.fact_order_items
+GROUP BY purchase_date;
+
+CREATE UNIQUE INDEX ux_daily_totals ON analytics.daily_totals (date);
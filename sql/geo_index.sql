@@ -0,0 +1,63 @@
+-- =========================================
+-- GEO INDEX
+-- Centroides por prefijo de zip code y por estado
+-- Los genera y carga el ETL (etl/geografia.py) después de la limpieza
+-- =========================================
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+DROP TABLE IF EXISTS analytics.zip_centroids;
+DROP TABLE IF EXISTS analytics.state_centroids;
+
+-- Grain: 1 row = 1 zip code prefix (mismas columnas que analytics.dim_zip_codes)
+CREATE TABLE analytics.zip_centroids (
+    zip_code_prefix INTEGER PRIMARY KEY,
+    avg_lat NUMERIC,
+    avg_lng NUMERIC,
+    city TEXT,                -- MODE() de geolocation_city
+    state TEXT,               -- MODE() de geolocation_state
+    total_locations INTEGER
+);
+
+-- Grain: 1 row = 1 estado (punto del estado en el mapa de los dashboards)
+CREATE TABLE analytics.state_centroids (
+    state TEXT PRIMARY KEY,
+    avg_lat NUMERIC,          -- promedio de todos los puntos de geolocation del estado
+    avg_lng NUMERIC,
+    zip_code_prefixes INTEGER,
+    total_locations INTEGER
+);
+
+CREATE INDEX ix_zip_centroids_state ON analytics.zip_centroids (state);
+
+-- Puntos iniciales (capital de cada estado) para que los mapas de
+-- sql/metrics_final.sql funcionen antes de la primera corrida con --load,
+-- que los reemplaza por los centroides de geolocation
+INSERT INTO analytics.state_centroids (state, avg_lat, avg_lng, zip_code_prefixes, total_locations) VALUES
+    ('AC', -9.97499, -67.8243, NULL, NULL),
+    ('AL', -9.66599, -35.7350, NULL, NULL),
+    ('AM', -3.11903, -60.0217, NULL, NULL),
+    ('AP', 0.03493, -51.0694, NULL, NULL),
+    ('BA', -12.9714, -38.5014, NULL, NULL),
+    ('CE', -3.71722, -38.5434, NULL, NULL),
+    ('DF', -15.79389, -47.88278, NULL, NULL),
+    ('ES', -20.3155, -40.3128, NULL, NULL),
+    ('GO', -16.6864, -49.2643, NULL, NULL),
+    ('MA', -2.52972, -44.3028, NULL, NULL),
+    ('MG', -19.9167, -43.9345, NULL, NULL),
+    ('MS', -20.4697, -54.6201, NULL, NULL),
+    ('MT', -15.6010, -56.0974, NULL, NULL),
+    ('PA', -1.45583, -48.4898, NULL, NULL),
+    ('PB', -7.1195, -34.8641, NULL, NULL),
+    ('PE', -8.04756, -34.8770, NULL, NULL),
+    ('PI', -5.08921, -42.8016, NULL, NULL),
+    ('PR', -25.4284, -49.2733, NULL, NULL),
+    ('RJ', -22.9068, -43.1729, NULL, NULL),
+    ('RN', -5.79448, -35.2110, NULL, NULL),
+    ('RO', -8.76077, -63.8999, NULL, NULL),
+    ('RR', 2.82384, -60.6753, NULL, NULL),
+    ('RS', -30.0346, -51.2177, NULL, NULL),
+    ('SC', -27.5954, -48.5480, NULL, NULL),
+    ('SE', -10.9472, -37.0731, NULL, NULL),
+    ('SP', -23.5505, -46.6333, NULL, NULL),
+    ('TO', -10.2491, -48.3243, NULL, NULL);
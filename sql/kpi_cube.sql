@@ -0,0 +1,38 @@
+-- =========================================
+-- KPI CUBE
+-- Grain: 1 row = 1 día x categoría x estado del cliente x tipo de pago
+-- La genera y carga el ETL (etl/cubo.py) después de la limpieza
+-- =========================================
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+DROP TABLE IF EXISTS analytics.kpi_cube;
+
+CREATE TABLE analytics.kpi_cube (
+    date DATE,
+    category TEXT,
+    customer_state TEXT,
+    payment_type TEXT,        -- 'no_payments': orden sin filas en payments
+
+    -- Measures (aditivas: se suman con cualquier filtro)
+    revenue NUMERIC,          -- SUM(total_item_value)
+    freight NUMERIC,          -- SUM(freight_value)
+    items INTEGER,            -- COUNT(*) de ítems
+
+    -- Aditivas con cualquier filtro salvo categoría (una orden puede tener
+    -- ítems de varias): por categoría usar las category_* de abajo
+    orders INTEGER,           -- órdenes, cada una contada en la celda de su primer ítem
+    freight_orders INTEGER,   -- órdenes con algún freight_value informado
+    customers INTEGER,        -- clientes, cada uno contado una vez por día
+
+    -- Exactas filtrando o agrupando por categoría: cada orden se cuenta una
+    -- vez en cada categoría en la que tiene ítems (sumadas entre categorías
+    -- cuentan de más)
+    category_orders INTEGER,
+    category_freight_orders INTEGER  -- con algún freight_value informado en la categoría
+);
+
+CREATE INDEX ix_kpi_cube_date ON analytics.kpi_cube (date);
+CREATE INDEX ix_kpi_cube_category ON analytics.kpi_cube (category, date);
+CREATE INDEX ix_kpi_cube_state ON analytics.kpi_cube (customer_state, date);
+CREATE INDEX ix_kpi_cube_payment_type ON analytics.kpi_cube (payment_type, date);
@@ -0,0 +1,253 @@
+-- =========================================
+-- MÉTRICAS SOBRE EL CUBO DE KPIs
+-- Mismas consultas que sql/metrics_final.sql, leyendo analytics.kpi_cube
+-- (sql/kpi_cube.sql) en lugar de recorrer analytics.fact_order_items.
+-- Los filtros de fecha de Metabase (fecha / fecha_compra) se mapean a
+-- analytics.kpi_cube.date.
+-- "Estado de las Órdenes" no está acá: order_status no es dimensión del
+-- cubo y esa consulta sigue sobre analytics.fact_order_items.
+-- Órdenes por categoría: orders y freight_orders cuentan cada orden una
+-- sola vez (en la categoría de su primer ítem), así que con un filtro o un
+-- GROUP BY de category se usan category_orders y category_freight_orders.
+-- customers no tiene versión por categoría.
+-- =========================================
+
+-- =========================================
+-- KPI: Ingresos Totales
+-- Grano: agregado total
+-- Tabla fuente: analytics.kpi_cube
+-- Filtro Metabase: fecha_compra
+-- =========================================
+
+SELECT
+  SUM(revenue) AS total_revenue
+FROM analytics.kpi_cube
+WHERE {{fecha_compra}};
+
+-- =========================================
+-- KPI: Total de Órdenes
+-- Cada orden está contada una sola vez en el cubo: se suma
+-- Grano: agregado total
+-- Tabla fuente: analytics.kpi_cube
+-- Filtro Metabase: fecha_compra
+-- =========================================
+
+SELECT
+  SUM(orders) AS total_orders
+FROM analytics.kpi_cube
+WHERE {{fecha_compra}};
+
+-- =========================================
+-- KPI: Ticket Promedio
+-- Fórmula: ingresos totales / cantidad de órdenes
+-- Grano: agregado total
+-- Tabla fuente: analytics.kpi_cube
+-- Filtro Metabase: fecha_compra
+-- =========================================
+
+SELECT
+  SUM(revenue)
+  / NULLIF(SUM(orders), 0) AS avg_ticket
+FROM analytics.kpi_cube
+WHERE {{fecha_compra}};
+
+-- =========================================
+-- Tendencias: Cantidad Total de Ítems Vendidos
+-- Grano: agregado total
+-- Tabla fuente: analytics.kpi_cube
+-- Filtro Metabase: fecha
+-- =========================================
+
+SELECT
+    SUM(items) AS cantidad_items
+FROM analytics.kpi_cube
+WHERE 1=1
+[[AND {{fecha}}]];
+
+-- =========================================
+-- KPI: Costo Promedio de Envío por Orden
+-- Fórmula: freight total / órdenes con freight informado
+-- (igual que el AVG por orden del original, que ignora órdenes sin freight)
+-- Tabla fuente: analytics.kpi_cube
+-- Filtro Metabase: fecha_compra
+-- =========================================
+
+SELECT
+  ROUND(
+    SUM(freight) / NULLIF(SUM(freight_orders), 0),
+    2
+  ) AS avg_shipping_cost_per_order
+FROM analytics.kpi_cube
+WHERE {{fecha_compra}};
+
+-- =========================================
+-- Tendencia: Ingresos por Categoría
+-- Dimensión: categoría de producto
+-- Permite filtro por categoría específica.
+-- =========================================
+
+SELECT
+  category,
+  SUM(revenue) AS total_revenue
+FROM analytics.kpi_cube
+WHERE 1=1
+[[ AND {{fecha}} ]]
+[[ AND category = {{categoria}} ]]
+GROUP BY category
+ORDER BY total_revenue DESC;
+
+-- =========================================
+-- Tendencia: Órdenes por Categoría
+-- Dimensión: categoría de producto
+-- Una orden con ítems de varias categorías cuenta en cada una
+-- =========================================
+
+SELECT
+  category,
+  SUM(category_orders) AS total_orders,
+  ROUND(SUM(freight) / NULLIF(SUM(category_freight_orders), 0), 2) AS avg_shipping_cost_per_order
+FROM analytics.kpi_cube
+WHERE 1=1
+[[ AND {{fecha}} ]]
+[[ AND category = {{categoria}} ]]
+GROUP BY category
+ORDER BY total_orders DESC;
+
+-- =========================================
+-- Tendencia: Ingresos en el Tiempo
+-- Dimensión temporal: year_month
+-- =========================================
+
+SELECT
+  TO_CHAR(date, 'YYYY-MM') AS year_month,
+  SUM(revenue) AS total_revenue
+FROM analytics.kpi_cube
+WHERE date IS NOT NULL
+  AND {{fecha_compra}}
+GROUP BY 1
+ORDER BY 1;
+
+-- =========================================
+-- Tendencia: Órdenes en el Tiempo
+-- Dimensión temporal: year_month
+-- =========================================
+
+SELECT
+  TO_CHAR(date, 'YYYY-MM') AS year_month,
+  SUM(orders) AS total_orders
+FROM analytics.kpi_cube
+WHERE date IS NOT NULL
+  AND {{fecha_compra}}
+GROUP BY 1
+ORDER BY 1;
+
+-- =========================================
+-- Tendencia: Costo de Envío en el Tiempo
+-- Dimensión temporal: year_month
+-- =========================================
+
+SELECT
+  TO_CHAR(date, 'YYYY-MM') AS year_month,
+  SUM(freight) AS total_shipping_cost
+FROM analytics.kpi_cube
+WHERE date IS NOT NULL
+  AND {{fecha_compra}}
+GROUP BY 1
+ORDER BY 1;
+
+-- =========================================
+-- Rankings: Top 10 Categorías por Ingresos
+-- =========================================
+
+SELECT
+    category AS categoria,
+    SUM(revenue) AS ingresos_totales
+FROM analytics.kpi_cube
+WHERE 1=1
+  [[AND {{fecha}}]]
+GROUP BY category
+ORDER BY ingresos_totales DESC
+LIMIT 10;
+
+-- =========================================
+-- Rankings: Ingresos por Tipo de Pago
+-- payment_type es la combinación de tipos de la orden, como dim_payment;
+-- las órdenes sin pagos ('no_payments') quedan afuera, como en el JOIN original
+-- =========================================
+
+SELECT
+    payment_type AS tipo_pago,
+    SUM(revenue) AS ingresos_totales
+FROM analytics.kpi_cube
+WHERE payment_type IS DISTINCT FROM 'no_payments'
+  [[AND {{fecha}}]]
+GROUP BY payment_type
+ORDER BY ingresos_totales DESC;
+
+-- =========================================
+-- Rankings: Costo Total de Envío por Estado
+-- Dimensión geográfica: estado del cliente
+-- =========================================
+
+SELECT
+    CASE customer_state
+        WHEN 'AC' THEN 'Acre'
+        WHEN 'AL' THEN 'Alagoas'
+        WHEN 'AP' THEN 'Amapá'
+        WHEN 'AM' THEN 'Amazonas'
+        WHEN 'BA' THEN 'Bahia'
+        WHEN 'CE' THEN 'Ceará'
+        WHEN 'DF' THEN 'Distrito Federal'
+        WHEN 'ES' THEN 'Espírito Santo'
+        WHEN 'GO' THEN 'Goiás'
+        WHEN 'MA' THEN 'Maranhão'
+        WHEN 'MT' THEN 'Mato Grosso'
+        WHEN 'MS' THEN 'Mato Grosso do Sul'
+        WHEN 'MG' THEN 'Minas Gerais'
+        WHEN 'PA' THEN 'Pará'
+        WHEN 'PB' THEN 'Paraíba'
+        WHEN 'PR' THEN 'Paraná'
+        WHEN 'PE' THEN 'Pernambuco'
+        WHEN 'PI' THEN 'Piauí'
+        WHEN 'RJ' THEN 'Rio de Janeiro'
+        WHEN 'RN' THEN 'Rio Grande do Norte'
+        WHEN 'RS' THEN 'Rio Grande do Sul'
+        WHEN 'RO' THEN 'Rondônia'
+        WHEN 'RR' THEN 'Roraima'
+        WHEN 'SC' THEN 'Santa Catarina'
+        WHEN 'SE' THEN 'Sergipe'
+        WHEN 'SP' THEN 'São Paulo'
+        WHEN 'TO' THEN 'Tocantins'
+        ELSE 'No informado'
+    END AS estado,
+    SUM(freight) AS costo_envio_total
+FROM analytics.kpi_cube
+WHERE 1=1
+  [[AND {{fecha}}]]
+GROUP BY customer_state
+ORDER BY costo_envio_total DESC
+LIMIT 15;
+
+-- =========================================
+-- Segmentacion: Ingresos por Estado (Mapa)
+-- ticket_promedio es el promedio por ítem, como el AVG(total_item_value) original
+-- cantidad_clientes suma clientes por día: un cliente que compra en varios
+-- días del período se cuenta en cada uno (en Olist cada orden tiene su
+-- propio customer_id, así que coincide con el COUNT(DISTINCT) original)
+-- =========================================
+
+SELECT
+    customer_state AS estado,
+    SUM(customers) AS cantidad_clientes,
+    SUM(orders) AS ordenes,
+    SUM(revenue) AS ingresos_totales,
+    ROUND(SUM(revenue) / NULLIF(SUM(items), 0), 2) AS ticket_promedio,
+    sc.avg_lat AS latitud,
+    sc.avg_lng AS longitud
+FROM analytics.kpi_cube
+-- Centro de cada estado según geolocation (lo arma el ETL: etl/geografia.py)
+LEFT JOIN analytics.state_centroids sc
+    ON sc.state = analytics.kpi_cube.customer_state
+WHERE 1=1 [[AND {{fecha}}]]
+GROUP BY customer_state, sc.avg_lat, sc.avg_lng
+ORDER BY ingresos_totales DESC;
@@ -287,68 +287,16 @@ SELECT
     COUNT(DISTINCT analytics.fact_order_items.order_id) AS ordenes,
     SUM(analytics.fact_order_items.total_item_value) AS ingresos_totales,
     ROUND(AVG(analytics.fact_order_items.total_item_value), 2) AS ticket_promedio,
-    CASE analytics.dim_customer.customer_state
-        WHEN 'AC' THEN -9.97499
-        WHEN 'AL' THEN -9.66599
-        WHEN 'AP' THEN 0.03493
-        WHEN 'AM' THEN -3.11903
-        WHEN 'BA' THEN -12.9714
-        WHEN 'CE' THEN -3.71722
-        WHEN 'DF' THEN -15.79389
-        WHEN 'ES' THEN -20.3155
-        WHEN 'GO' THEN -16.6864
-        WHEN 'MA' THEN -2.52972
-        WHEN 'MT' THEN -15.6010
-        WHEN 'MS' THEN -20.4697
-        WHEN 'MG' THEN -19.9167
-        WHEN 'PA' THEN -1.45583
-        WHEN 'PB' THEN -7.1195
-        WHEN 'PR' THEN -25.4284
-        WHEN 'PE' THEN -8.04756
-        WHEN 'PI' THEN -5.08921
-        WHEN 'RJ' THEN -22.9068
-        WHEN 'RN' THEN -5.79448
-        WHEN 'RS' THEN -30.0346
-        WHEN 'RO' THEN -8.76077
-        WHEN 'RR' THEN 2.82384
-        WHEN 'SC' THEN -27.5954
-        WHEN 'SE' THEN -10.9472
-        WHEN 'SP' THEN -23.5505
-        WHEN 'TO' THEN -10.2491
-    END AS latitud,
-    CASE analytics.dim_customer.customer_state
-        WHEN 'AC' THEN -67.8243
-        WHEN 'AL' THEN -35.7350
-        WHEN 'AP' THEN -51.0694
-        WHEN 'AM' THEN -60.0217
-        WHEN 'BA' THEN -38.5014
-        WHEN 'CE' THEN -38.5434
-        WHEN 'DF' THEN -47.88278
-        WHEN 'ES' THEN -40.3128
-        WHEN 'GO' THEN -49.2643
-        WHEN 'MA' THEN -44.3028
-        WHEN 'MT' THEN -56.0974
-        WHEN 'MS' THEN -54.6201
-        WHEN 'MG' THEN -43.9345
-        WHEN 'PA' THEN -48.4898
-        WHEN 'PB' THEN -34.8641
-        WHEN 'PR' THEN -49.2733
-        WHEN 'PE' THEN -34.8770
-        WHEN 'PI' THEN -42.8016
-        WHEN 'RJ' THEN -43.1729
-        WHEN 'RN' THEN -35.2110
-        WHEN 'RS' THEN -51.2177
-        WHEN 'RO' THEN -63.8999
-        WHEN 'RR' THEN -60.6753
-        WHEN 'SC' THEN -48.5480
-        WHEN 'SE' THEN -37.0731
-        WHEN 'SP' THEN -46.6333
-        WHEN 'TO' THEN -48.3243
-    END AS longitud
+    sc.avg_lat AS latitud,
+    sc.avg_lng AS longitud
 FROM analytics.fact_order_items
 JOIN analytics.dim_customer
     ON analytics.fact_order_items.customer_id = analytics.dim_customer.customer_id
+-- Centro de cada estado: sql/geo_index.sql la crea con puntos iniciales y el
+-- ETL (etl/geografia.py) la reemplaza por los de geolocation con --load
+LEFT JOIN analytics.state_centroids sc
+    ON sc.state = analytics.dim_customer.customer_state
 WHERE 1=1 [[AND {{fecha}}]]
-GROUP BY analytics.dim_customer.customer_state
+GROUP BY analytics.dim_customer.customer_state, sc.avg_lat, sc.avg_lng
 ORDER BY ingresos_totales DESC;
 
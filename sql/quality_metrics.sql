@@ -0,0 +1,26 @@
+-- =========================================
+-- QUALITY METRICS
+-- Filas afectadas por cada regla de limpieza en cada corrida del ETL
+-- Las agrega el ETL (etl/calidad.py) al final de cada corrida con --load
+-- =========================================
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+-- Grain: 1 row = 1 corrida x tabla x columna x regla x acción
+-- No se borra entre corridas: es la historia de las tasas de suciedad
+CREATE TABLE IF NOT EXISTS analytics.quality_metrics (
+    run_id TEXT NOT NULL,
+    run_at TIMESTAMP NOT NULL,
+    table_name TEXT NOT NULL,
+    column_name TEXT NOT NULL,    -- '*' = la fila entera
+    rule TEXT NOT NULL,
+    action TEXT NOT NULL,         -- descarta (la fila), anula, corrige o imputa (el valor)
+    rows_affected BIGINT NOT NULL,
+    rows_in BIGINT,               -- filas de entrada de la tabla en la corrida
+    affected_pct NUMERIC,
+    PRIMARY KEY (run_id, table_name, column_name, rule, action)
+);
+
+-- Evolución de una regla en el tiempo
+CREATE INDEX IF NOT EXISTS idx_quality_metrics_rule
+    ON analytics.quality_metrics (table_name, column_name, rule, run_at);
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Los módulos del ETL se importan como top-level, igual que al correr etl/clean_pipeline.py
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "etl"))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+
+@pytest.fixture(scope="session")
+def crudos(tmp_path_factory):
+    """CSV crudos generados con benchmarks/generar_datos.py (escala chica, misma suciedad)."""
+    import generar_datos
+
+    destino = tmp_path_factory.mktemp("raw")
+    generar_datos.generar(destino, escala=0.003, seed=7)
+    return destino
+
+
+def correr_pipeline(crudos: Path, destino: Path, *argv):
+    """Corre clean_pipeline.main sobre `crudos` escribiendo todo (tablas, reportes, cache) bajo `destino`."""
+    import clean_pipeline
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(clean_pipeline, "RAW_DIR", crudos)
+        mp.setattr(clean_pipeline, "CLEAN_DIR", destino / "clean")
+        mp.setattr(clean_pipeline, "REPORTS_DIR", destino / "reports")
+        mp.setattr(clean_pipeline, "CACHE_DIR", destino / "cache")
+        clean_pipeline.main(list(argv))
+    return destino / "clean"
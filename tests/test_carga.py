@@ -0,0 +1,171 @@
+import csv
+import re
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import carga
+from almacenamiento import FORMATO_FECHA_CSV
+from carga import TABLAS_CLEAN, _buffer_csv
+from conftest import correr_pipeline
+
+CLEAN_TABLES_SQL = Path(__file__).resolve().parents[1] / "sql" / "clean_tables.sql"
+
+
+def _columnas_ddl() -> dict:
+    """Columnas (nombre, tipo, NOT NULL) de cada public.{t}_clean, en el orden de sql/clean_tables.sql."""
+    sql = CLEAN_TABLES_SQL.read_text()
+    tablas = {}
+    for nombre, cuerpo in re.findall(r"CREATE TABLE public\.(\w+)_clean \((.*?)\n\);", sql, re.S):
+        tablas[nombre] = [
+            (col, tipo, bool(no_nulo))
+            for col, tipo, no_nulo in re.findall(r"^\s+(\w+) ([A-Z][A-Z ]*?)( NOT NULL)?,?$", cuerpo, re.M)
+        ]
+    return tablas
+
+
+@pytest.fixture(scope="module")
+def cargadas(crudos, tmp_path_factory):
+    """DataFrames tal como _guardar_tabla se los pasaría a cargar_tabla, sin conectarse a Postgres."""
+    import clean_pipeline
+
+    tablas = {}
+    guardar = clean_pipeline._guardar_tabla
+
+    def capturar(df_clean, name, formato="csv", cargar=False):
+        tablas[name] = df_clean
+        guardar(df_clean, name, formato, cargar)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(clean_pipeline, "_guardar_tabla", capturar)
+        correr_pipeline(crudos, tmp_path_factory.mktemp("carga"))
+    return tablas
+
+
+def _leer_como(valores: pd.Series, tipo: str) -> pd.Series:
+    """Convierte los campos del CSV como lo haría COPY a una columna del tipo dado."""
+    presentes = valores[valores != ""]
+    if tipo == "BIGINT":
+        assert presentes.str.fullmatch(r"-?\d+").all(), presentes[~presentes.str.fullmatch(r"-?\d+")].head()
+        return pd.to_numeric(valores.replace("", None)).astype("Int64")
+    if tipo in ("NUMERIC", "DOUBLE PRECISION"):
+        return pd.to_numeric(valores.replace("", None), errors="raise").astype("float64")
+    if tipo == "TIMESTAMP":
+        return pd.to_datetime(valores.replace("", None), format=FORMATO_FECHA_CSV)
+    return valores.replace("", None)
+
+
+def test_el_ddl_tiene_todas_las_tablas_clean():
+    assert sorted(_columnas_ddl()) == sorted(TABLAS_CLEAN)
+
+
+@pytest.mark.parametrize("nombre", TABLAS_CLEAN)
+def test_buffer_csv_respeta_orden_y_tipos_de_clean_tables(cargadas, nombre):
+    columnas = _columnas_ddl()[nombre]
+    df = cargadas[nombre]
+
+    # COPY va por posición (los nombres pueden diferir: product_name_lenght del
+    # dataset original es product_name_length en el DDL)
+    assert len(df.columns) == len(columnas)
+
+    filas = list(csv.reader(_buffer_csv(df)))
+    assert len(filas) == len(df)
+    assert all(len(fila) == len(columnas) for fila in filas)
+
+    campos = pd.DataFrame(filas, dtype=object)
+    for i, (col, tipo, no_nulo) in enumerate(columnas):
+        leidos = _leer_como(campos[i], tipo)
+        if no_nulo:
+            assert leidos.notna().all(), f"{nombre}.{col} tiene nulos"
+
+        # Ida y vuelta: lo que leería Postgres es lo que había en el DataFrame
+        original = df.iloc[:, i].reset_index(drop=True)
+        if tipo == "TIMESTAMP":
+            original = pd.to_datetime(original).dt.floor("s")
+        elif tipo != "TEXT":
+            original = original.astype(leidos.dtype)
+        else:
+            original = original.astype(object).where(original.notna(), None).map(
+                lambda v: v if v is None else str(v)
+            )
+        pd.testing.assert_series_equal(leidos, original, check_names=False, check_dtype=tipo != "TEXT")
+
+
+# -----------------------
+# Carga en Postgres
+# -----------------------
+# Base aparte en el mismo servidor: --load reemplaza las tablas clean y no
+# debe tocar las de la base configurada
+BASE_DE_PRUEBA = "olist_test"
+
+
+@pytest.fixture(scope="module")
+def postgres():
+    """Conexión de carga.py a BASE_DE_PRUEBA con las tablas de sql/clean_tables.sql; se saltea sin Postgres."""
+    import psycopg2
+
+    try:
+        con = psycopg2.connect(**carga.config_postgres(), connect_timeout=3)
+        con.autocommit = True
+        with con.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (BASE_DE_PRUEBA,))
+            if cur.fetchone() is None:
+                cur.execute(f"CREATE DATABASE {BASE_DE_PRUEBA}")
+        con.close()
+    except psycopg2.Error as e:
+        pytest.skip(f"no Postgres to load into: {e}")
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("POSTGRES_DB", BASE_DE_PRUEBA)
+        mp.setattr(carga, "_CONEXIONES", {})
+        con = carga.conexion()
+        with con.cursor() as cur:
+            cur.execute(CLEAN_TABLES_SQL.read_text(encoding="utf-8"))
+        con.commit()
+        yield con
+        for abierta in carga._CONEXIONES.values():
+            abierta.close()
+
+
+def _filas_en_public(con) -> dict:
+    filas = {}
+    with con.cursor() as cur:
+        for t in TABLAS_CLEAN:
+            cur.execute(f"SELECT COUNT(*) FROM public.{t}_clean")
+            filas[t] = cur.fetchone()[0]
+    con.commit()
+    return filas
+
+
+def test_load_publica_las_tablas_limpias(postgres, crudos, tmp_path):
+    limpias = correr_pipeline(crudos, tmp_path, "--load")
+
+    esperadas = {t: len(pd.read_csv(limpias / f"{t}_clean.csv")) for t in TABLAS_CLEAN}
+    assert _filas_en_public(postgres) == esperadas
+    with postgres.cursor() as cur:
+        cur.execute("SELECT to_regnamespace(%s)", (carga.ESQUEMA_STAGING,))
+        assert cur.fetchone()[0] is None
+    postgres.commit()
+
+
+def test_copy_que_falla_deja_public_sin_cambios(postgres, crudos, tmp_path, monkeypatch):
+    import clean_pipeline
+
+    correr_pipeline(crudos, tmp_path / "antes", "--load")
+    antes = _filas_en_public(postgres)
+    assert all(antes.values())
+
+    cargar_tabla = clean_pipeline.cargar_tabla
+
+    def copy_roto(df, nombre, *args, **kwargs):
+        # Una columna de más: el COPY de payments falla en Postgres
+        if nombre == "payments":
+            df = df.assign(sobrante=1)
+        return cargar_tabla(df, nombre, *args, **kwargs)
+
+    monkeypatch.setattr(clean_pipeline, "cargar_tabla", copy_roto)
+    with pytest.raises(RuntimeError, match="Loading staging.payments_clean failed"):
+        correr_pipeline(crudos, tmp_path / "falla", "--load")
+
+    assert _filas_en_public(postgres) == antes
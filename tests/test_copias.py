@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import clean_pipeline
+from almacenamiento import tipos_crudos
+
+# Escribir en una vista sin copy-on-write es justo lo que estos tests buscan
+pytestmark = pytest.mark.filterwarnings("error::pandas.errors.SettingWithCopyWarning")
+
+
+@pytest.fixture(autouse=True)
+def sin_copy_on_write():
+    # Como al usar los clean_* como librería, sin el copy-on-write que activa main()
+    with pd.option_context("mode.copy_on_write", False):
+        yield
+
+
+@pytest.mark.parametrize("nombre", clean_pipeline.ETAPAS.orden)
+def test_clean_no_modifica_el_dataframe_de_quien_llama(crudos, nombre):
+    etapa = clean_pipeline.ETAPAS.etapas[nombre]
+    df = pd.read_csv(crudos / etapa.archivo, dtype=tipos_crudos(nombre))
+    antes = df.copy(deep=True)
+
+    etapa.funcion(df)
+
+    pd.testing.assert_frame_equal(df, antes)
+
+
+@pytest.mark.parametrize("con_modas", [False, True])
+def test_imputar_zip_code_no_modifica_el_dataframe_de_quien_llama(con_modas):
+    df = pd.DataFrame({
+        "zip": [1001.0, np.nan, -5.0, 1001.0, 2002.0, 0.0],
+        "city": ["a", "a", "a", "b", "b", "b"],
+        "state": ["SP", "SP", "SP", "RJ", "RJ", "RJ"],
+    })
+    antes = df.copy(deep=True)
+
+    modas = None
+    if con_modas:
+        modas = clean_pipeline.ModasZip()
+        clean_pipeline.imputar_zip_code(df, "zip", "city", "state", modas=modas)
+        modas.cerrar()
+    imputado = clean_pipeline.imputar_zip_code(df, "zip", "city", "state", modas=modas)
+
+    pd.testing.assert_frame_equal(df, antes)
+    assert imputado["zip"].tolist() == [1001.0, 1001.0, 1001.0, 1001.0, 2002.0, 1001.0]
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from cubo import construir_cubo
+
+
+def _tablas():
+    items = pd.DataFrame({
+        "order_id": ["o1", "o1", "o1", "o2", "o3"],
+        "order_item_id": [1, 2, 3, 1, 1],
+        "product_id": ["libro", "mesa", "libro", "mesa", "libro"],
+        "price": [10.0, 20.0, 30.0, 40.0, 50.0],
+        "freight_value": [1.0, np.nan, 2.0, np.nan, 3.0],
+    })
+    orders = pd.DataFrame({
+        "order_id": ["o1", "o2", "o3"],
+        "customer_id": ["c1", "c2", "c3"],
+        "order_purchase_timestamp": pd.to_datetime(["2018-01-01 10:00", "2018-01-01 11:00", "2018-01-02 09:00"]),
+    })
+    products = pd.DataFrame({"product_id": ["libro", "mesa"], "product_category_name": ["livros", "moveis"]})
+    categories = pd.DataFrame({
+        "product_category_name": ["livros", "moveis"],
+        "product_category_name_english": ["books", "furniture"],
+    })
+    customers = pd.DataFrame({"customer_id": ["c1", "c2", "c3"], "customer_state": ["SP", "SP", "RJ"]})
+    payments = pd.DataFrame({"order_id": ["o1", "o2", "o3"], "payment_type": ["boleto", "voucher", "boleto"]})
+    return items, orders, products, categories, customers, payments
+
+
+def test_ordenes_por_categoria_cuentan_cada_orden_con_items_de_la_categoria():
+    cubo = construir_cubo(*_tablas())
+    por_categoria = cubo.groupby("category")[["category_orders", "category_freight_orders"]].sum()
+
+    # o1 tiene ítems de las dos categorías: cuenta en ambas
+    assert por_categoria.loc["books"].tolist() == [2, 2]
+    # el único ítem de mesa de o1 no tiene flete, igual que el de o2
+    assert por_categoria.loc["furniture"].tolist() == [2, 0]
+
+
+def test_ordenes_sin_categoria_se_cuentan_una_vez():
+    cubo = construir_cubo(*_tablas())
+    assert cubo["orders"].sum() == 3
+    assert cubo["freight_orders"].sum() == 2
+    assert cubo["items"].sum() == 5
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import duplicados
+from duplicados import (
+    CiudadesCanonicas, ClavesVistas, claves_en_conflicto, fijar_memoria, hash_filas, valores_en_conflicto,
+)
+from normalizacion import normalizar_serie
+
+
+@pytest.fixture
+def sin_memoria(monkeypatch):
+    """--dedup-memory-mb 0: todo lo que pase por memoria se vuelca a disco."""
+    monkeypatch.setattr(duplicados, "MAX_HASHES_EN_MEMORIA", duplicados.MAX_HASHES_EN_MEMORIA)
+    fijar_memoria(0)
+
+
+def _clientes(filas=600, seed=3) -> pd.DataFrame:
+    """customer_id -> customer_unique_id con repetidos legítimos, nulos y un marcador compartido."""
+    rng = np.random.default_rng(seed)
+    claves = rng.integers(0, filas // 3, size=filas).astype(str)
+    df = pd.DataFrame({
+        "customer_id": np.char.add("c", claves),
+        # La identidad sale de la clave: las claves repetidas son el mismo cliente
+        "customer_unique_id": np.char.add("u", claves),
+    })
+    marcador = rng.choice(filas, size=40, replace=False)
+    df.loc[marcador, "customer_id"] = "FAKE_KEY_1"
+    df.loc[marcador, "customer_unique_id"] = [f"u_fake_{i}" for i in range(len(marcador))]
+    # Otra clave en conflicto, con espacios de más que quita la normalización
+    df.loc[[1, 2], ["customer_id", "customer_unique_id"]] = [[" c_doble ", "u_a"], ["c_doble", "u_b"]]
+    # Identidad nula: no cuenta como otra identidad
+    df.loc[[3, 4], ["customer_id", "customer_unique_id"]] = [["c_nula", "u_n"], ["c_nula", None]]
+    return df
+
+
+# -----------------------
+# ClavesVistas
+# -----------------------
+def _chunks(df: pd.DataFrame, n: int) -> list:
+    bordes = np.linspace(0, len(df), n + 1).astype(int)
+    return [df.iloc[desde:hasta] for desde, hasta in zip(bordes[:-1], bordes[1:])]
+
+
+def _mascara(df: pd.DataFrame, subset) -> tuple:
+    vistas = ClavesVistas()
+    return np.concatenate([vistas.nuevas(chunk, subset) for chunk in _chunks(df, 7)]), vistas
+
+
+@pytest.mark.parametrize("subset", [None, "customer_id"])
+def test_claves_vistas_volcadas_a_disco_dan_la_misma_mascara(monkeypatch, subset):
+    df = _clientes()
+    en_memoria, vistas = _mascara(df, subset)
+    assert not vistas._tramos
+    # Entre chunks deduplica igual que drop_duplicates sobre la tabla entera
+    assert (en_memoria == ~df.duplicated(subset=subset).to_numpy()).all()
+
+    monkeypatch.setattr(duplicados, "MAX_HASHES_EN_MEMORIA", duplicados.MAX_HASHES_EN_MEMORIA)
+    fijar_memoria(0)
+    en_disco, vistas = _mascara(df, subset)
+    # Cada chunk dejó un tramo en disco
+    assert len(vistas._tramos) == 7 and len(vistas._hashes) == 0
+    assert (en_disco == en_memoria).all()
+    assert len(vistas) == en_memoria.sum()
+
+
+# -----------------------
+# Claves en conflicto
+# -----------------------
+def _esperadas(df: pd.DataFrame) -> np.ndarray:
+    valores = valores_en_conflicto(normalizar_serie(df["customer_id"]), df["customer_unique_id"])
+    return np.sort(hash_filas(pd.DataFrame({"customer_id": valores})))
+
+
+def test_valores_en_conflicto_solo_claves_con_varias_identidades():
+    df = _clientes()
+    valores = valores_en_conflicto(normalizar_serie(df["customer_id"]), df["customer_unique_id"])
+    assert sorted(valores) == ["FAKE_KEY_1", "c_doble"]
+
+
+@pytest.mark.parametrize("forzar_cubetas", [False, True])
+def test_claves_en_conflicto_del_crudo_igual_que_en_memoria(tmp_path, request, forzar_cubetas):
+    if forzar_cubetas:
+        request.getfixturevalue("sin_memoria")
+    df = _clientes()
+    crudo = tmp_path / "customers.csv"
+    df.to_csv(crudo, index=False)
+
+    hashes = claves_en_conflicto(crudo, "customer_id", "customer_unique_id", chunksize=50)
+    assert len(hashes) == 2
+    assert (hashes == _esperadas(df)).all()
+
+
+# -----------------------
+# Ciudades canónicas
+# -----------------------
+def _conteos() -> pd.DataFrame:
+    return pd.DataFrame([
+        ("Sao Paulo", "SP", 500),
+        ("Sao Paulo - Sp", "SP", 3),
+        ("Belo Horizonte", "MG", 200),
+        ("Belo Horizont", "MG", 2),
+        ("Cidade 101", "SP", 20),
+        ("Cidade 1019", "SP", 10),
+    ], columns=["ciudad", "estado", "filas"])
+
+
+def test_ciudades_canonicas_juntan_escrituras_de_la_misma_ciudad():
+    ciudades = CiudadesCanonicas(_conteos())
+    assert ciudades.canonica("Sao Paulo - Sp", "SP") == "Sao Paulo"
+    assert ciudades.canonica("Belo Horizont", "MG") == "Belo Horizonte"
+    # Escrituras que no están en la referencia también se resuelven
+    assert ciudades.canonica("sao paulo / sao paulo", "SP") == "Sao Paulo"
+    # Solo dentro del mismo estado
+    assert ciudades.canonica("Belo Horizont", "SP") is None
+
+
+def test_ciudades_canonicas_no_juntan_nombres_con_otros_numeros():
+    ciudades = CiudadesCanonicas(_conteos())
+    assert ciudades.canonica("Cidade 101", "SP") == "Cidade 101"
+    assert ciudades.canonica("Cidade 1019", "SP") == "Cidade 1019"
+    assert ciudades.ciudades == 4
+
+
+def test_canonizar_serie():
+    ciudades = CiudadesCanonicas(_conteos())
+    serie = pd.Series(["Belo Horizont", "Cidade 1019", None, "Recife"], name="customer_city")
+    estados = pd.Series(["MG", "SP", "SP", "PE"])
+    assert ciudades.canonizar(serie, estados).tolist() == ["Belo Horizonte", "Cidade 1019", np.nan, "Recife"]
+
+
+def _geolocation(conteos: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "geolocation_city": np.repeat(conteos["ciudad"].to_numpy(), conteos["filas"].to_numpy()),
+        "geolocation_state": np.repeat(conteos["estado"].to_numpy(), conteos["filas"].to_numpy()),
+    })
+
+
+def test_cache_de_ciudades_se_invalida_si_cambian_los_conteos(tmp_path, monkeypatch):
+    construidas = []
+    init = CiudadesCanonicas.__init__
+
+    def contar(self, conteos):
+        construidas.append(len(conteos))
+        init(self, conteos)
+
+    monkeypatch.setattr(CiudadesCanonicas, "__init__", contar)
+    conteos = _conteos()
+
+    primera = CiudadesCanonicas.desde_tabla(
+        _geolocation(conteos), "geolocation_city", "geolocation_state", cache_dir=tmp_path
+    )
+    cacheada = CiudadesCanonicas.desde_tabla(
+        _geolocation(conteos), "geolocation_city", "geolocation_state", cache_dir=tmp_path
+    )
+    assert len(construidas) == 1
+    assert cacheada.huella() == primera.huella()
+
+    # La escritura sin la "e" pasa a ser la más frecuente: cambia la canónica
+    conteos.loc[conteos["ciudad"] == "Belo Horizont", "filas"] = 300
+    nueva = CiudadesCanonicas.desde_tabla(
+        _geolocation(conteos), "geolocation_city", "geolocation_state", cache_dir=tmp_path
+    )
+    assert len(construidas) == 2
+    assert nueva.canonica("Belo Horizonte", "MG") == "Belo Horizont"
+    assert nueva.huella() != primera.huella()
@@ -0,0 +1,15 @@
+import pandas as pd
+
+import generar_datos
+from conftest import correr_pipeline
+
+
+def test_pagos_con_secuencias_validas_por_orden(crudos):
+    pagos = pd.read_csv(crudos / generar_datos.ARCHIVOS["payments"]).drop_duplicates()
+    assert pagos["payment_sequential"].between(1, 100).all()
+    assert not pagos.duplicated(["order_id", "payment_sequential"]).any()
+
+
+def test_dry_run_pasa_con_datos_generados(crudos, tmp_path):
+    # ensayar termina con sys.exit(1) si alguna tabla limpia no cumple el DDL
+    correr_pipeline(crudos, tmp_path, "--dry-run")
@@ -0,0 +1,24 @@
+import pytest
+
+import particiones
+from conftest import correr_pipeline
+
+
+@pytest.fixture(scope="module")
+def limpias_pandas(crudos, tmp_path_factory):
+    return correr_pipeline(crudos, tmp_path_factory.mktemp("pandas"))
+
+
+@pytest.mark.parametrize("partes", [1, 3])
+@pytest.mark.parametrize("motor", ["polars", "duckdb"])
+def test_motor_da_las_mismas_tablas_que_pandas(crudos, limpias_pandas, tmp_path, monkeypatch, motor, partes):
+    pytest.importorskip(motor)
+    # Lotes chicos: la unión por número de fila pasa por muchos lotes de cada parte
+    monkeypatch.setattr(particiones, "FILAS_POR_LOTE", 37)
+
+    limpias = correr_pipeline(crudos, tmp_path, "--engine", motor, "--partitions", str(partes), "--workers", "2")
+
+    esperadas = sorted(p.name for p in limpias_pandas.glob("*.csv"))
+    assert sorted(p.name for p in limpias.glob("*.csv")) == esperadas
+    for nombre in esperadas:
+        assert (limpias / nombre).read_bytes() == (limpias_pandas / nombre).read_bytes(), nombre